@@ -1,5 +1,8 @@
 import asyncio
+import threading
 from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Union
 
 
 def repeat(*, seconds: float):
@@ -13,10 +16,33 @@ def repeat(*, seconds: float):
                     except Exception as e:
                         print(f"Error: {e}")
                     await asyncio.sleep(seconds)
-            asyncio.ensure_future(loop(*args, **kwargs))
+            return asyncio.ensure_future(loop(*args, **kwargs))
         return wrapper
     return decorator
 
 
+def lazy_prompty(path: Union[str, Path]) -> Callable[[], Any]:
+    """
+    prompty.load deferred to the first call and kept from then on. The azure
+    invoker (prompty.azure, which pulls in azure.identity) is only imported
+    then as well, so importing the API does not pay for either.
+    """
+    prompt = None
+    lock = threading.Lock()
+
+    def load():
+        nonlocal prompt
+        if prompt is None:
+            with lock:
+                if prompt is None:
+                    import prompty
+                    import prompty.azure  # noqa: F401 registers azure_openai
+
+                    prompt = prompty.load(str(path))
+        return prompt
+
+    return load
+
+
 # Compare this snippet from .venv/Lib/site-packages/fastapi_utilities/repeat/repeat_every.py:
 # slimmed down version of the repeat_every decorator
@@ -0,0 +1,103 @@
+"""
+Chat time to first token: the whole JSON reply before anything is sent
+(the old path) against streaming the "response" field out of the JSON as
+it is generated, with the field generated last (old schema order) or
+first (current schema.json).
+
+The model is a stand-in emitting TOKEN_CHARS characters per token, the
+first after FIRST_TOKEN_MS and then one every TOKEN_MS, run SCALE times
+faster and reported at full scale.
+
+    python -m api.benchmarks.chat_stream
+"""
+
+import json
+import asyncio
+import timeit
+from time import perf_counter
+from typing import AsyncIterator, Dict
+
+from api.chat.stream import JsonFieldStream
+
+FIRST_TOKEN_MS = 300
+TOKEN_MS = 15
+TOKEN_CHARS = 4
+SCALE = 10
+
+RESPONSE = (
+    "Hi Seth! 🏕️ Snow camping sounds like an adventure. To stay warm I'd pair "
+    "your SkyView 2-Person Tent with the MountainDream Sleeping Bag, rated to "
+    "15°F, and the TrekReady Hiking Boots for insulated, grippy footing. Would "
+    "you like a closer look at any of them? A picture of your current setup "
+    "would help me tailor the list. "
+) * 2
+CONTEXT = (
+    "Seth is preparing for a snow camping trip next weekend and is worried "
+    "about staying warm. He owns the SkyView 2-Person Tent. Suggested the "
+    "MountainDream Sleeping Bag and the TrekReady Hiking Boots. "
+) * 2
+
+
+def reply(order) -> str:
+    fields = {"response": RESPONSE, "context": CONTEXT, "call": 1}
+    return json.dumps({k: fields[k] for k in order}, ensure_ascii=False)
+
+
+async def model(text: str) -> AsyncIterator[str]:
+    await asyncio.sleep(FIRST_TOKEN_MS / 1000 / SCALE)
+    for i in range(0, len(text), TOKEN_CHARS):
+        if i > 0:
+            await asyncio.sleep(TOKEN_MS / 1000 / SCALE)
+        yield text[i : i + TOKEN_CHARS]
+
+
+async def full(text: str) -> Dict[str, float]:
+    start = perf_counter()
+    chunks = [chunk async for chunk in model(text)]
+    json.loads("".join(chunks))
+    elapsed = perf_counter() - start
+    return {"first text ms": elapsed, "complete ms": elapsed}
+
+
+async def streamed(text: str) -> Dict[str, float]:
+    start = perf_counter()
+    stream = JsonFieldStream("response")
+    first = None
+    async for chunk in model(text):
+        if len(stream.feed(chunk)) > 0 and first is None:
+            first = perf_counter() - start
+    stream.result()
+    return {"first text ms": first or 0.0, "complete ms": perf_counter() - start}
+
+
+def parser_cost() -> float:
+    text = reply(["response", "context", "call"])
+    chunks = [text[i : i + TOKEN_CHARS] for i in range(0, len(text), TOKEN_CHARS)]
+
+    def parse():
+        stream = JsonFieldStream("response")
+        for chunk in chunks:
+            stream.feed(chunk)
+        stream.result()
+
+    number = 200
+    return timeit.timeit(parse, number=number) / number * 1e6
+
+
+async def run():
+    results = {
+        "full json": await full(reply(["context", "response", "call"])),
+        "context first": await streamed(reply(["context", "response", "call"])),
+        "response first": await streamed(reply(["response", "context", "call"])),
+    }
+    print(f"{'':>16}{'first text ms':>16}{'complete ms':>16}")
+    for name, result in results.items():
+        print(
+            f"{name:>16}"
+            + "".join(f"{v * 1000 * SCALE:>16.0f}" for v in result.values())
+        )
+    print(f"parser: {parser_cost():.0f} us per reply")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+"""
+Context tokens sent to chat.prompty per turn on a long thread: the original
+unbounded list of cumulative summaries against api.chat.context.ChatContext.
+
+    python -m api.benchmarks.context [turns]
+"""
+
+import sys
+from typing import List
+
+from api.chat.context import ChatContext, estimate_tokens
+
+FACTS = [
+    "The customer is planning a winter camping trip in the Rockies.",
+    "They own the SkyView 2-Person Tent and the TrailWalker Hiking Shoes.",
+    "They shared an image of a snowy campsite with a collapsed tent.",
+    "They are worried about staying warm overnight below freezing.",
+    "They asked about sleeping bags rated for 15 degrees or lower.",
+    "They are comparing the MountainDream Sleeping Bag with the CozyNights bag.",
+    "They want a waterproof jacket that layers well.",
+    "They asked whether the RainGuard Hiking Jacket is breathable.",
+    "They mentioned their budget is around 400 dollars in total.",
+    "They asked for a phone call to go over the final list.",
+]
+
+
+def simulate(turns: int):
+    naive: List[str] = []
+    rolling = ChatContext()
+    rows = []
+    for turn in range(turns):
+        question = f"Question {turn}: what else should I bring for the trip?"
+        response = "You might also want to consider an insulated sleeping pad. " * 2
+        # cumulative summary, grows with the conversation
+        summary = " ".join(FACTS[: (turn % len(FACTS)) + 1] * (turn // 10 + 1))
+
+        before = sum(estimate_tokens(item) for item in naive)
+        after = rolling.tokens()
+        rows.append((turn + 1, before, after))
+
+        naive.append(summary)
+        rolling.add(question, response, summary)
+    return rows, rolling
+
+
+def run(turns: int = 50):
+    rows, rolling = simulate(turns)
+    print(f"{'turn':>6} {'unbounded':>10} {'rolling':>10}")
+    for turn, before, after in rows:
+        if turn == 1 or turn % 5 == 0:
+            print(f"{turn:>6} {before:>10} {after:>10}")
+
+    total_before = sum(r[1] for r in rows)
+    total_after = sum(r[2] for r in rows)
+    print(f"{'total':>6} {total_before:>10} {total_after:>10}")
+    print(f"budget {rolling.token_budget}, compactions {rolling.compactions}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,164 @@
+"""
+Realtime events handled per second on one core by RealtimeClient, with an
+OpenTelemetry tracer exporting to memory.
+
+    every-event  a span per event, as with the old match + @trace handlers
+    policy       spans for lifecycle events, sampled / aggregated deltas
+    untraced     no tracer registered, for reference
+
+    python -m api.benchmarks.dispatch [responses]
+"""
+
+import sys
+import asyncio
+import base64
+from time import perf_counter
+from typing import Any, Dict, List
+
+from openai.types.beta.realtime import (
+    ResponseAudioDeltaEvent,
+    ResponseAudioDoneEvent,
+    ResponseAudioTranscriptDeltaEvent,
+    ResponseAudioTranscriptDoneEvent,
+    ResponseCreatedEvent,
+    ResponseDoneEvent,
+)
+from opentelemetry import trace as oteltrace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from prompty.tracer import Tracer
+
+from api.telemetry import GenAIOTel, base_path
+from api.voice import RealtimeClient
+from api.voice.dispatch import EventDispatcher, Route
+
+AUDIO = base64.b64encode(bytes(40 * 48)).decode("ascii")
+
+
+class NullClient:
+    client_state = None
+
+    async def send_text(self, data):
+        pass
+
+    async def send_bytes(self, data):
+        pass
+
+
+class Replay:
+    """
+    Realtime connection stand-in that yields the events once (letting other
+    tasks run in between, like a socket read), then behaves like a closed
+    connection.
+    """
+
+    def __init__(self, events: List[Any]):
+        self.events = events
+        self.done = False
+
+    async def send(self, event):
+        pass
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        if self.done:
+            raise ConnectionError("closed")
+        self.done = True
+        for event in self.events:
+            await asyncio.sleep(0)
+            yield event
+
+
+def response(index: int, audio: int = 50, words: int = 20) -> List[Any]:
+    ids: Dict[str, Any] = {
+        "event_id": "event",
+        "response_id": f"resp_{index}",
+        "item_id": f"item_{index}",
+        "output_index": 0,
+        "content_index": 0,
+    }
+    events: List[Any] = [
+        ResponseCreatedEvent.model_validate(
+            {
+                "type": "response.created",
+                "event_id": "event",
+                "response": {"id": f"resp_{index}"},
+            }
+        )
+    ]
+    for i in range(audio):
+        events.append(
+            ResponseAudioDeltaEvent(type="response.audio.delta", delta=AUDIO, **ids)
+        )
+        if i < words:
+            events.append(
+                ResponseAudioTranscriptDeltaEvent(
+                    type="response.audio_transcript.delta", delta="word ", **ids
+                )
+            )
+    events.append(ResponseAudioDoneEvent(type="response.audio.done", **ids))
+    events.append(
+        ResponseAudioTranscriptDoneEvent(
+            type="response.audio_transcript.done", transcript="word " * words, **ids
+        )
+    )
+    events.append(
+        ResponseDoneEvent.model_validate(
+            {
+                "type": "response.done",
+                "event_id": "event",
+                "response": {"id": f"resp_{index}", "output": []},
+            }
+        )
+    )
+    return events
+
+
+async def measure(events: List[Any], routes: Dict[str, Route]) -> float:
+    session = RealtimeClient(Replay(events), NullClient())  # type: ignore
+    session.dispatcher = EventDispatcher(routes)
+    start = perf_counter()
+    try:
+        await session.receive_realtime()
+    except ConnectionError:
+        pass
+    elapsed = perf_counter() - start
+    await session.stop()
+    return elapsed
+
+
+async def run(responses: int = 200):
+    events = [e for i in range(responses) for e in response(i)]
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    oteltrace.set_tracer_provider(provider)
+    otel = GenAIOTel(base_path / "semantic-mapper.json")
+
+    every_event = {
+        name: Route(route.handler, "full")
+        for name, route in RealtimeClient.routes.items()
+    }
+    print(f"{len(events)} events")
+    print(f"{'':>12} {'events/s':>10} {'spans':>8}")
+    for name, routes, traced in [
+        ("every-event", every_event, True),
+        ("policy", RealtimeClient.routes, True),
+        ("untraced", RealtimeClient.routes, False),
+    ]:
+        Tracer.clear()
+        if traced:
+            Tracer.add("OpenTelemetry", otel.trace_span)
+        exporter.clear()
+        elapsed = await measure(events, routes)
+        spans = len(exporter.get_finished_spans())
+        print(f"{name:>12} {len(events) / elapsed:>10.0f} {spans:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
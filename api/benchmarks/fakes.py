@@ -0,0 +1,500 @@
+"""
+Local stand-ins for the Azure OpenAI services (and Redis), so latency and
+load can be measured offline.
+"""
+
+import json
+import base64
+import time
+import socket
+import asyncio
+from collections import Counter
+from itertools import count
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple, Union
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from websockets.asyncio.server import ServerConnection, serve
+
+
+class FakeRealtimeServer:
+    """
+    Realtime websocket stand-in. Sends session.created on connect, answers
+    session.update and every response.create with a scripted response:
+    ``audio_chunks`` audio deltas of ``chunk_ms`` each, ``interval`` seconds
+    apart, followed by the transcript and response.done.
+
+    With ``vad_ms`` set, server VAD is simulated as well: once that much
+    audio was appended the turn ends (speech started / stopped, committed,
+    ``user_transcript`` as the input transcription) and a response follows.
+
+    Use as ``async with FakeRealtimeServer() as server`` and point the client
+    at ``server.url`` (``websocket_base_url`` on AsyncAzureOpenAI).
+    """
+
+    def __init__(
+        self,
+        audio_chunks: int = 10,
+        chunk_ms: int = 40,
+        interval: float = 0.0,
+        first_delay: float = 0.05,
+        transcript: str = "Hi there! How can I help you today?",
+        vad_ms: int = 0,
+        user_transcript: str = "I need a warm sleeping bag for snow camping.",
+        host: str = "127.0.0.1",
+    ):
+        self.audio_chunks = audio_chunks
+        self.chunk_ms = chunk_ms
+        self.interval = interval
+        self.first_delay = first_delay
+        self.transcript = transcript
+        self.vad_ms = vad_ms
+        self.user_transcript = user_transcript
+        self.host = host
+        self.port = 0
+        self.received: Counter = Counter()
+        self.connections = 0
+        self._ids = count(1)
+        self._server: Any = None
+        # 24kHz PCM16 silence
+        self._chunk = base64.b64encode(bytes(chunk_ms * 48)).decode("ascii")
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/openai"
+
+    async def start(self) -> str:
+        self._server = await serve(self._handler, self.host, self.port)
+        self.port = list(self._server.sockets)[0].getsockname()[1]
+        return self.url
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    def _id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    async def _send(self, ws: ServerConnection, event: Dict[str, Any]):
+        event["event_id"] = self._id("event")
+        await ws.send(json.dumps(event))
+
+    async def _handler(self, ws: ServerConnection):
+        self.connections += 1
+        responses: Set[asyncio.Task] = set()
+        session = {"id": self._id("sess"), "object": "realtime.session"}
+        # bytes of input audio since the last turn
+        session["buffered"] = 0
+        await self._send(ws, {"type": "session.created", "session": session})
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                self.received[event["type"]] += 1
+                await self.handle(ws, event, session, responses)
+        except Exception:
+            pass
+        finally:
+            for task in responses:
+                task.cancel()
+
+    async def handle(
+        self,
+        ws: ServerConnection,
+        event: Dict[str, Any],
+        session: Dict[str, Any],
+        responses: Set[asyncio.Task],
+    ):
+        match event["type"]:
+            case "session.update":
+                session.update(event.get("session", {}))
+                await self._send(ws, {"type": "session.updated", "session": session})
+            case "input_audio_buffer.append" if self.vad_ms > 0:
+                session["buffered"] += len(event["audio"]) * 3 // 4
+                if session["buffered"] >= self.vad_ms * 48:
+                    session["buffered"] = 0
+                    await self._turn(ws)
+                    self._start(self._respond(ws), responses)
+            case "response.create":
+                self._start(self._respond(ws), responses)
+            case "response.cancel":
+                for task in list(responses):
+                    task.cancel()
+            case "conversation.item.create":
+                item = {"id": self._id("item"), **event.get("item", {})}
+                await self._send(
+                    ws, {"type": "conversation.item.created", "item": item}
+                )
+            case "conversation.item.truncate":
+                await self._send(
+                    ws,
+                    {
+                        "type": "conversation.item.truncated",
+                        "item_id": event["item_id"],
+                        "content_index": event.get("content_index", 0),
+                        "audio_end_ms": event["audio_end_ms"],
+                    },
+                )
+
+    def _start(self, response, responses: Set[asyncio.Task]):
+        task = asyncio.create_task(response)
+        responses.add(task)
+        task.add_done_callback(responses.discard)
+
+    async def _turn(self, ws: ServerConnection):
+        item_id = self._id("item")
+        await self._send(
+            ws,
+            {
+                "type": "input_audio_buffer.speech_started",
+                "audio_start_ms": 0,
+                "item_id": item_id,
+            },
+        )
+        await self._send(
+            ws,
+            {
+                "type": "input_audio_buffer.speech_stopped",
+                "audio_end_ms": self.vad_ms,
+                "item_id": item_id,
+            },
+        )
+        await self._send(
+            ws,
+            {
+                "type": "input_audio_buffer.committed",
+                "item_id": item_id,
+                "previous_item_id": None,
+            },
+        )
+        await self._send(
+            ws,
+            {
+                "type": "conversation.item.input_audio_transcription.completed",
+                "item_id": item_id,
+                "content_index": 0,
+                "transcript": self.user_transcript,
+            },
+        )
+
+    async def _respond(self, ws: ServerConnection):
+        response_id = self._id("resp")
+        item_id = self._id("item")
+        ids = {"response_id": response_id, "item_id": item_id}
+        part = {"output_index": 0, "content_index": 0}
+        item = {
+            "id": item_id,
+            "object": "realtime.item",
+            "type": "message",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "audio", "transcript": self.transcript}],
+        }
+        response = {"id": response_id, "object": "realtime.response", "output": []}
+
+        await self._send(ws, {"type": "response.created", "response": response})
+        await asyncio.sleep(self.first_delay)
+        for _ in range(self.audio_chunks):
+            await self._send(
+                ws,
+                {"type": "response.audio.delta", **ids, **part, "delta": self._chunk},
+            )
+            if self.interval > 0:
+                await asyncio.sleep(self.interval)
+        await self._send(ws, {"type": "response.audio.done", **ids, **part})
+        await self._send(
+            ws,
+            {
+                "type": "response.audio_transcript.done",
+                **ids,
+                **part,
+                "transcript": self.transcript,
+            },
+        )
+        response = {**response, "status": "completed", "output": [item]}
+        await self._send(ws, {"type": "response.done", "response": response})
+
+
+class FakeChatServer:
+    """
+    Azure OpenAI chat completions stand-in for the prompty calls. Replies
+    are picked from the request: structured output (chat.prompty) gets a
+    JSON ``chat_reply``, writeup.prompty's rubric gets ``writeup_reply``
+    and anything else ``suggestion_reply``. The first token comes after
+    ``first_delay`` seconds, then ``tokens_per_second`` tokens of
+    ``token_chars`` characters, streamed or as one completion.
+
+    Use as ``async with FakeChatServer() as server`` and set
+    AZURE_OPENAI_ENDPOINT to ``server.url`` before the prompts are loaded.
+    """
+
+    def __init__(
+        self,
+        first_delay: float = 0.3,
+        tokens_per_second: float = 100,
+        token_chars: int = 4,
+        chat_reply: Union[Dict[str, Any], None] = None,
+        writeup_reply: str = "NO",
+        suggestion_reply: str = (
+            "## MountainDream Sleeping Bag\n\nRated to 15°F with a contoured "
+            "mummy shape, it keeps the heat in when the temperature drops. "
+        )
+        * 4,
+        host: str = "127.0.0.1",
+    ):
+        self.first_delay = first_delay
+        self.tokens_per_second = tokens_per_second
+        self.token_chars = token_chars
+        self.chat_reply = chat_reply or {
+            "response": (
+                "Hi Seth! 🏕️ For snow camping I'd pair your SkyView 2-Person "
+                "Tent with the MountainDream Sleeping Bag, rated to 15°F. "
+            )
+            * 3,
+            "context": "Seth is getting ready for a snow camping trip.",
+            "call": 1,
+        }
+        self.writeup_reply = writeup_reply
+        self.suggestion_reply = suggestion_reply
+        self.host = host
+        self.port = 0
+        self.received: Counter = Counter()
+        self._ids = count(1)
+        self._server: Any = None
+        self._task: Union[asyncio.Task, None] = None
+        self.app = FastAPI()
+        self.app.post("/openai/deployments/{deployment}/chat/completions")(
+            self._completions
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, 0))
+        self.port = sock.getsockname()[1]
+        config = uvicorn.Config(
+            self.app, log_level="warning", lifespan="off", timeout_graceful_shutdown=1
+        )
+        self._server = uvicorn.Server(config)
+        self._task = asyncio.create_task(self._server.serve(sockets=[sock]))
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+        return self.url
+
+    async def stop(self):
+        if self._server is not None and self._task is not None:
+            self._server.should_exit = True
+            await self._task
+            self._server = None
+            self._task = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    def reply(self, body: Dict[str, Any]) -> Tuple[str, str]:
+        if "response_format" in body:
+            return "chat", json.dumps(self.chat_reply, ensure_ascii=False)
+        system = body["messages"][0].get("content", "") if body["messages"] else ""
+        if isinstance(system, str) and "# Rubric" in system:
+            return "writeup", self.writeup_reply
+        return "suggestions", self.suggestion_reply
+
+    async def _tokens(self, text: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_delay)
+        for i in range(0, len(text), self.token_chars):
+            if i > 0:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield text[i : i + self.token_chars]
+
+    async def _completions(self, deployment: str, request: Request):
+        body = await request.json()
+        prompt, text = self.reply(body)
+        self.received[prompt] += 1
+        completion = {
+            "id": f"chatcmpl-{next(self._ids)}",
+            "created": int(time.time()),
+            "model": deployment,
+        }
+        if body.get("stream", False):
+
+            async def events():
+                async for token in self._tokens(text):
+                    chunk = {
+                        **completion,
+                        "object": "chat.completion.chunk",
+                        "choices": [
+                            {
+                                "index": 0,
+                                "delta": {"role": "assistant", "content": token},
+                                "finish_reason": None,
+                            }
+                        ],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        content = "".join([token async for token in self._tokens(text)])
+        return {
+            **completion,
+            "object": "chat.completion",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+
+class FakeRedisServer:
+    """
+    In-process server speaking the Redis protocol (RESP2), with the strings
+    and lists commands the session state uses and key expiry. Several
+    clients (workers) can share it like a real Redis.
+
+    Use as ``async with FakeRedisServer() as server`` and connect to
+    ``server.url``.
+    """
+
+    def __init__(self, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = 0
+        self.data: Dict[bytes, Any] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.received: Counter = Counter()
+        self._server: Any = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    async def _read(self, reader: asyncio.StreamReader) -> Union[List[bytes], None]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # inline command
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    def _encode(self, value: Any) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, Exception):
+            return b"-ERR %s\r\n" % str(value).encode()
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self._encode(v) for v in value)
+        if value == "OK" or value == "PONG":
+            return b"+%s\r\n" % value.encode()
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    async def _handler(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await self._read(reader)
+                if args is None:
+                    break
+                try:
+                    result = self.execute(args[0].upper().decode(), args[1:])
+                except Exception as e:
+                    result = e
+                writer.write(self._encode(result))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _get(self, key: bytes) -> Any:
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def execute(self, command: str, args: List[bytes]) -> Any:
+        self.received[command] += 1
+        match command:
+            case "PING":
+                return "PONG"
+            case "CLIENT" | "SELECT":
+                return "OK"
+            case "GET":
+                return self._get(args[0])
+            case "SET":
+                self.data[args[0]] = args[1]
+                self.expires.pop(args[0], None)
+                if len(args) > 3 and args[2].upper() == b"EX":
+                    self.expires[args[0]] = time.monotonic() + int(args[3])
+                return "OK"
+            case "DEL":
+                deleted = 0
+                for key in args:
+                    deleted += self._get(key) is not None
+                    self.data.pop(key, None)
+                    self.expires.pop(key, None)
+                return deleted
+            case "EXPIRE":
+                if self._get(args[0]) is None:
+                    return 0
+                self.expires[args[0]] = time.monotonic() + int(args[1])
+                return 1
+            case "RPUSH":
+                items = self._get(args[0])
+                if items is None:
+                    items = []
+                    self.data[args[0]] = items
+                items.extend(args[1:])
+                return len(items)
+            case "LRANGE":
+                items = self._get(args[0]) or []
+                start, stop = int(args[1]), int(args[2])
+                stop = len(items) if stop == -1 else stop + 1
+                return items[start:stop]
+            case _:
+                raise ValueError(f"unknown command '{command}'")
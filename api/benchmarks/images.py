@@ -0,0 +1,105 @@
+"""
+Chat image uploads: a phone photo as sent (the old path) against the
+ImagePipeline output, and how long the event loop is held up while a
+burst of uploads is processed inline or in the thread pool.
+
+Vision tokens follow the high detail rule for gpt-4o: scaled to fit
+2048x2048, then the short side to 768, 170 tokens per 512px tile + 85.
+
+    python -m api.benchmarks.images [uploads]
+"""
+
+import io
+import sys
+import math
+import base64
+import asyncio
+from time import perf_counter
+
+from PIL import Image
+
+from api.images import ImagePipeline
+
+
+def photo(width: int = 4032, height: int = 3024) -> str:
+    # smooth gradient with sensor noise, compresses like a photo
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 24)
+    image = Image.merge("RGB", (gradient, noise, gradient.rotate(90, expand=False)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=92)
+    return f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+
+def vision_tokens(width: int, height: int) -> int:
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+async def loop_lag(work) -> float:
+    """Longest gap between ticks of a 1ms timer while ``work`` runs."""
+    worst = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal worst
+        last = perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = perf_counter()
+            worst = max(worst, now - last - 0.001)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    await work()
+    done = True
+    await task
+    return worst
+
+
+async def run(uploads: int = 8):
+    upload = photo()
+    pipeline = ImagePipeline()
+    processed = await pipeline.process(upload)
+
+    print(f"{'':>10}{'size':>12}{'data url KB':>14}{'vision tokens':>16}")
+    print(
+        f"{'upload':>10}{'4032x3024':>12}{len(upload) / 1024:>14.0f}"
+        f"{vision_tokens(4032, 3024):>16}"
+    )
+    print(
+        f"{'processed':>10}{f'{processed.width}x{processed.height}':>12}"
+        f"{len(processed.data_url) / 1024:>14.0f}"
+        f"{vision_tokens(processed.width, processed.height):>16}"
+    )
+
+    # distinct uploads so nothing comes from the cache
+    burst = [upload[:-8] + base64.b64encode(bytes([i]) * 3).decode() + upload[-4:]
+             for i in range(uploads)]
+
+    async def inline():
+        for data_url in burst:
+            media_type, data, ref = pipeline._read(data_url)
+            pipeline._convert(ref, media_type, data)
+
+    async def pooled():
+        pipeline.cache.clear()
+        await asyncio.gather(*[pipeline.process(data_url) for data_url in burst])
+
+    for name, work in [("inline", inline), ("thread pool", pooled)]:
+        start = perf_counter()
+        lag = await loop_lag(work)
+        elapsed = perf_counter() - start
+        print(
+            f"{name:>12}: {uploads} uploads in {elapsed * 1000:.0f} ms, "
+            f"event loop held up to {lag * 1000:.0f} ms"
+        )
+    pipeline.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 8))
@@ -0,0 +1,275 @@
+"""
+Load test of the app, offline: the API runs in its own process (uvicorn)
+against the local stand-ins for Azure OpenAI chat completions and the
+realtime API, and N concurrent clients drive it.
+
+    chat        /api/chat turns, first streamed text and complete reply
+    voice       /api/voice turns, audio in until the first audio back and
+                the assistant transcript
+    suggestion  POST /api/suggestion, first chunk and complete write up
+
+Reported per scenario: throughput, p50/p99, the API process CPU use and
+its memory (RSS before and at the peak, and the growth per client).
+
+    python -m api.benchmarks.load [clients] [turns] [scenario ...]
+
+Settings of the app (VOICE_RELAY_POLICY, SESSION_STATE, ...) are passed on
+from the environment, so they can be tuned against the same load. Tracing
+is OpenTelemetry with nothing sampled unless TRACE_SAMPLE_RATE is set (the
+exporter points at a closed port).
+"""
+
+import os
+import sys
+import json
+import uuid
+import base64
+import socket
+import asyncio
+import statistics
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+import psutil
+from websockets.asyncio.client import ClientConnection, connect
+
+from api.benchmarks.fakes import FakeChatServer, FakeRealtimeServer
+from api.benchmarks.voice_latency import percentile
+
+# 40ms of 24kHz PCM16 silence, as the browser sends it
+AUDIO = base64.b64encode(bytes(40 * 48)).decode("ascii")
+SPEECH_MS = 400
+
+# overridden by the environment
+DEFAULTS = {
+    "LOCAL_TRACING_ENABLED": "false",
+    "TRACE_SAMPLE_RATE": "0",
+    "APPINSIGHTS_CONNECTIONSTRING": (
+        "InstrumentationKey=00000000-0000-0000-0000-000000000000;"
+        "IngestionEndpoint=http://127.0.0.1:9"
+    ),
+}
+
+Client = Callable[[str, int, int], Awaitable[Tuple[List[Tuple[float, float]], Any]]]
+
+
+class AppProcess:
+    """
+    The API under test, in a uvicorn process of its own so its memory can
+    be measured apart from the clients and the stand-ins.
+    """
+
+    def __init__(self, env: Dict[str, str]):
+        self.env = {**DEFAULTS, **os.environ, **env}
+        self.port = 0
+        self.process: Any = None
+        self.peak = 0
+
+    @property
+    def url(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    async def start(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "api.main:app",
+            "--port",
+            str(self.port),
+            "--log-level",
+            "warning",
+            env=self.env,
+            stdout=asyncio.subprocess.DEVNULL,
+        )
+        async with httpx.AsyncClient() as client:
+            for _ in range(1500):
+                try:
+                    await client.get(f"http://{self.url}/")
+                    return
+                except httpx.TransportError:
+                    await asyncio.sleep(0.02)
+        raise RuntimeError("API did not start")
+
+    async def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+
+    def rss(self) -> int:
+        return psutil.Process(self.process.pid).memory_info().rss
+
+    def cpu(self) -> float:
+        times = psutil.Process(self.process.pid).cpu_times()
+        return times.user + times.system
+
+    async def sample(self, interval: float = 0.02):
+        while True:
+            self.peak = max(self.peak, self.rss())
+            await asyncio.sleep(interval)
+
+
+async def chat_client(url: str, index: int, turns: int):
+    ws = await connect(f"ws://{url}/api/chat", max_size=None)
+    await ws.send(json.dumps({"threadId": str(uuid.uuid4())}))
+    timings = []
+    for turn in range(turns):
+        start = perf_counter()
+        first = None
+        await ws.send(
+            json.dumps(
+                {"name": "Seth", "text": f"Client {index} turn {turn}: what keeps me warm?"}
+            )
+        )
+        async for frame in ws:
+            payload = json.loads(frame)["payload"]
+            if payload.get("state") == "stream" and first is None:
+                first = perf_counter() - start
+            elif payload.get("state") == "complete":
+                break
+        timings.append((first or 0.0, perf_counter() - start))
+    return timings, ws
+
+
+async def voice_client(url: str, index: int, turns: int):
+    ws = await connect(f"ws://{url}/api/voice", max_size=None)
+    settings = {"user": "Seth", "threadId": str(uuid.uuid4())}
+    await ws.send(json.dumps({"type": "messages", "payload": "[]"}))
+    await ws.send(json.dumps({"type": "user", "payload": json.dumps(settings)}))
+    timings = []
+    for _ in range(turns):
+        # the stand-in's VAD ends the turn after SPEECH_MS of audio
+        for _ in range(SPEECH_MS // 40):
+            await ws.send(json.dumps({"type": "audio", "payload": AUDIO}))
+        start = perf_counter()
+        first = None
+        async for frame in ws:
+            message = json.loads(frame)
+            if message["type"] == "audio" and first is None:
+                first = perf_counter() - start
+            elif message["type"] == "assistant":
+                break
+        timings.append((first or 0.0, perf_counter() - start))
+    return timings, ws
+
+
+async def suggestion_client(url: str, index: int, turns: int):
+    timings = []
+    client = httpx.AsyncClient(timeout=60)
+    for turn in range(turns):
+        # distinct transcripts, the app caches identical ones
+        messages = [
+            {"name": "user", "text": f"Client {index} turn {turn}: snow camping gear?"},
+            {"name": "assistant", "text": "The MountainDream Sleeping Bag, rated to 15°F."},
+        ]
+        start = perf_counter()
+        first = None
+        async with client.stream(
+            "POST",
+            f"http://{url}/api/suggestion",
+            json={"customer": "Seth", "messages": messages},
+        ) as response:
+            async for _ in response.aiter_text():
+                if first is None:
+                    first = perf_counter() - start
+        timings.append((first or 0.0, perf_counter() - start))
+    return timings, client
+
+
+async def close(held: Any):
+    if isinstance(held, ClientConnection):
+        await held.close()
+    else:
+        await held.aclose()
+
+
+async def scenario(app: AppProcess, client: Client, clients: int, turns: int):
+    before = app.rss()
+    cpu = app.cpu()
+    app.peak = before
+    sampler = asyncio.create_task(app.sample())
+    start = perf_counter()
+    results = await asyncio.gather(
+        *[client(app.url, index, turns) for index in range(clients)]
+    )
+    elapsed = perf_counter() - start
+    cpu = app.cpu() - cpu
+    # connections are held until here, so the peak includes every session
+    await asyncio.sleep(0.1)
+    sampler.cancel()
+    await asyncio.gather(*[close(held) for _, held in results])
+
+    first = [t[0] * 1000 for timings, _ in results for t in timings]
+    total = [t[1] * 1000 for timings, _ in results for t in timings]
+    return {
+        "per s": len(total) / elapsed,
+        "first p50": percentile(first, 50),
+        "first p99": percentile(first, 99),
+        "done p50": percentile(total, 50),
+        "done p99": percentile(total, 99),
+        "done mean": statistics.mean(total),
+        "cpu %": cpu / elapsed * 100,
+        "rss MB": before / 2**20,
+        "peak MB": app.peak / 2**20,
+        "KB/client": (app.peak - before) / 1024 / clients,
+    }
+
+
+SCENARIOS: Dict[str, Client] = {
+    "chat": chat_client,
+    "voice": voice_client,
+    "suggestion": suggestion_client,
+}
+
+
+async def run(clients: int = 50, turns: int = 3, scenarios: List[str] = []):
+    async with FakeChatServer() as chat, FakeRealtimeServer(
+        vad_ms=SPEECH_MS, interval=0.005
+    ) as realtime:
+        app = AppProcess(
+            {
+                "AZURE_OPENAI_ENDPOINT": chat.url,
+                "AZURE_OPENAI_API_KEY": "fake_key",
+                "AZURE_VOICE_ENDPOINT": "https://localhost",
+                "AZURE_VOICE_KEY": "fake_key",
+                "AZURE_VOICE_WEBSOCKET_URL": realtime.url,
+            }
+        )
+        await app.start()
+        try:
+            print(f"{clients} clients, {turns} turns each")
+            print(
+                f"{'':>11}{'per s':>8}{'first p50':>11}{'first p99':>11}"
+                f"{'done p50':>10}{'done p99':>10}{'done mean':>11}{'cpu %':>7}"
+                f"{'rss MB':>8}{'peak MB':>9}{'KB/client':>11}"
+            )
+            for name in scenarios or list(SCENARIOS):
+                result = await scenario(app, SCENARIOS[name], clients, turns)
+                print(
+                    f"{name:>11}{result['per s']:>8.1f}"
+                    f"{result['first p50']:>11.0f}{result['first p99']:>11.0f}"
+                    f"{result['done p50']:>10.0f}{result['done p99']:>10.0f}"
+                    f"{result['done mean']:>11.0f}{result['cpu %']:>7.0f}"
+                    f"{result['rss MB']:>8.0f}"
+                    f"{result['peak MB']:>9.0f}{result['KB/client']:>11.0f}"
+                )
+        finally:
+            await app.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        run(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+            sys.argv[3:],
+        )
+    )
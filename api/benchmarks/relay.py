@@ -0,0 +1,80 @@
+"""
+Audio relay to a slow browser: how long the realtime read loop is held up
+per audio delta, and how long an interrupt takes to reach the browser once
+the user starts talking.
+
+    inline       maxsize=1, block (roughly the old direct send_text)
+    block        bounded queue, waits when full
+    drop_oldest  bounded queue, drops stale audio when full
+    coalesce     bounded queue, merges queued audio when full
+
+    python -m api.benchmarks.relay [deltas] [send_ms]
+"""
+
+import sys
+import asyncio
+from time import perf_counter
+
+from api.voice.relay import Relay
+
+CHUNK = bytes(40 * 48)  # 40ms of 24kHz PCM16
+
+
+class SlowBrowser:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.interrupted = asyncio.Event()
+        self.frames = 0
+
+    async def send(self, item):
+        await asyncio.sleep(self.delay)
+        self.frames += 1
+        if item == "interrupt":
+            self.interrupted.set()
+
+
+async def measure(maxsize: int, policy: str, deltas: int, delay: float):
+    browser = SlowBrowser(delay)
+    relay = Relay(browser.send, maxsize=maxsize, policy=policy)  # type: ignore
+    stalls = []
+    for _ in range(deltas):
+        start = perf_counter()
+        await relay.put(CHUNK, audio=True)
+        stalls.append(perf_counter() - start)
+
+    start = perf_counter()
+    relay.discard_audio()
+    await relay.put("interrupt")
+    await browser.interrupted.wait()
+    interrupt = perf_counter() - start
+    await relay.close()
+    return max(stalls), sum(stalls), interrupt, browser.frames
+
+
+async def run(deltas: int = 200, send_ms: float = 5):
+    print(
+        f"{'':>12} {'max stall ms':>12} {'total stall ms':>14} "
+        f"{'interrupt ms':>12} {'frames':>7}"
+    )
+    for name, maxsize, policy in [
+        ("inline", 1, "block"),
+        ("block", 64, "block"),
+        ("drop_oldest", 64, "drop_oldest"),
+        ("coalesce", 64, "coalesce"),
+    ]:
+        stall, total, interrupt, frames = await measure(
+            maxsize, policy, deltas, send_ms / 1000
+        )
+        print(
+            f"{name:>12} {stall * 1000:>12.2f} {total * 1000:>14.2f} "
+            f"{interrupt * 1000:>12.2f} {frames:>7}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        run(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+            float(sys.argv[2]) if len(sys.argv) > 2 else 5,
+        )
+    )
@@ -0,0 +1,220 @@
+"""
+Replay of a recorded voice call (VOICE_RECORD_DIR, see api.voice.recording)
+through RealtimeClient, for relay throughput and latency regressions
+without a live call. Without a recording a synthetic call is used: turns of
+2s of speech in 20ms frames, answered by 5s of audio in 100ms deltas sent
+faster than real time, as the realtime API does.
+
+Reported: recording size against the same call as JSON lines, and per
+relay policy and browser (fast, or 2ms per send) the replay time, the time
+from an audio delta arriving to the browser having it, and the frames sent.
+
+    python -m api.benchmarks.replay [recording.cvr] [speed]
+
+``speed`` 0 (default) replays as fast as possible, 1 at the recorded pace.
+As fast as possible the pauses of the call collapse too, audio still
+queued for a slow browser then meets the next turn's barge-in and is
+discarded (fewer frames).
+"""
+
+import sys
+import base64
+import asyncio
+import contextlib
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple
+
+import orjson
+
+from api.benchmarks.voice_latency import percentile
+from api.voice import RealtimeClient
+from api.voice.recording import (
+    CLIENT,
+    Record,
+    Recorder,
+    ReplayClient,
+    ReplayClock,
+    ReplayRealtime,
+    parse_event,
+    read_recording,
+)
+
+
+class Replay(NamedTuple):
+    session: RealtimeClient
+    realtime: ReplayRealtime
+    browser: ReplayClient
+    elapsed: float
+
+
+async def replay(
+    records: List[Record],
+    speed: float = 0.0,
+    send_delay: float = 0.0,
+    keep: bool = False,
+    **options: Any,
+) -> Replay:
+    """
+    Feeds the records through receive_realtime and receive_client of a new
+    RealtimeClient (``options`` are passed on to it) until both sides were
+    played and everything queued was sent.
+    """
+    clock = ReplayClock(speed)
+    realtime = ReplayRealtime(records, clock)
+    browser = ReplayClient(records, clock, send_delay=send_delay, keep=keep)
+    session = RealtimeClient(realtime, browser, **options)  # type: ignore
+    tasks = [
+        asyncio.create_task(session.receive_realtime()),
+        asyncio.create_task(session.receive_client()),
+    ]
+    await realtime.played.wait()
+    await browser.played.wait()
+    await session.flush()
+    elapsed = clock.now()
+
+    # the call ends
+    session.realtime = None
+    await realtime.close()
+    await browser.close()
+    await asyncio.gather(*tasks)
+    await session.stop()
+    return Replay(session, realtime, browser, elapsed)
+
+
+def synthetic_call(path: Path, turns: int = 5) -> Path:
+    recorder = Recorder(path)
+    frame = {"type": "websocket.receive"}
+    speech = base64.b64encode(bytes(20 * 48)).decode("ascii")
+    answer = base64.b64encode(bytes(100 * 48)).decode("ascii")
+    ids = {"output_index": 0, "content_index": 0}
+    t = 0.0
+    for turn in range(turns):
+        item_id, response_id, answer_id = f"item_{turn}", f"resp_{turn}", f"out_{turn}"
+
+        def event(at: float, type: str, **data: Any):
+            data = {"type": type, "event_id": f"event_{recorder.records}", **data}
+            recorder.realtime(parse_event(data), at)
+
+        for i in range(100):
+            text = orjson.dumps({"type": "audio", "payload": speech}).decode("utf-8")
+            recorder.client({**frame, "text": text}, t + i * 0.02)
+            if i == 5:
+                event(
+                    t + 0.1,
+                    "input_audio_buffer.speech_started",
+                    audio_start_ms=0,
+                    item_id=item_id,
+                )
+        t += 2.0
+        event(
+            t, "input_audio_buffer.speech_stopped", audio_end_ms=2000, item_id=item_id
+        )
+        event(
+            t + 0.02,
+            "input_audio_buffer.committed",
+            item_id=item_id,
+            previous_item_id=None,
+        )
+        event(
+            t + 0.3,
+            "conversation.item.input_audio_transcription.completed",
+            item_id=item_id,
+            content_index=0,
+            transcript="Do you have a sleeping bag for snow camping?",
+        )
+        response = {"id": response_id, "object": "realtime.response", "output": []}
+        event(t + 0.35, "response.created", response=response)
+        for i in range(50):
+            event(
+                t + 0.6 + i * 0.03,
+                "response.audio.delta",
+                response_id=response_id,
+                item_id=answer_id,
+                delta=answer,
+                **ids,
+            )
+        transcript = "The MountainDream Sleeping Bag keeps you warm down to 15°F."
+        t += 0.6 + 50 * 0.03
+        event(
+            t, "response.audio.done", response_id=response_id, item_id=answer_id, **ids
+        )
+        event(
+            t,
+            "response.audio_transcript.done",
+            response_id=response_id,
+            item_id=answer_id,
+            transcript=transcript,
+            **ids,
+        )
+        item = {
+            "id": answer_id,
+            "object": "realtime.item",
+            "type": "message",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "audio", "transcript": transcript}],
+        }
+        response = {**response, "status": "completed", "output": [item]}
+        event(t, "response.done", response=response)
+        # the customer listens to the answer
+        t += 3.5
+    recorder.close()
+    return path
+
+
+def jsonl_size(records: List[Record]) -> int:
+    """The same call written as one JSON line per message or event."""
+    size = 0
+    for record in records:
+        if record.source == CLIENT:
+            data: Dict[str, Any] = {"text": record.message()["text"]}
+        else:
+            data = record.event().to_dict(mode="json")
+        line = {"t": record.time, "source": record.source, **data}
+        size += len(orjson.dumps(line)) + 1
+    return size
+
+
+async def run(path: Path, speed: float = 0.0):
+    records = list(read_recording(path))
+    call = records[-1].time
+    size, jsonl = path.stat().st_size / 1024, jsonl_size(records) / 1024
+    print(
+        f"{path.name}: {len(records)} records, {call:.1f}s call, "
+        f"{size:.0f} KB (JSON lines {jsonl:.0f} KB)"
+    )
+    print(
+        f"{'':>12}{'browser':>9}{'replay ms':>11}{'events/s':>10}{'delay p50':>11}"
+        f"{'delay p99':>11}{'frames':>8}{'merged':>8}{'dropped':>9}"
+    )
+    for policy in ["block", "drop_oldest", "coalesce"]:
+        for browser, send_delay in [("fast", 0.0), ("slow", 0.002)]:
+            with contextlib.redirect_stdout(None):
+                result = await replay(
+                    records,
+                    speed=speed,
+                    send_delay=send_delay,
+                    policy=policy,
+                    queue_size=32,
+                )
+            delays = result.browser.relay_delays(result.realtime)
+            delays = [d * 1000 for d in delays]
+            stats = result.session.stats()["client"]
+            print(
+                f"{policy:>12}{browser:>9}{result.elapsed * 1000:>11.0f}"
+                f"{len(result.realtime.records) / result.elapsed:>10.0f}"
+                f"{percentile(delays, 50):>11.2f}{percentile(delays, 99):>11.2f}"
+                f"{result.browser.frames:>8}{stats['coalesced']:>8}"
+                f"{stats['dropped']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    if len(sys.argv) > 1:
+        asyncio.run(run(Path(sys.argv[1]), speed))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            recording = synthetic_call(Path(directory) / "synthetic.cvr")
+            asyncio.run(run(recording, speed))
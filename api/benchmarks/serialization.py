@@ -0,0 +1,62 @@
+"""
+Outbound socket message serialization: pydantic model + send_json
+(the original path) against the pre-serialized frames in api.models.
+
+    python -m api.benchmarks.serialization
+"""
+
+import json
+import timeit
+
+from api.models import (
+    START_ASSISTANT,
+    STOP_ASSISTANT,
+    action_frame,
+    context_frame,
+    send_action,
+    send_context,
+    start_assistant,
+    stop_assistant,
+    stream_assistant,
+    stream_assistant_frame,
+)
+
+CHUNK = "Sure thing! The TrailMaster X4 Tent is a great fit for snowy trips 🏕️ " * 4
+CONTEXT = "The customer is preparing for a winter camping trip. " * 8
+ARGUMENTS = json.dumps({"score": 3})
+
+
+def send_json(data) -> str:
+    # what starlette's WebSocket.send_json does before sending the text
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def pydantic_turn():
+    send_json(start_assistant())
+    send_json(stream_assistant(CHUNK))
+    send_json(stop_assistant())
+    send_json(send_context(CONTEXT))
+    send_json(send_action("call", ARGUMENTS))
+
+
+def frame_turn():
+    START_ASSISTANT
+    stream_assistant_frame(CHUNK)
+    STOP_ASSISTANT
+    context_frame(CONTEXT)
+    action_frame("call", ARGUMENTS)
+
+
+def run(number: int = 20000):
+    results = {}
+    for name, fn in [("pydantic", pydantic_turn), ("frames", frame_turn)]:
+        elapsed = min(timeit.repeat(fn, number=number, repeat=5))
+        results[name] = elapsed / number * 1e6
+        print(f"{name:>10}: {results[name]:8.2f} us per chat turn (5 frames)")
+
+    print(f"   speedup: {results['pydantic'] / results['frames']:8.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,119 @@
+"""
+Suggestions started during the call versus on request, over the recorded
+transcripts in api/tests/writeup.jsonl. Transcript messages arrive
+TURN_MS apart; in the transcripts asking for a write up the client
+checks /api/request when the assistant agrees (REQUEST_MS, the
+writeup.prompty call) and then requests the suggestions. Times are
+measured from the suggestion request.
+
+The suggestions stream is a stand-in: first chunk after TTFT_MS, then
+CHUNKS chunks CHUNK_MS apart. Times are run SCALE times faster and
+reported at full scale.
+
+    on request   create_suggestion starts when /api/suggestion arrives
+    speculative  SpeculativeSuggestions, attached to on request
+
+    python -m api.benchmarks.speculative
+"""
+
+import json
+import asyncio
+from pathlib import Path
+from statistics import mean
+from time import perf_counter
+from typing import List
+
+from api.suggestions import SimpleMessage
+from api.suggestions.speculative import ProductMentions, SpeculativeSuggestions
+
+TURN_MS = 4000
+REQUEST_MS = 500
+DEBOUNCE_MS = 200
+TTFT_MS = 1500
+CHUNK_MS = 40
+CHUNKS = 120
+SCALE = 20
+
+base = Path(__file__).parent.parent
+dataset = base / "tests" / "writeup.jsonl"
+products = json.loads((base / "products.json").read_text())
+
+
+class Generator:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, customer: str, messages: List[SimpleMessage]):
+        self.calls += 1
+        await asyncio.sleep(TTFT_MS / 1000 / SCALE)
+        for i in range(CHUNKS):
+            if i > 0:
+                await asyncio.sleep(CHUNK_MS / 1000 / SCALE)
+            yield f"chunk {i} "
+
+
+async def call(record, speculative: bool, generate: Generator):
+    messages = [SimpleMessage(**m) for m in record["messages"]]
+    at = record["requested_at"]
+    suggestions = SpeculativeSuggestions(
+        generate, ProductMentions(products), debounce=DEBOUNCE_MS / 1000 / SCALE
+    )
+    suggestions.start("thread", "Seth", [])
+
+    for i, message in enumerate(messages):
+        await asyncio.sleep(TURN_MS / 1000 / SCALE)
+        if speculative:
+            suggestions.observe("thread", message.name, message.text)
+        if i == at:
+            break
+    if at is None:
+        await suggestions.close()
+        return None
+
+    await asyncio.sleep(REQUEST_MS / 1000 / SCALE)
+    start = perf_counter()
+    entry = suggestions.attach("thread") if speculative else None
+    stream = entry.replay() if entry is not None else generate("Seth", messages)
+    first = None
+    async for _ in stream:
+        if first is None:
+            first = perf_counter() - start
+    total = perf_counter() - start
+    await suggestions.close()
+    return first * 1000 * SCALE, total * 1000 * SCALE
+
+
+async def measure(speculative: bool):
+    records = [json.loads(line) for line in dataset.read_text().splitlines()]
+    generate = Generator()
+    results = await asyncio.gather(
+        *[call(record, speculative, generate) for record in records]
+    )
+    results = [r for r in results if r is not None]
+    return {
+        "first chunk ms": mean(r[0] for r in results),
+        "complete ms": mean(r[1] for r in results),
+        "requests": len(results),
+        "generations": generate.calls,
+    }
+
+
+async def run():
+    results = {
+        "on request": await measure(False),
+        "speculative": await measure(True),
+    }
+    columns = list(results["on request"].keys())
+    print(f"{'':>12}" + "".join(f"{c:>16}" for c in columns))
+    for name, result in results.items():
+        print(
+            f"{name:>12}"
+            + "".join(
+                f"{result[c]:>16.0f}" if isinstance(result[c], float) else f"{result[c]:>16}"
+                for c in columns
+            )
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
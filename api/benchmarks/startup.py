@@ -0,0 +1,141 @@
+"""
+Cold start of the API: importing api.main in a fresh interpreter (what
+every worker and scaled out container pays before serving), the time until
+uvicorn answers, and what the prompts cost on first use now that they are
+loaded lazily.
+
+The breakdown is from ``python -X importtime``: the slowest imports made
+by api.main (cumulative) and the top level packages by their own time.
+
+    python -m api.benchmarks.startup [runs]
+
+api/tests/test_startup.py keeps the modules in DEFERRED out of the import
+and the import under a time budget.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import statistics
+import tempfile
+import subprocess
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple
+
+from api.benchmarks.load import AppProcess
+
+# only loaded once used: the azure invoker of prompty (azure.identity), the
+# App Insights exporter, redis and the realtime connection resources
+DEFERRED = (
+    "prompty.azure",
+    "azure.identity",
+    "azure.monitor.opentelemetry.exporter",
+    "redis",
+    "openai.resources.beta.realtime",
+)
+
+ENV = {
+    "AZURE_OPENAI_ENDPOINT": "https://localhost",
+    "AZURE_OPENAI_API_KEY": "fake_key",
+    "LOCAL_TRACING_ENABLED": "true",
+}
+
+_IMPORT = """
+import sys, json, time
+start = time.perf_counter()
+import api.main
+imported = time.perf_counter() - start
+deferred = [m for m in json.loads(sys.argv[1]) if m in sys.modules]
+start = time.perf_counter()
+api.main.load_prompts()
+prompts = time.perf_counter() - start
+print(json.dumps([imported, prompts, deferred]))
+"""
+
+
+class ImportTime(NamedTuple):
+    name: str
+    depth: int
+    # microseconds
+    own: int
+    cumulative: int
+
+
+root = Path(__file__).parent.parent.parent
+
+
+def python(*args: str, env: Dict[str, str] = {}) -> subprocess.CompletedProcess:
+    # run elsewhere, local tracing writes the prompt loads to ./.runs
+    with tempfile.TemporaryDirectory() as cwd:
+        return subprocess.run(
+            [sys.executable, *args],
+            env={**os.environ, **ENV, "PYTHONPATH": str(root), **env},
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+
+def import_api(env: Dict[str, str] = {}) -> Tuple[float, float, List[str]]:
+    """
+    Seconds to import api.main and then to load the prompts, in a new
+    interpreter, and which of the DEFERRED modules the import loaded.
+    """
+    result = python("-c", _IMPORT, json.dumps(DEFERRED), env=env)
+    imported, prompts, deferred = json.loads(result.stdout.splitlines()[-1])
+    return imported, prompts, deferred
+
+
+def import_times(env: Dict[str, str] = {}) -> List[ImportTime]:
+    result = python("-X", "importtime", "-c", "import api.main", env=env)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append(ImportTime(name.strip(), depth, int(own), int(cumulative)))
+    return times
+
+
+async def ready() -> float:
+    # tracing to the (closed) exporter of the load test, nothing written locally
+    app = AppProcess({**ENV, "LOCAL_TRACING_ENABLED": "false"})
+    start = time.perf_counter()
+    await app.start()
+    elapsed = time.perf_counter() - start
+    await app.stop()
+    return elapsed
+
+
+def run(runs: int = 5):
+    results = [import_api() for _ in range(runs)]
+    imported = statistics.median(r[0] for r in results) * 1000
+    prompts = statistics.median(r[1] for r in results) * 1000
+    deferred = sorted({m for r in results for m in r[2]})
+    print(f"import api.main    {imported:>6.0f} ms (median of {runs})")
+    print(f"prompts, first use {prompts:>6.0f} ms")
+    print(f"deferred modules imported: {', '.join(deferred) or 'none'}")
+    print(f"uvicorn ready      {asyncio.run(ready()) * 1000:>6.0f} ms")
+
+    times = import_times()
+    main = next(t for t in times if t.name == "api.main")
+    print("\nslowest imports of api.main (cumulative ms)")
+    children = [t for t in times if t.depth == main.depth + 1]
+    for t in sorted(children, key=lambda t: t.cumulative, reverse=True)[:12]:
+        print(f"  {t.cumulative / 1000:>7.1f}  {t.name}")
+
+    packages: Counter = Counter()
+    for t in times:
+        packages[t.name.split(".")[0]] += t.own
+    print("\nown time by package (ms)")
+    for name, own in packages.most_common(12):
+        print(f"  {own / 1000:>7.1f}  {name}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
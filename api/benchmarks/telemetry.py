@@ -0,0 +1,125 @@
+"""
+OpenTelemetry tracing overhead per chat turn, with the exporter mocked.
+A turn traces what prompty does for chat.prompty: the call inputs (catalog,
+purchases, image), the prepared messages and the completion.
+
+    unbounded  every value flattened into attributes (the old verbose_trace)
+    budgeted   attribute budget, truncation and redaction (the defaults)
+    head 10%   budgeted, one in ten traces recorded
+
+    python -m api.benchmarks.telemetry [turns]
+"""
+
+import sys
+import json
+import base64
+import logging
+from pathlib import Path
+from time import perf_counter
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from prompty.tracer import Tracer
+
+from api.catalog import PRODUCTS, PURCHASES
+from api.telemetry import GenAIOTel, base_path
+
+chat_path = Path(__file__).parent.parent / "chat"
+
+
+def turn_values():
+    catalog = json.loads(PRODUCTS.read_text())
+    purchases = json.loads(PURCHASES.read_text())
+    image = "data:image/jpeg;base64," + base64.b64encode(
+        (chat_path / "winter.jpg").read_bytes()
+    ).decode("ascii")
+    question = "My friend just sent me this, do I have the right gear?"
+    inputs = {
+        "customer": "Seth",
+        "question": question,
+        "context": [],
+        "catalog": catalog,
+        "purchases": purchases,
+        "image": image,
+    }
+    messages = [
+        {"role": "system", "content": "You are an AI retail assistant. " * 200},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": question},
+                {"type": "image_url", "image_url": {"url": image}},
+            ],
+        },
+    ]
+    result = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "model": "gpt-4o-mini",
+        "choices": [
+            {"message": {"role": "assistant", "content": '{"response": "..."}'}}
+        ],
+        "usage": {"prompt_tokens": 3000, "completion_tokens": 120, "total_tokens": 3120},
+    }
+    return inputs, messages, result
+
+
+def chat_turn(inputs, messages, result):
+    with Tracer.start("execute") as trace:
+        trace("inputs", inputs)
+        with Tracer.start("prepare") as prepare:
+            prepare("inputs", {"data": inputs})
+            prepare("result", messages)
+        with Tracer.start("AzureOpenAIExecutor") as run:
+            run("inputs", {"messages": messages})
+            run("result", result)
+        trace("result", result)
+
+
+def measure(otel: GenAIOTel, exporter: InMemorySpanExporter, turns: int):
+    Tracer.clear()
+    Tracer.add("OpenTelemetry", otel.trace_span)
+    values = turn_values()
+    exporter.clear()
+    start = perf_counter()
+    for _ in range(turns):
+        chat_turn(*values)
+    elapsed = perf_counter() - start
+    spans = exporter.get_finished_spans()
+    size = sum(
+        len(str(key)) + len(str(value))
+        for span in spans
+        for key, value in (span.attributes or {}).items()
+    )
+    Tracer.clear()
+    return elapsed / turns, len(spans), size / turns
+
+
+def create(sampler=None, **kwargs):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(sampler=sampler) if sampler else TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    otel = GenAIOTel(base_path / "semantic-mapper.json", provider=provider, **kwargs)
+    return otel, exporter
+
+
+def run(turns: int = 200):
+    # the SDK warns for every attribute over its own limit (128) when unbounded
+    logging.getLogger("opentelemetry").setLevel(logging.ERROR)
+    configs = [
+        ("unbounded", create(max_attributes=None, max_value_size=None, redact=())),
+        ("budgeted", create()),
+        ("head 10%", create(sampler=ParentBased(TraceIdRatioBased(0.1)))),
+    ]
+    print(f"{'':>10} {'us/turn':>10} {'spans':>7} {'attr bytes/turn':>16}")
+    for name, (otel, exporter) in configs:
+        elapsed, spans, size = measure(otel, exporter, turns)
+        print(f"{name:>10} {elapsed * 1e6:>10.0f} {spans:>7} {size:>16.0f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,62 @@
+"""
+Per request cost of getting the transcript to the suggestion routes: the
+client posting the whole message list (payload size and request parsing)
+against only a thread id with the transcript read from the store.
+
+    python -m api.benchmarks.transcripts
+"""
+
+import json
+import tempfile
+import timeit
+from pathlib import Path
+from typing import List
+
+from pydantic import TypeAdapter
+
+from api.store import MemoryTranscriptStore, SqliteTranscriptStore
+from api.suggestions import SimpleMessage
+
+dataset = Path(__file__).parent.parent / "tests" / "writeup.jsonl"
+adapter = TypeAdapter(List[SimpleMessage])
+
+
+def conversation(length: int) -> List[SimpleMessage]:
+    texts = [
+        SimpleMessage(**m)
+        for line in dataset.read_text().splitlines()
+        for m in json.loads(line)["messages"]
+    ]
+    return [texts[i % len(texts)] for i in range(length)]
+
+
+def run(number: int = 200):
+    with tempfile.TemporaryDirectory() as directory:
+        memory = MemoryTranscriptStore()
+        sqlite = SqliteTranscriptStore(Path(directory) / "transcripts.db")
+
+        print(
+            f"{'messages':>10}{'payload bytes':>16}{'parse us':>12}"
+            f"{'memory us':>12}{'sqlite us':>12}"
+        )
+        for length in (10, 40, 160):
+            messages = conversation(length)
+            thread = f"thread-{length}"
+            memory.extend(thread, messages)
+            sqlite.extend(thread, messages)
+
+            payload = adapter.dump_json(messages)
+            parse = timeit.timeit(lambda: adapter.validate_json(payload), number=number)
+            from_memory = timeit.timeit(lambda: memory.messages(thread), number=number)
+            from_sqlite = timeit.timeit(lambda: sqlite.messages(thread), number=number)
+            print(
+                f"{length:>10}{len(payload):>16}"
+                f"{parse / number * 1e6:>12.1f}"
+                f"{from_memory / number * 1e6:>12.1f}"
+                f"{from_sqlite / number * 1e6:>12.1f}"
+            )
+        sqlite.close()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,88 @@
+"""
+Time-to-first-audio for a voice call against the local realtime stand-in:
+connect, session.update, response.create, first response.audio.delta.
+
+    per-call   new AsyncAzureOpenAI (and http client) for every call
+    shared     one client for all calls, as created in the app lifespan
+
+    python -m api.benchmarks.voice_latency [calls] [concurrency]
+"""
+
+import sys
+import asyncio
+import statistics
+from time import perf_counter
+from typing import List
+
+from openai import AsyncAzureOpenAI
+
+from api.benchmarks.fakes import FakeRealtimeServer
+from api.voice import RealtimeClient
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    index = min(int(round(p / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def create_client(url: str) -> AsyncAzureOpenAI:
+    return AsyncAzureOpenAI(
+        azure_endpoint="https://localhost",
+        api_key="fake_key",
+        api_version="2024-10-01-preview",
+        websocket_base_url=url,
+    )
+
+
+async def first_audio(client: AsyncAzureOpenAI):
+    async with client.beta.realtime.connect(model="gpt-4o-realtime-preview") as conn:
+        session = RealtimeClient(realtime=conn, client=None)  # type: ignore
+        await session.update_realtime_session("You are a helpful assistant.")
+        await conn.response.create()
+        async for event in conn:
+            if event.type == "response.audio.delta":
+                return
+    raise RuntimeError("no audio received")
+
+
+async def measure(url: str, shared: bool, calls: int, concurrency: int) -> List[float]:
+    client = create_client(url) if shared else None
+    limit = asyncio.Semaphore(concurrency)
+
+    async def call():
+        async with limit:
+            start = perf_counter()
+            current = client or create_client(url)
+            try:
+                await first_audio(current)
+                return perf_counter() - start
+            finally:
+                if client is None:
+                    await current.close()
+
+    try:
+        return await asyncio.gather(*[call() for _ in range(calls)])
+    finally:
+        if client is not None:
+            await client.close()
+
+
+async def run(calls: int = 50, concurrency: int = 10):
+    async with FakeRealtimeServer(first_delay=0.0) as server:
+        print(f"{'':>10} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+        for name, shared in [("per-call", False), ("shared", True)]:
+            timings = [t * 1000 for t in await measure(server.url, shared, calls, concurrency)]
+            print(
+                f"{name:>10} {percentile(timings, 50):>8.2f} "
+                f"{percentile(timings, 99):>8.2f} {statistics.mean(timings):>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        run(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+        )
+    )
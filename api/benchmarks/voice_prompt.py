@@ -0,0 +1,58 @@
+"""
+Voice system prompt render time and size per call.
+
+    per-call   walks the whole catalog and purchase list on every call
+               (what script.jinja2 used to do)
+    cached     joins the pre-rendered blocks from VoicePrompt, full catalog
+    top-k      cached blocks, only the products retrieved for the chat
+
+    python -m api.benchmarks.voice_prompt
+"""
+
+import timeit
+from api.catalog import Catalog
+from api.chat.context import estimate_tokens
+from api.voice.prompt import VoicePrompt
+
+CUSTOMER = "Seth"
+CONTEXT = [
+    {"name": "user", "text": "I'm going snow camping next weekend, what should I bring?"},
+    {"name": "assistant", "text": "Sounds fun! Do you have a warm sleeping bag yet?"},
+    {"name": "user", "text": "No, and my tent collapsed last time. Can you call me?"},
+]
+
+
+def run(number: int = 2000, k: int = 5):
+    prompt = VoicePrompt(Catalog())
+    query = " ".join(item["text"] for item in CONTEXT)
+    relevant = prompt.index.search(query, k=k)
+
+    def per_call():
+        return prompt.env.get_template("script.jinja2").render(
+            customer=CUSTOMER,
+            context=CONTEXT,
+            purchases="\n".join(prompt._render_product(p) for p in prompt.purchases),
+            products="\n".join(prompt._render_product(p) for p in prompt.products),
+        )
+
+    def cached():
+        prompt.refresh()
+        return prompt.render(CUSTOMER, CONTEXT, prompt.products)
+
+    def top_k():
+        prompt.refresh()
+        return prompt.render(CUSTOMER, CONTEXT, prompt.index.search(query, k=k))
+
+    assert per_call() == cached()
+
+    print(f"{'':>10} {'us/call':>10} {'chars':>8} {'~tokens':>8}")
+    for name, fn in [("per-call", per_call), ("cached", cached), ("top-k", top_k)]:
+        elapsed = min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+        text = fn()
+        print(f"{name:>10} {elapsed:>10.1f} {len(text):>8} {estimate_tokens(text):>8}")
+
+    print(f"catalog {len(prompt.products)} products, top-k {len(relevant)}")
+
+
+if __name__ == "__main__":
+    run()
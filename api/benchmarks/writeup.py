@@ -0,0 +1,159 @@
+"""
+Write up detection over the recorded transcripts in api/tests/writeup.jsonl,
+called after every assistant message as the voice client does.
+
+    full         writeup.prompty over the whole transcript on every call
+    incremental  WriteupDetector: keyword pass on new messages, prompty on
+                 the last few messages only when unsure
+    keywords     WriteupDetector answering unsure with the patterns alone
+                 (YES for a clear ask echoed by the assistant)
+
+Offline the model is a stand-in that answers from the transcript labels
+(an echoed ask inside the messages it is given) with a latency of
+LLM_BASE_MS + LLM_MS_PER_TOKEN per input token. It measures calls, tokens
+and latency only: its answers are the labels, so the accuracy of full and
+incremental is not reported. With --live the real writeup.prompty is called
+(needs the Azure OpenAI settings) and every accuracy is reported.
+
+    python -m api.benchmarks.writeup [--live]
+"""
+
+import sys
+import json
+import asyncio
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, List
+
+from api.chat.context import estimate_tokens
+from api.suggestions import SimpleMessage
+from api.suggestions.writeup import ECHO, STRONG_ASK, WriteupDetector
+
+LLM_BASE_MS = 350
+LLM_MS_PER_TOKEN = 0.05
+# tokens of writeup.prompty around the transcript
+PROMPT_TOKENS = 900
+
+dataset = Path(__file__).parent.parent / "tests" / "writeup.jsonl"
+
+
+def load() -> List[Dict[str, Any]]:
+    records = []
+    for line in dataset.read_text().splitlines():
+        record = json.loads(line)
+        record["messages"] = [SimpleMessage(**m) for m in record["messages"]]
+        records.append(record)
+    return records
+
+
+class Model:
+    def __init__(self, live: bool = False):
+        self.live = live
+        self.calls = 0
+        self.tokens = 0
+        self.latency = 0.0
+        self.echoes: List[SimpleMessage] = []
+
+    async def __call__(self, messages: List[SimpleMessage]) -> bool:
+        self.calls += 1
+        tokens = PROMPT_TOKENS + sum(estimate_tokens(m.text) + 2 for m in messages)
+        self.tokens += tokens
+        if self.live:
+            from api.suggestions import suggestion_requested
+
+            start = perf_counter()
+            result = await suggestion_requested(messages)
+            self.latency += perf_counter() - start
+            return result
+        self.latency += (LLM_BASE_MS + tokens * LLM_MS_PER_TOKEN) / 1000
+        return any(any(m is e for e in self.echoes) for m in messages)
+
+
+def checkpoints(messages: List[SimpleMessage]) -> List[int]:
+    # the client asks after each assistant message (and here, at the end)
+    points = [i + 1 for i, m in enumerate(messages) if m.name == "assistant"]
+    if len(points) == 0 or points[-1] != len(messages):
+        points.append(len(messages))
+    return points
+
+
+async def evaluate(
+    records: List[Dict[str, Any]],
+    strategy: Callable[[Model], Callable[[List[SimpleMessage]], Awaitable[bool]]],
+    live: bool,
+):
+    model = Model(live)
+    correct = total = 0
+    local = 0.0
+    for record in records:
+        messages = record["messages"]
+        at = record["requested_at"]
+        model.echoes = [messages[at]] if at is not None else []
+        check = strategy(model)
+        for point in checkpoints(messages):
+            expected = at is not None and point > at
+            start = perf_counter()
+            latency = model.latency
+            result = await check(messages[:point])
+            local += perf_counter() - start
+            if live:
+                local -= model.latency - latency
+            correct += result == expected
+            total += 1
+    return {
+        "accuracy": correct / total,
+        "requests": total,
+        "llm calls": model.calls,
+        "tokens": model.tokens,
+        "llm ms/request": model.latency / total * 1000,
+        "local us/request": local / total * 1e6,
+    }
+
+
+def full(model: Model):
+    return model
+
+
+def incremental(model: Model):
+    return WriteupDetector(model).update
+
+
+def keywords(model: Model):
+    async def patterns(messages: List[SimpleMessage]) -> bool:
+        asked = False
+        for message in messages:
+            if message.name == "user":
+                asked = asked or STRONG_ASK.search(message.text) is not None
+            elif asked and ECHO.search(message.text):
+                return True
+        return False
+
+    return WriteupDetector(patterns).update
+
+
+async def run(live: bool = False):
+    records = load()
+    print(f"{len(records)} transcripts")
+    results = {
+        "full": await evaluate(records, full, live),
+        "incremental": await evaluate(records, incremental, live),
+        "keywords": await evaluate(records, keywords, live),
+    }
+    if not live:
+        # the stand-in answers from the labels
+        results["full"]["accuracy"] = "-"
+        results["incremental"]["accuracy"] = "-"
+    columns = list(results["full"].keys())
+    print(f"{'':>12}" + "".join(f"{c:>18}" for c in columns))
+    for name, result in results.items():
+        print(
+            f"{name:>12}"
+            + "".join(
+                f"{result[c]:>18.3f}" if isinstance(result[c], float) else f"{result[c]:>18}"
+                for c in columns
+            )
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(run("--live" in sys.argv))
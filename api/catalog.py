@@ -0,0 +1,162 @@
+import os
+import json
+import time
+from pathlib import Path
+from types import MappingProxyType
+from collections import defaultdict
+from typing import Any, Dict, List, Mapping, NamedTuple, Tuple, Union
+
+from api.retrieval import ProductIndex
+
+base_path = Path(__file__).parent
+
+# NOTE: This would generally be accomplished by querying a database
+PRODUCTS = base_path / "products.json"
+PURCHASES = base_path / "purchases.json"
+
+Product = Dict[str, Any]
+
+
+class FrozenProduct(dict):
+    """
+    A catalog product as loaded, read only: it is shared by every snapshot
+    user and handed to the prompts as is. Still a dict, so templates, json
+    and the tracer see a plain product.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("catalog products are read only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenProduct, (dict(self),))
+
+
+def freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return FrozenProduct({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class CatalogSnapshot(NamedTuple):
+    """
+    One version of the catalog, never changed once built: a reload builds a
+    new snapshot, so whoever holds one sees a consistent catalog. The
+    products are shared by every index and the prompts, and frozen (see
+    FrozenProduct).
+    """
+
+    products: Tuple[Product, ...]
+    purchases: Tuple[Product, ...]
+    by_id: Mapping[Any, Product]
+    # lowercased name, category and brand
+    by_name: Mapping[str, Product]
+    by_category: Mapping[str, Tuple[Product, ...]]
+    by_brand: Mapping[str, Tuple[Product, ...]]
+    index: ProductIndex
+
+    @classmethod
+    def build(cls, products: List[Product], purchases: List[Product]):
+        products = [freeze(product) for product in products]
+        purchases = [freeze(purchase) for purchase in purchases]
+        by_category: Dict[str, List[Product]] = defaultdict(list)
+        by_brand: Dict[str, List[Product]] = defaultdict(list)
+        for product in products:
+            by_category[str(product.get("category", "")).lower()].append(product)
+            by_brand[str(product.get("brand", "")).lower()].append(product)
+        return cls(
+            products=tuple(products),
+            purchases=tuple(purchases),
+            by_id=MappingProxyType({p["id"]: p for p in products}),
+            by_name=MappingProxyType({p["name"].lower(): p for p in products}),
+            by_category=MappingProxyType({k: tuple(v) for k, v in by_category.items()}),
+            by_brand=MappingProxyType({k: tuple(v) for k, v in by_brand.items()}),
+            index=ProductIndex(products),
+        )
+
+    def get(self, id: Any) -> Union[Product, None]:
+        return self.by_id.get(id)
+
+    def named(self, name: str) -> Union[Product, None]:
+        return self.by_name.get(name.lower())
+
+    def in_category(self, category: str) -> Tuple[Product, ...]:
+        return self.by_category.get(category.lower(), ())
+
+    def from_brand(self, brand: str) -> Tuple[Product, ...]:
+        return self.by_brand.get(brand.lower(), ())
+
+
+class Catalog:
+    """
+    Products and purchases loaded once per process and shared by the chat,
+    suggestion and voice prompts. ``current()`` checks the files for changes
+    at most every ``interval`` seconds (0 on every call) and swaps in a new
+    snapshot when they did; a file that is missing or does not parse keeps
+    the last one.
+    """
+
+    def __init__(
+        self,
+        products_path: Union[str, Path] = PRODUCTS,
+        purchases_path: Union[str, Path] = PURCHASES,
+        interval: float = 5.0,
+    ):
+        self.products_path = Path(products_path)
+        self.purchases_path = Path(purchases_path)
+        self.interval = interval
+        self.version = 0
+        self._mtimes: Tuple[float, float] = (0.0, 0.0)
+        self._checked = 0.0
+        self.snapshot = CatalogSnapshot.build([], [])
+        self.refresh()
+
+    def _stat(self) -> Tuple[float, float]:
+        return (
+            os.stat(self.products_path).st_mtime,
+            os.stat(self.purchases_path).st_mtime,
+        )
+
+    def refresh(self) -> bool:
+        self._checked = time.monotonic()
+        try:
+            mtimes = self._stat()
+            if mtimes == self._mtimes:
+                return False
+            products = json.loads(self.products_path.read_text(encoding="utf-8"))
+            purchases = json.loads(self.purchases_path.read_text(encoding="utf-8"))
+            snapshot = CatalogSnapshot.build(products, purchases)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            # missing file or malformed products, e.g. "name": null
+            print(f"Error reloading catalog: {e}")
+            return False
+        self._mtimes = mtimes
+        self.snapshot = snapshot
+        self.version += 1
+        return True
+
+    def current(self) -> CatalogSnapshot:
+        if time.monotonic() - self._checked >= self.interval:
+            self.refresh()
+        return self.snapshot
+
+
+_default: Union[Catalog, None] = None
+
+
+def default_catalog() -> Catalog:
+    """The catalog at api/products.json and api/purchases.json."""
+    global _default
+    if _default is None:
+        _default = Catalog()
+    return _default
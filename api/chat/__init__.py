@@ -1,11 +1,17 @@
 import json
-from typing import List, Union
+import time
+from typing import Awaitable, Callable, List, Union
 import prompty
-import prompty.azure
+from pathlib import Path
 from prompty.tracer import trace
 
+from api import lazy_prompty
+from api.catalog import Catalog, default_catalog
+from api.chat.stream import JsonFieldStream
+from api.metrics import llm_duration, llm_time_to_first_token, timed
 
-chat_prompty = prompty.load("chat.prompty")
+
+chat_prompty = lazy_prompty(Path(__file__).parent / "chat.prompty")
 
 
 @trace
@@ -14,14 +20,48 @@ async def create_response(
     question: str,
     context: List[str] = [],
     image: Union[str, None] = None,
+    on_delta: Union[Callable[[str], Awaitable[None]], None] = None,
+    catalog: Union[Catalog, None] = None,
 ):
-    inputs = {"customer": customer, "question": question, "context": context}
+    """
+    With ``on_delta`` the response is streamed: the text of its "response"
+    field is passed on as it arrives, the whole object is still returned.
+    Purchases come from ``catalog``, the default catalog unless given.
+    """
+    snapshot = (catalog or default_catalog()).current()
+    inputs = {
+        "customer": customer,
+        "question": question,
+        "context": context,
+        "purchases": list(snapshot.purchases),
+    }
     if image:
         inputs["image"] = image
 
-    response = await prompty.execute_async(chat_prompty, inputs=inputs)
-    r = json.loads(response)
-    return r
+    if on_delta is None:
+        with timed(llm_duration, prompt="chat"):
+            response = await prompty.execute_async(chat_prompty(), inputs=inputs)
+        r = json.loads(response)
+        return r
+
+    start = time.perf_counter()
+    result = await prompty.execute_async(
+        chat_prompty(), parameters={"stream": True}, inputs=inputs
+    )
+    stream = JsonFieldStream("response")
+    first = True
+    async for chunk in result:
+        delta = stream.feed(chunk)
+        if len(delta) > 0:
+            if first:
+                llm_time_to_first_token.record(
+                    time.perf_counter() - start, {"prompt": "chat"}
+                )
+                first = False
+            await on_delta(delta)
+
+    llm_duration.record(time.perf_counter() - start, {"prompt": "chat"})
+    return stream.result()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,78 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple, Union
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text, good enough for budgeting
+    return (len(text) + 3) // 4
+
+
+class ChatContext:
+    """
+    Rolling context for chat.prompty.
+
+    The "context" summary the model returns each turn is already cumulative,
+    so only the latest one is kept along with the last few exchanges. When the
+    rendered context goes over the token budget it is compacted: the oldest
+    exchanges are dropped first, then the summary is trimmed to its most
+    recent part.
+    """
+
+    token_budget: int = 1500
+    max_turns: int = 4
+
+    def __init__(
+        self,
+        token_budget: Union[int, None] = None,
+        max_turns: Union[int, None] = None,
+    ):
+        if token_budget is not None:
+            self.token_budget = token_budget
+        if max_turns is not None:
+            self.max_turns = max_turns
+        self.summary: Union[str, None] = None
+        self.turns: Deque[Tuple[str, str]] = deque(maxlen=self.max_turns)
+        self.compactions = 0
+
+    def add(self, question: str, response: str, summary: Union[str, None]):
+        if summary:
+            self.summary = summary
+        self.turns.append((question, response))
+        if self.tokens() > self.token_budget:
+            self.compact()
+
+    def items(self) -> List[str]:
+        items = []
+        if self.summary:
+            items.append(f"Summary so far: {self.summary}")
+        for question, response in self.turns:
+            items.append(f"Customer asked: {question}\n  You answered: {response}")
+        return items
+
+    def tokens(self) -> int:
+        return sum(estimate_tokens(item) for item in self.items())
+
+    def compact(self):
+        self.compactions += 1
+        while len(self.turns) > 0 and self.tokens() > self.token_budget:
+            self.turns.popleft()
+
+        if self.summary and self.tokens() > self.token_budget:
+            # keep the tail, later turns are appended to the cumulative summary
+            keep = max(self.token_budget * 4 - len("Summary so far: ... "), 0)
+            self.summary = "..." + self.summary[-keep:] if keep > 0 else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "summary": self.summary,
+            "turns": [list(turn) for turn in self.turns],
+            "compactions": self.compactions,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChatContext":
+        context = cls()
+        context.summary = data.get("summary")
+        context.turns.extend(tuple(turn) for turn in data.get("turns", []))
+        context.compactions = data.get("compactions", 0)
+        return context
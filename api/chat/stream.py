@@ -0,0 +1,131 @@
+import re
+import json
+from typing import Any, Dict, List, Union
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+_special = re.compile(r'["\\]')
+
+
+class JsonFieldStream:
+    """
+    Incremental reader for one top level string field of a JSON object that
+    arrives in chunks, e.g. the "response" of chat.prompty's structured
+    output. ``feed`` returns the decoded text of the field each chunk adds
+    (escapes split across chunks included); the whole object is parsed by
+    ``result`` once it is complete.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.chunks: List[str] = []
+        self.depth = 0
+        # inside a string that is not streamed, and after its backslash
+        self.in_string = False
+        self.escaped = False
+        # object keys at the top level, and the key of the current value
+        self.expect_key = False
+        self.in_key = False
+        self.key: List[str] = []
+        self.value_of: Union[str, None] = None
+        # inside the field's value, with an incomplete escape sequence
+        self.streaming = False
+        self.done = False
+        self.pending = ""
+        self.high: Union[int, None] = None
+
+    def feed(self, chunk: str) -> str:
+        self.chunks.append(chunk)
+        out: List[str] = []
+        i, n = 0, len(chunk)
+        while i < n:
+            if self.streaming and not self.pending:
+                # plain text up to the next quote or escape in one go
+                match = _special.search(chunk, i)
+                end = match.start() if match else n
+                if end > i:
+                    out.append(chunk[i:end])
+                    i = end
+                    continue
+            ch = chunk[i]
+            i += 1
+            if self.streaming:
+                self._stream(ch, out)
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                    if self.in_key:
+                        self.key.append(_ESCAPES.get(ch, ch))
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.in_key:
+                        self.in_key = False
+                        self.value_of = "".join(self.key)
+                elif self.in_key:
+                    self.key.append(ch)
+            elif ch == '"':
+                if self.depth == 1 and self.expect_key:
+                    self.expect_key = False
+                    self.in_key = True
+                    self.key = []
+                    self.in_string = True
+                elif self.depth == 1 and self.value_of == self.field and not self.done:
+                    self.streaming = True
+                else:
+                    self.in_string = True
+            elif ch == "{" or ch == "[":
+                self.depth += 1
+                if self.depth == 1 and ch == "{":
+                    self.expect_key = True
+            elif ch == "}" or ch == "]":
+                self.depth -= 1
+            elif ch == "," and self.depth == 1:
+                self.expect_key = True
+                self.value_of = None
+        return "".join(out)
+
+    def _stream(self, ch: str, out: List[str]):
+        if self.pending:
+            self.pending += ch
+            if self.pending[1] != "u":
+                out.append(_ESCAPES.get(ch, ch))
+                self.pending = ""
+                return
+            if len(self.pending) < 6:
+                return
+            code = int(self.pending[2:], 16)
+            self.pending = ""
+            if self.high is not None:
+                high, self.high = self.high, None
+                if 0xDC00 <= code < 0xE000:
+                    out.append(chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00)))
+                    return
+                out.append("\ufffd")
+            if 0xD800 <= code < 0xDC00:
+                # the low half of the pair follows
+                self.high = code
+                return
+            out.append(chr(code))
+        elif ch == "\\":
+            self.pending = ch
+        elif ch == '"':
+            self.streaming = False
+            self.done = True
+        else:
+            out.append(ch)
+
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def result(self) -> Dict[str, Any]:
+        return json.loads(self.text())
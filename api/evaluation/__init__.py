@@ -0,0 +1,177 @@
+"""
+Batch evaluation of the chat prompt over a dataset of questions with
+ground truth answers (api/tests/sales.jsonl): responses are generated with
+bounded concurrency, cached by a hash of their inputs so the dataset can be
+re-scored without regenerating them, and scored with the local metrics
+(api.evaluation.metrics) in a process pool.
+
+    python -m api.evaluation --help
+"""
+
+import csv
+import time
+import asyncio
+import hashlib
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Union
+
+import orjson
+
+from api.evaluation.metrics import METRICS, score_batch
+
+BASE_PATH = Path(__file__).parent.parent
+DATASET = BASE_PATH / "tests" / "sales.jsonl"
+PROMPTS = [BASE_PATH / "chat" / "chat.prompty", BASE_PATH / "chat" / "schema.json"]
+
+# azure-ai-evaluation's default pass threshold for these metrics
+THRESHOLD = 0.5
+
+Create = Callable[[Dict[str, Any]], Awaitable[str]]
+
+
+def load_dataset(path: Union[str, Path] = DATASET) -> List[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+
+def prompt_version(paths: List[Path] = PROMPTS) -> str:
+    """Hash of the prompt files, a changed prompt misses the cache."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def chat_inputs(row: Dict[str, Any]) -> Dict[str, Any]:
+    # the dataset context grounds the answer like a summary of earlier turns
+    return {
+        "customer": row.get("customer", "Seth"),
+        "question": row["question"],
+        "context": [row["context"]] if row.get("context") else [],
+    }
+
+
+class OutputCache:
+    """
+    Model outputs by a hash of the prompt version and the inputs, appended
+    to a JSON lines file as they are generated (``path`` None keeps them in
+    memory only).
+    """
+
+    def __init__(self, path: Union[str, Path, None] = None, version: str = ""):
+        self.path = Path(path) if path is not None else None
+        self.version = version
+        self.outputs: Dict[str, str] = {}
+        if self.path is not None and self.path.exists():
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        item = orjson.loads(line)
+                        self.outputs[item["key"]] = item["output"]
+
+    def key(self, inputs: Dict[str, Any]) -> str:
+        data = orjson.dumps([self.version, inputs], option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, key: str) -> Union[str, None]:
+        return self.outputs.get(key)
+
+    def put(self, key: str, output: str):
+        self.outputs[key] = output
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(orjson.dumps({"key": key, "output": output}) + b"\n")
+
+
+class EvaluationRunner:
+    """
+    ``create`` generates the response for the inputs of one row (see
+    ``chat_inputs``), at most ``concurrency`` at a time. Scoring is split
+    into ``batch_size`` rows per task over ``workers`` processes, 0 scores
+    in this process.
+    """
+
+    def __init__(
+        self,
+        create: Create,
+        cache: Union[OutputCache, None] = None,
+        concurrency: int = 8,
+        workers: int = 4,
+        batch_size: int = 16,
+    ):
+        self.create = create
+        self.cache = cache if cache is not None else OutputCache()
+        self.concurrency = concurrency
+        self.workers = workers
+        self.batch_size = batch_size
+
+    async def generate(self, row: Dict[str, Any], limit: asyncio.Semaphore):
+        inputs = chat_inputs(row)
+        key = self.cache.key(inputs)
+        output = self.cache.get(key)
+        if output is not None:
+            return {"response": output, "cached": True, "seconds": 0.0, "error": ""}
+        async with limit:
+            start = time.perf_counter()
+            try:
+                output = await self.create(inputs)
+            except Exception as e:
+                print(f"Error generating response: {e}")
+                return {"response": "", "cached": False, "seconds": 0.0, "error": str(e)}
+            seconds = time.perf_counter() - start
+        self.cache.put(key, output)
+        return {"response": output, "cached": False, "seconds": seconds, "error": ""}
+
+    async def score(self, pairs: List[tuple]) -> List[Dict[str, float]]:
+        batches = [
+            pairs[i : i + self.batch_size]
+            for i in range(0, len(pairs), self.batch_size)
+        ]
+        if self.workers <= 0:
+            return [s for batch in batches for s in score_batch(batch)]
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            scored = await asyncio.gather(
+                *[loop.run_in_executor(executor, score_batch, b) for b in batches]
+            )
+        return [s for batch in scored for s in batch]
+
+    async def run(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        limit = asyncio.Semaphore(self.concurrency)
+        outputs = await asyncio.gather(*[self.generate(row, limit) for row in rows])
+        scores = await self.score(
+            [(output["response"], row["answer"]) for row, output in zip(rows, outputs)]
+        )
+        results = []
+        for row, output, scored in zip(rows, outputs, scores):
+            if output["error"]:
+                scored = {metric: None for metric in METRICS}
+            results.append(
+                {"question": row["question"], "answer": row["answer"], **output, **scored}
+            )
+        return results
+
+
+def write_results(results: List[Dict[str, Any]], path: Union[str, Path]):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    columns = ["question", "answer", "response", "cached", "seconds", *METRICS, "error"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Mean and pass rate (at THRESHOLD) per metric over the scored rows."""
+    summary = {}
+    for metric in METRICS:
+        values = [r[metric] for r in results if r[metric] is not None]
+        summary[metric] = {
+            "mean": statistics.mean(values) if values else 0.0,
+            "passed": sum(v >= THRESHOLD for v in values) / len(values) if values else 0.0,
+        }
+    return summary
@@ -0,0 +1,109 @@
+"""
+    python -m api.evaluation [--fake] [--limit N] [--concurrency N]
+                             [--workers N] [--cache PATH] [--out PATH]
+
+Runs the chat prompt over the dataset and writes one row per question with
+its scores to ``--out``. ``--fake`` runs offline against the chat
+completions stand-in (api.benchmarks.fakes), which answers each question
+with its dataset context.
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from api.benchmarks.fakes import FakeChatServer
+from api.chat import create_response
+from api.evaluation import (
+    BASE_PATH,
+    DATASET,
+    EvaluationRunner,
+    OutputCache,
+    load_dataset,
+    prompt_version,
+    summarize,
+    write_results,
+)
+
+OUTPUT = BASE_PATH / "tests" / ".evaluation"
+
+
+class DatasetChatServer(FakeChatServer):
+    """Replies to each dataset question with its context."""
+
+    def __init__(self, rows, **options: Any):
+        super().__init__(**options)
+        self.contexts = {row["question"]: row["context"] for row in rows}
+
+    def reply(self, body: Dict[str, Any]) -> Tuple[str, str]:
+        prompt, text = super().reply(body)
+        if prompt != "chat":
+            return prompt, text
+        content = str(body["messages"][-1].get("content", ""))
+        for question, context in self.contexts.items():
+            if question in content:
+                reply = {"response": context, "context": context, "call": 1}
+                return prompt, json.dumps(reply, ensure_ascii=False)
+        return prompt, text
+
+
+async def evaluate(args: argparse.Namespace, version: str):
+    rows = load_dataset(args.dataset)[: args.limit]
+
+    async def create(inputs: Dict[str, Any]) -> str:
+        response = await create_response(**inputs)
+        return response["response"]
+
+    runner = EvaluationRunner(
+        create,
+        OutputCache(args.cache, version),
+        concurrency=args.concurrency,
+        workers=args.workers,
+    )
+    start = time.perf_counter()
+    results = await runner.run(rows)
+    elapsed = time.perf_counter() - start
+    write_results(results, args.out)
+
+    cached = sum(r["cached"] for r in results)
+    failed = sum(bool(r["error"]) for r in results)
+    print(
+        f"{len(results)} rows in {elapsed:.1f}s: {len(results) - cached - failed} "
+        f"generated, {cached} cached, {failed} failed -> {args.out}"
+    )
+    print(f"{'':>10}{'mean':>8}{'passed':>8}")
+    for metric, values in summarize(results).items():
+        print(f"{metric:>10}{values['mean']:>8.3f}{values['passed']:>8.0%}")
+
+
+async def main(args: argparse.Namespace):
+    version = prompt_version()
+    if not args.fake:
+        await evaluate(args, version)
+        return
+    rows = load_dataset(args.dataset)
+    async with DatasetChatServer(rows, first_delay=args.delay) as server:
+        # read when the prompt is first used
+        os.environ["AZURE_OPENAI_ENDPOINT"] = server.url
+        os.environ["AZURE_OPENAI_API_KEY"] = "fake_key"
+        # outputs of the stand-in are kept apart from the model's
+        await evaluate(args, f"{version}-fake")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m api.evaluation")
+    parser.add_argument("--dataset", type=Path, default=DATASET)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cache", type=Path, default=OUTPUT / "outputs.jsonl")
+    parser.add_argument("--out", type=Path, default=OUTPUT / "results.csv")
+    parser.add_argument("--fake", action="store_true", help="offline stand-in")
+    parser.add_argument(
+        "--delay", type=float, default=0.3, help="stand-in first token delay"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,92 @@
+"""
+The local (non service) metrics of azure-ai-evaluation, scored a batch of
+rows at a time: each text is tokenized once and the tokens are shared by
+every metric, instead of one evaluator call per metric and row.
+
+    f1_score  F1ScoreEvaluator, token overlap after SQuAD normalization
+    rouge     RougeScoreEvaluator(RougeType.ROUGE_L), f1 of the longest
+              common subsequence
+    bleu      BleuScoreEvaluator, smoothed sentence BLEU
+    gleu      GleuScoreEvaluator, sentence GLEU
+
+BLEU and GLEU tokenize with nltk's word tokenizer but without its punkt
+sentence splitter, so no nltk data has to be downloaded.
+"""
+
+import re
+import string
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from nltk.tokenize import NLTKWordTokenizer
+from nltk.translate.bleu_score import SmoothingFunction, sentence_bleu
+from nltk.translate.gleu_score import sentence_gleu
+
+METRICS = ("f1_score", "rouge", "bleu", "gleu")
+
+_punctuation = str.maketrans("", "", string.punctuation)
+_articles = re.compile(r"\b(a|an|the)\b")
+_non_alphanumeric = re.compile(r"[^a-z0-9]+")
+_word_tokenizer = NLTKWordTokenizer()
+_smoothing = SmoothingFunction().method4
+
+
+def f1_tokens(text: str) -> List[str]:
+    text = text.lower().translate(_punctuation)
+    return _articles.sub(" ", text).split()
+
+
+def rouge_tokens(text: str) -> List[str]:
+    return _non_alphanumeric.sub(" ", text.lower()).split()
+
+
+def word_tokens(text: str) -> List[str]:
+    return _word_tokenizer.tokenize(text)
+
+
+def f1(response: Sequence[str], truth: Sequence[str]) -> float:
+    common = sum((Counter(response) & Counter(truth)).values())
+    if common == 0:
+        return 0.0
+    precision = common / len(response)
+    recall = common / len(truth)
+    return 2 * precision * recall / (precision + recall)
+
+
+def lcs(a: Sequence[str], b: Sequence[str]) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    row = [0] * (len(b) + 1)
+    for x in a:
+        previous = 0
+        for j, y in enumerate(b, 1):
+            current = row[j]
+            row[j] = previous + 1 if x == y else max(row[j], row[j - 1])
+            previous = current
+    return row[-1]
+
+
+def rouge_l(response: Sequence[str], truth: Sequence[str]) -> float:
+    if not response or not truth:
+        return 0.0
+    common = lcs(response, truth)
+    if common == 0:
+        return 0.0
+    precision = common / len(response)
+    recall = common / len(truth)
+    return 2 * precision * recall / (precision + recall)
+
+
+def score(response: str, truth: str) -> Dict[str, float]:
+    words, truth_words = word_tokens(response), word_tokens(truth)
+    return {
+        "f1_score": f1(f1_tokens(response), f1_tokens(truth)),
+        "rouge": rouge_l(rouge_tokens(response), rouge_tokens(truth)),
+        "bleu": sentence_bleu([truth_words], words, smoothing_function=_smoothing),
+        "gleu": sentence_gleu([truth_words], words),
+    }
+
+
+def score_batch(pairs: Sequence[Tuple[str, str]]) -> List[Dict[str, float]]:
+    """Scores (response, ground truth) pairs, one unit of work for a worker."""
+    return [score(response, truth) for response, truth in pairs]
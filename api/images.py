@@ -0,0 +1,140 @@
+import io
+import base64
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Literal, NamedTuple, Tuple
+
+from PIL import ExifTags, Image, ImageOps
+
+Format = Literal["JPEG", "WEBP"]
+
+
+class ProcessedImage(NamedTuple):
+    # sha256 of the uploaded image bytes, what clients send as image_ref
+    ref: str
+    data_url: str
+    width: int
+    height: int
+    original_size: int
+    size: int
+
+
+def split_data_url(data_url: str) -> Tuple[str, bytes]:
+    header, _, payload = data_url.partition(",")
+    if not header.startswith("data:") or not header.endswith(";base64"):
+        raise ValueError("Expected a base64 data url")
+    return header[len("data:") : -len(";base64")], base64.b64decode(payload)
+
+
+def image_ref(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ImagePipeline:
+    """
+    Chat uploads before they go to chat.prompty: decoded, downscaled to
+    ``max_dimension`` (EXIF orientation applied), re-encoded as compressed
+    JPEG or WebP and hashed. Decoding and encoding run in a thread pool so
+    they do not hold up the event loop; results are kept by hash so a
+    repeated upload is only processed once.
+    """
+
+    def __init__(
+        self,
+        max_dimension: int = 1024,
+        format: Format = "JPEG",
+        quality: int = 80,
+        workers: int = 2,
+        cache_size: int = 128,
+    ):
+        self.max_dimension = max_dimension
+        self.format = format
+        self.quality = quality
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, ProcessedImage]" = OrderedDict()
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="images"
+        )
+        self.metrics = {
+            "processed": 0,
+            "cached": 0,
+            "failed": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+        }
+
+    async def process(self, data_url: str) -> ProcessedImage:
+        loop = asyncio.get_running_loop()
+        media_type, data, ref = await loop.run_in_executor(
+            self.executor, self._read, data_url
+        )
+        processed = self.cache.get(ref)
+        if processed is not None:
+            self.cache.move_to_end(ref)
+            self.metrics["cached"] += 1
+            return processed
+
+        try:
+            processed = await loop.run_in_executor(
+                self.executor, self._convert, ref, media_type, data
+            )
+        except Exception:
+            self.metrics["failed"] += 1
+            raise
+        self.metrics["processed"] += 1
+        self.metrics["bytes_in"] += processed.original_size
+        self.metrics["bytes_out"] += processed.size
+        self.cache[ref] = processed
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return processed
+
+    def _read(self, data_url: str) -> Tuple[str, bytes, str]:
+        media_type, data = split_data_url(data_url)
+        return media_type, data, image_ref(data)
+
+    def _convert(self, ref: str, media_type: str, data: bytes) -> ProcessedImage:
+        target = (self.max_dimension, self.max_dimension)
+        with Image.open(io.BytesIO(data)) as image:
+            resized = max(image.size) > self.max_dimension
+            rotated = image.getexif().get(ExifTags.Base.Orientation, 1) != 1
+            if resized:
+                # JPEGs can be decoded at a fraction of their size directly
+                image.draft("RGB", target)
+            image = ImageOps.exif_transpose(image)
+            if resized:
+                image.thumbnail(target, Image.Resampling.LANCZOS)
+            if image.mode != "RGB":
+                if image.mode in ("RGBA", "LA", "P"):
+                    # transparent areas on white, as browsers show them
+                    image = image.convert("RGBA")
+                    background = Image.new("RGB", image.size, (255, 255, 255))
+                    background.paste(image, mask=image.getchannel("A"))
+                    image = background
+                else:
+                    image = image.convert("RGB")
+
+            buffer = io.BytesIO()
+            image.save(buffer, format=self.format, quality=self.quality, optimize=True)
+            width, height = image.size
+
+        encoded = buffer.getvalue()
+        output_type = f"image/{self.format.lower()}"
+        if (
+            not resized
+            and not rotated
+            and media_type == output_type
+            and len(data) <= len(encoded)
+        ):
+            # already small, nothing gained by re-encoding
+            encoded = data
+        data_url = f"data:{output_type};base64,{base64.b64encode(encoded).decode('ascii')}"
+        return ProcessedImage(ref, data_url, width, height, len(data), len(encoded))
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached_images": len(self.cache), **self.metrics}
@@ -1,57 +1,273 @@
 import json
 import os
+import time
+import uuid
 import asyncio
 from pathlib import Path
-from typing import List
-from fastapi.responses import StreamingResponse
-from jinja2 import Environment, FileSystemLoader
+from functools import partial
+from typing import List, Union
+from fastapi.responses import Response, StreamingResponse
 
-from openai import AsyncAzureOpenAI
+import httpx
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
 from pydantic import BaseModel
 
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from api import repeat
+from api.catalog import default_catalog
+from api.chat import chat_prompty
+from api.chat.context import ChatContext
+from api.images import ImagePipeline
 from api.session import SessionManager
-from api.suggestions import SimpleMessage, create_suggestion, suggestion_requested
+from api.state import create_state
+from api.store import create_store
+from api.suggestions import (
+    SimpleMessage,
+    create_suggestion,
+    suggestion_requested,
+    suggestions_prompty,
+    writeup_prompty,
+)
+from api.suggestions.cache import ResponseCache, cache_key
+from api.suggestions.speculative import ProductMentions, SpeculativeSuggestions
+from api.suggestions.writeup import WriteupDetectors
 from dotenv import load_dotenv
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
+from api import metrics
 from api.telemetry import init_tracing
-from api.voice import Message, RealtimeClient
+from api.voice import Message, RealtimeClient, create_session
+from api.voice.frames import AUDIO_SUBPROTOCOL
+from api.voice.pool import RealtimePool
+from api.voice.prompt import VoicePrompt
+from api.voice.recording import Recorder
+from api.voice.tools import SEARCH_PRODUCTS, product_search
 
 load_dotenv()
 
 AZURE_VOICE_ENDPOINT = os.getenv("AZURE_VOICE_ENDPOINT", "fake_endpoint")
 AZURE_VOICE_KEY = os.getenv("AZURE_VOICE_KEY", "fake_key")
+# optional override of the realtime websocket url (e.g. a local mock server)
+AZURE_VOICE_WEBSOCKET_URL = os.getenv("AZURE_VOICE_WEBSOCKET_URL", None)
+# connection pool shared by all voice sessions
+VOICE_MAX_CONNECTIONS = int(os.getenv("VOICE_MAX_CONNECTIONS", "100"))
+VOICE_MAX_KEEPALIVE = int(os.getenv("VOICE_MAX_KEEPALIVE", "20"))
+VOICE_KEEPALIVE_EXPIRY = float(os.getenv("VOICE_KEEPALIVE_EXPIRY", "30"))
+# pre-connected realtime sessions (0 disables pre-warming)
+VOICE_POOL_SIZE = int(os.getenv("VOICE_POOL_SIZE", "0"))
+VOICE_POOL_MAX_IDLE = float(os.getenv("VOICE_POOL_MAX_IDLE", "300"))
+# number of catalog products placed in the voice instructions
+VOICE_CATALOG_TOP_K = int(os.getenv("VOICE_CATALOG_TOP_K", "5"))
+# bounded send queues per call (see api.voice.relay)
+VOICE_RELAY_QUEUE = int(os.getenv("VOICE_RELAY_QUEUE", "256"))
+VOICE_RELAY_POLICY = os.getenv("VOICE_RELAY_POLICY", "coalesce")
+# trace one in every n delta events (see api.voice.dispatch)
+VOICE_TRACE_SAMPLE = int(os.getenv("VOICE_TRACE_SAMPLE", "50"))
+# directory to record every call to, for replay (see api.voice.recording)
+VOICE_RECORD_DIR = os.getenv("VOICE_RECORD_DIR", None)
 
 LOCAL_TRACING_ENABLED = os.getenv("LOCAL_TRACING_ENABLED", "true") == "true"
-init_tracing(local_tracing=LOCAL_TRACING_ENABLED)
+# OpenTelemetry sampling (head or tail) and per span attribute budget
+TRACE_SAMPLING = os.getenv("TRACE_SAMPLING", "head")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+TRACE_MAX_ATTRIBUTES = int(os.getenv("TRACE_MAX_ATTRIBUTES", "128"))
+TRACE_MAX_VALUE_SIZE = int(os.getenv("TRACE_MAX_VALUE_SIZE", "1024"))
+init_tracing(
+    local_tracing=LOCAL_TRACING_ENABLED,
+    sampling=TRACE_SAMPLING,  # type: ignore
+    sample_rate=TRACE_SAMPLE_RATE,
+    slow_ms=TRACE_SLOW_MS,
+    max_attributes=TRACE_MAX_ATTRIBUTES,
+    max_value_size=TRACE_MAX_VALUE_SIZE,
+)
+metrics.init_metrics()
+
+# chat session limits
+SessionManager.max_sessions = int(os.getenv("SESSION_MAX", "1000"))
+SessionManager.idle_ttl = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_REAP_INTERVAL = float(os.getenv("SESSION_REAP_INTERVAL", "60"))
+
+# chat and voice transcripts by thread: memory or sqlite:///path/to/file.db
+TRANSCRIPT_STORE = os.getenv("TRANSCRIPT_STORE", "memory")
+# session state: memory (one worker) or redis://host:port/db (shared by the
+# workers, TRANSCRIPT_STORE is not used then)
+SESSION_STATE = os.getenv("SESSION_STATE", "memory")
+
+# repeated suggestion / writeup requests for the same transcript
+SUGGESTION_CACHE_SIZE = int(os.getenv("SUGGESTION_CACHE_SIZE", "256"))
+SUGGESTION_CACHE_TTL = float(os.getenv("SUGGESTION_CACHE_TTL", "300"))
+# suggestions started during the voice call once it mentions products, off
+# by default: about 300 ms sooner at several times the suggestion calls (see
+# api.benchmarks.speculative)
+SUGGESTION_SPECULATE = os.getenv("SUGGESTION_SPECULATE", "false") == "true"
+SUGGESTION_SPECULATE_MAX = int(os.getenv("SUGGESTION_SPECULATE_MAX", "8"))
+SUGGESTION_SPECULATE_DEBOUNCE = float(
+    os.getenv("SUGGESTION_SPECULATE_DEBOUNCE", "0.2")
+)
 
-base_path = Path(__file__).parent
+# the prompts are loaded on first use, with PROMPT_PRELOAD in the background
+# as soon as the app starts so the first chat does not wait for them either
+PROMPT_PRELOAD = os.getenv("PROMPT_PRELOAD", "true") == "true"
+
+# chat image uploads are downscaled and re-encoded before chat.prompty
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1024"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG")
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+image_pipeline = ImagePipeline(
+    max_dimension=IMAGE_MAX_DIMENSION,
+    format=IMAGE_FORMAT,  # type: ignore
+    quality=IMAGE_QUALITY,
+    workers=IMAGE_WORKERS,
+)
+SessionManager.images = image_pipeline
+
+# chat context sent to chat.prompty each turn
+ChatContext.token_budget = int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))
+ChatContext.max_turns = int(os.getenv("CHAT_CONTEXT_TURNS", "4"))
+
+session_state = create_state(
+    SESSION_STATE,
+    transcripts=(
+        create_store(TRANSCRIPT_STORE, max_threads=SessionManager.max_sessions)
+        if SESSION_STATE == "memory"
+        else None
+    ),
+    max_threads=SessionManager.max_sessions,
+    ttl=SessionManager.idle_ttl,
+)
+SessionManager.state = session_state
 
-# Load products and purchases
-# NOTE: This would generally be accomplished by querying a database
-products = json.loads((base_path / "products.json").read_text())
-purchases = json.loads((base_path / "purchases.json").read_text())
+suggestion_cache = ResponseCache(
+    max_entries=SUGGESTION_CACHE_SIZE, ttl=SUGGESTION_CACHE_TTL
+)
 
-# jinja2 template environment
-env = Environment(loader=FileSystemLoader(base_path / "voice"))
+# per thread write up detection, only new messages are looked at
+writeup_detectors = WriteupDetectors(
+    suggestion_requested, max_threads=SessionManager.max_sessions
+)
+
+# products and purchases, loaded once for the chat, suggestion and voice
+# prompts and reloaded when the files change
+catalog = default_catalog()
+catalog.interval = float(os.getenv("CATALOG_RELOAD_INTERVAL", "5"))
+SessionManager.catalog = catalog
+voice_prompt = VoicePrompt(catalog)
+
+speculative_suggestions = SpeculativeSuggestions(
+    partial(create_suggestion, catalog=catalog),
+    ProductMentions(voice_prompt.products),
+    max_threads=SessionManager.max_sessions,
+    max_inflight=SUGGESTION_SPECULATE_MAX,
+    ttl=SUGGESTION_CACHE_TTL,
+    debounce=SUGGESTION_SPECULATE_DEBOUNCE,
+)
 
 prompt = (Path(__file__).parent / "prompt.txt").read_text()
 
 
+def load_prompts():
+    try:
+        for load in (chat_prompty, suggestions_prompty, writeup_prompty):
+            load()
+    except Exception as e:
+        print(f"Error loading prompts: {e}")
+
+
+@repeat(seconds=SESSION_REAP_INTERVAL)
+async def reap_sessions():
+    await SessionManager.clear_closed_sessions()
+
+
+def create_voice_client() -> AsyncAzureOpenAI:
+    return AsyncAzureOpenAI(
+        azure_endpoint=AZURE_VOICE_ENDPOINT,
+        api_key=AZURE_VOICE_KEY,
+        api_version="2024-10-01-preview",
+        websocket_base_url=AZURE_VOICE_WEBSOCKET_URL,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=VOICE_MAX_CONNECTIONS,
+                max_keepalive_connections=VOICE_MAX_KEEPALIVE,
+                keepalive_expiry=VOICE_KEEPALIVE_EXPIRY,
+            )
+        ),
+    )
+
+
+def observe_state(app: FastAPI):
+    metrics.observe(
+        "chat.sessions.active",
+        lambda: sum(not s.is_closed() for s in SessionManager.sessions.values()),
+        "Chat sessions with an open socket",
+    )
+    metrics.observe(
+        "chat.sessions.stored",
+        lambda: len(SessionManager.sessions),
+        "Chat sessions kept in memory",
+    )
+    metrics.observe(
+        "voice.calls.active",
+        lambda: len(RealtimeClient.live),
+        "Voice calls in progress",
+    )
+    metrics.observe(
+        "voice.queue.depth",
+        lambda: {
+            "client": sum(c.outbound.depth for c in RealtimeClient.live),
+            "realtime": sum(c.inbound.depth for c in RealtimeClient.live),
+        },
+        "Items waiting in the voice send queues",
+        key="queue",
+    )
+    metrics.observe(
+        "voice.pool.idle",
+        lambda: app.state.realtime_pool.idle
+        if hasattr(app.state, "realtime_pool")
+        else 0,
+        "Pre-warmed realtime connections",
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    reaper = await reap_sessions()
+    if VOICE_RECORD_DIR is not None:
+        Path(VOICE_RECORD_DIR).mkdir(parents=True, exist_ok=True)
+    preload = None
+    if PROMPT_PRELOAD:
+        preload = asyncio.get_running_loop().run_in_executor(None, load_prompts)
+    # one client (and connection pool) shared by every voice session
+    app.state.voice_client = create_voice_client()
+    app.state.realtime_pool = RealtimePool(
+        app.state.voice_client,
+        # base configuration, calls only send the instructions on top of it
+        session=create_session(None, tools=[SEARCH_PRODUCTS]),
+        size=VOICE_POOL_SIZE,
+        max_idle=VOICE_POOL_MAX_IDLE,
+    )
+    await app.state.realtime_pool.start()
     try:
         # manage lifetime scope
         yield
     finally:
+        reaper.cancel()
+        if preload is not None:
+            await preload
+        await speculative_suggestions.close()
+        await app.state.realtime_pool.close()
+        await app.state.voice_client.close()
         # remove all stray sockets
         await SessionManager.clear_sessions()
+        await session_state.close()
+        image_pipeline.close()
 
 
 app = FastAPI(lifespan=lifespan)
+observe_state(app)
 
 app.add_middleware(
     CORSMiddleware,
@@ -67,22 +283,68 @@ async def root():
     return {"message": "Hello World"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/api/sessions")
+async def sessions():
+    return {
+        **SessionManager.stats(),
+        "suggestion_cache": suggestion_cache.stats(),
+        "writeup": writeup_detectors.stats(),
+        "speculative": speculative_suggestions.stats(),
+        "state": session_state.stats(),
+        "images": image_pipeline.stats(),
+    }
+
+
 class SuggestionPostRequest(BaseModel):
     customer: str
-    messages: List[SimpleMessage]
+    # not needed with a thread id, the transcript is kept on the server
+    messages: Union[List[SimpleMessage], None] = None
+
+
+async def thread_messages(
+    messages: Union[List[SimpleMessage], None], thread_id: Union[str, None]
+) -> List[SimpleMessage]:
+    if messages is None:
+        return await session_state.messages(thread_id) if thread_id is not None else []
+    return messages
 
 
 @app.post("/api/suggestion")
-async def suggestion(suggestion: SuggestionPostRequest):
+async def suggestion(
+    suggestion: SuggestionPostRequest, thread_id: Union[str, None] = None
+):
+    # the voice call may have started on it already
+    entry = speculative_suggestions.attach(thread_id) if thread_id else None
+    if entry is not None:
+        return StreamingResponse(entry.replay(), media_type="text/event-stream")
+
+    messages = await thread_messages(suggestion.messages, thread_id)
+    key = cache_key("suggestions", suggestion.customer, messages, catalog.version)
     return StreamingResponse(
-        create_suggestion(suggestion.customer, suggestion.messages),
+        suggestion_cache.stream(
+            key, lambda: create_suggestion(suggestion.customer, messages, catalog)
+        ),
         media_type="text/event-stream",
     )
 
 
 @app.post("/api/request")
-async def request(messages: List[SimpleMessage]):
-    requested = await suggestion_requested(messages)
+async def request(
+    messages: Union[List[SimpleMessage], None] = None,
+    thread_id: Union[str, None] = None,
+):
+    messages = await thread_messages(messages, thread_id)
+    if thread_id is not None:
+        requested = await writeup_detectors.get(thread_id).update(messages)
+    else:
+        requested = await suggestion_cache.get_or_create(
+            cache_key("writeup", messages), lambda: suggestion_requested(messages)
+        )
     return {
         "requested": requested,
     }
@@ -101,6 +363,8 @@ async def chat_endpoint(websocket: WebSocket):
             session = await SessionManager.create_session(thread_id, websocket)
         else:
             print(f"Reusing existing session {thread_id}")
+            # turns may have been taken by another worker in between
+            await session.restore()
             session.client = websocket
 
         await session.receive_chat()
@@ -109,18 +373,21 @@ async def chat_endpoint(websocket: WebSocket):
         print("Chat Socket Disconnected", e)
 
 
+async def record_transcript(thread_id: str, name: str, text: str):
+    await session_state.append(thread_id, [SimpleMessage(name=name, text=text)])
+    if SUGGESTION_SPECULATE:
+        speculative_suggestions.observe(thread_id, name, text)
+
+
 @app.websocket("/api/voice")
 async def voice_endpoint(websocket: WebSocket):
-    await websocket.accept()
+    # clients opting into binary audio frames ask for the sub-protocol,
+    # everyone else keeps the base64 JSON messages
+    binary = AUDIO_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=AUDIO_SUBPROTOCOL if binary else None)
     try:
-        client = AsyncAzureOpenAI(
-            azure_endpoint=AZURE_VOICE_ENDPOINT,
-            api_key=AZURE_VOICE_KEY,
-            api_version="2024-10-01-preview",
-        )
-        async with client.beta.realtime.connect(
-            model="gpt-4o-realtime-preview",
-        ) as realtime_client:
+        pool: RealtimePool = websocket.app.state.realtime_pool
+        async with pool.connection() as (realtime_client, configured):
 
             chat_items = await websocket.receive_json()
             message = Message(**chat_items)
@@ -136,33 +403,99 @@ async def voice_endpoint(websocket: WebSocket):
                 json.dumps(settings, indent=2),
             )
 
-            # create voice system message
-            # TODO: retrieve context from chat messages via thread id
-            system_message = env.get_template("script.jinja2").render(
-                customer=settings["user"] if "user" in settings else "Seth",
-                purchases=purchases,
-                context=json.loads(message.payload),
-                products=products,
+            # only the products relevant to the chat and past purchases go
+            # into the instructions, the rest is reachable via search_products
+            if voice_prompt.refresh():
+                speculative_suggestions.mentions = ProductMentions(
+                    voice_prompt.products
+                )
+            purchases = voice_prompt.purchases
+            product_index = voice_prompt.index
+            # the chat so far is kept on the server, clients without a
+            # thread id still send it along
+            thread_id = settings.get("threadId", None)
+            context = []
+            if thread_id is not None:
+                context = [
+                    m.model_dump() for m in await session_state.messages(thread_id)
+                ]
+            if len(context) == 0:
+                context = json.loads(message.payload)
+                if thread_id is not None and len(context) > 0:
+                    await session_state.append(
+                        thread_id, [SimpleMessage(**item) for item in context]
+                    )
+            query = " ".join(
+                [item["text"] for item in context]
+                + [f"{p['name']} {p['category']}" for p in purchases]
+            )
+            relevant = product_index.search(
+                query,
+                k=VOICE_CATALOG_TOP_K,
+                exclude={p["id"] for p in purchases},
             )
 
-            session = RealtimeClient(
-                realtime=realtime_client, client=websocket, debug=LOCAL_TRACING_ENABLED
+            # create voice system message
+            customer = settings["user"] if "user" in settings else "Seth"
+            system_message = voice_prompt.render(
+                customer=customer,
+                context=context,
+                products=relevant,
             )
 
-            await session.update_realtime_session(
-                system_message,
-                threshold=settings["threshold"] if "threshold" in settings else 0.8,
-                silence_duration_ms=(
-                    settings["silence"] if "silence" in settings else 500
-                ),
-                prefix_padding_ms=(settings["prefix"] if "prefix" in settings else 300),
+            # the call is added to the thread's transcript, and suggestions
+            # are started as soon as it mentions products
+            on_transcript = None
+            if thread_id is not None:
+                if SUGGESTION_SPECULATE:
+                    speculative_suggestions.start(
+                        thread_id, customer, [SimpleMessage(**item) for item in context]
+                    )
+                on_transcript = partial(record_transcript, thread_id)
+
+            recorder = None
+            if VOICE_RECORD_DIR is not None:
+                name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.cvr"
+                try:
+                    recorder = Recorder(Path(VOICE_RECORD_DIR) / name)
+                except OSError as e:
+                    # the call goes on without a recording
+                    print("Error starting voice call recording", e)
+
+            session = RealtimeClient(
+                realtime=realtime_client,
+                client=websocket,
+                debug=LOCAL_TRACING_ENABLED,
+                binary=binary,
+                queue_size=VOICE_RELAY_QUEUE,
+                policy=VOICE_RELAY_POLICY,  # type: ignore
+                trace_sample=VOICE_TRACE_SAMPLE,
+                on_transcript=on_transcript,
+                recorder=recorder,
+                functions={
+                    SEARCH_PRODUCTS.name: product_search(
+                        product_index, k=VOICE_CATALOG_TOP_K
+                    )
+                },
             )
 
-            tasks = [
-                asyncio.create_task(session.receive_realtime()),
-                asyncio.create_task(session.receive_client()),
-            ]
-            await asyncio.gather(*tasks)
+            try:
+                await session.update_realtime_session(
+                    system_message,
+                    threshold=settings["threshold"] if "threshold" in settings else 0.8,
+                    silence_duration_ms=(
+                        settings["silence"] if "silence" in settings else 500
+                    ),
+                    prefix_padding_ms=(
+                        settings["prefix"] if "prefix" in settings else 300
+                    ),
+                    tools=[SEARCH_PRODUCTS],
+                    base=configured,
+                )
+
+                await session.relay()
+            finally:
+                await session.stop()
 
     except WebSocketDisconnect as e:
         print("Voice Socket Disconnected", e)
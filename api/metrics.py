@@ -0,0 +1,125 @@
+"""
+OpenTelemetry metrics for the service, exposed in the Prometheus text format
+on /metrics. Aggregation happens in process and nothing is pushed anywhere,
+so it works offline (with or without App Insights tracing).
+
+Instruments are created from the global meter and can be used before
+init_metrics is called; recordings only count once it has been.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Union
+
+from opentelemetry import metrics
+from opentelemetry.exporter.prometheus import PrometheusMetricReader
+from opentelemetry.metrics import CallbackOptions, Histogram, Observation
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics import Histogram as HistogramInstrument
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+_meter = "contoso-voice-api"
+
+# seconds, from websocket sends to full LLM calls
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+meter = metrics.get_meter(_meter)
+
+llm_duration = meter.create_histogram(
+    "llm.call.duration",
+    unit="s",
+    description="Duration of a prompty LLM call, by prompt",
+)
+llm_time_to_first_token = meter.create_histogram(
+    "llm.time_to_first_token",
+    unit="s",
+    description="Time until the first streamed chunk of a prompty LLM call",
+)
+chat_turn_duration = meter.create_histogram(
+    "chat.turn.duration",
+    unit="s",
+    description="Chat turn, from the question arriving to the response sent",
+)
+voice_time_to_first_audio = meter.create_histogram(
+    "voice.time_to_first_audio",
+    unit="s",
+    description="Time from the end of the customer's turn to the first audio sent",
+)
+realtime_handler_duration = meter.create_histogram(
+    "voice.realtime.handler_duration",
+    unit="s",
+    description="Time spent handling a realtime event, by event type",
+)
+websocket_send_duration = meter.create_histogram(
+    "websocket.send.duration",
+    unit="s",
+    description="Duration of a websocket send, by socket",
+)
+
+_reader = None
+
+
+def init_metrics():
+    """
+    Set up the meter provider with a Prometheus reader (once per process).
+    """
+    global _reader
+    if _reader is not None:
+        return
+
+    _reader = PrometheusMetricReader()
+    provider = MeterProvider(
+        resource=Resource(attributes={SERVICE_NAME: "contoso-voice-api"}),
+        metric_readers=[_reader],
+        views=[
+            View(
+                instrument_type=HistogramInstrument,
+                aggregation=ExplicitBucketHistogramAggregation(LATENCY_BUCKETS),
+            )
+        ],
+    )
+    metrics.set_meter_provider(provider)
+
+
+def observe(
+    name: str,
+    callback: Callable[[], Union[float, Dict[str, float]]],
+    description: str = "",
+    key: str = "name",
+):
+    """
+    Register a gauge read when metrics are collected. The callback returns
+    a value, or a dict of values labelled with ``key``.
+    """
+
+    def observations(options: CallbackOptions):
+        value = callback()
+        if isinstance(value, dict):
+            return [Observation(v, {key: k}) for k, v in value.items()]
+        return [Observation(value)]
+
+    meter.create_observable_gauge(name, callbacks=[observations], description=description)
+
+
+@contextmanager
+def timed(histogram: Histogram, **attributes: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.record(time.perf_counter() - start, attributes)
+
+
+def render() -> bytes:
+    """
+    Current metrics in the Prometheus text exposition format.
+    """
+    return generate_latest(REGISTRY)
+
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
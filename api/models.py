@@ -1,5 +1,6 @@
+import orjson
 from pydantic import BaseModel
-from typing import Literal, Optional
+from typing import Any, Literal, Optional
 
 
 class Action(BaseModel):
@@ -25,6 +26,8 @@ class SocketMessage(BaseModel):
 class ClientMessage(BaseModel):
     name: str
     image: Optional[str] = None
+    # sha256 of the image bytes, sent without the image once it was uploaded
+    image_ref: Optional[str] = None
     text: str
 
 
@@ -57,7 +60,47 @@ def send_context(context: str):
         type="context", payload=Context(type="user", payload=context)
     ).model_dump()
 
+
 def send_action(name: str, arguments: str):
     return SocketMessage(
         type="action", payload=Action(name=name, arguments=arguments)
-    ).model_dump()
\ No newline at end of file
+    ).model_dump()
+
+
+# Pre-serialized socket frames
+# The helpers above build and dump a nested pydantic model per call, which is
+# then re-encoded by send_json. The frames below produce the same JSON text
+# directly (constant frames are encoded once) and are sent with send_text.
+
+
+def dumps(data: Any) -> str:
+    return orjson.dumps(data).decode("utf-8")
+
+
+START_ASSISTANT = dumps(start_assistant())
+STOP_ASSISTANT = dumps(stop_assistant())
+
+
+def stream_assistant_frame(chunk: str) -> str:
+    return dumps(
+        {"type": "assistant", "payload": {"state": "stream", "payload": chunk}}
+    )
+
+
+def full_assistant_frame(message: str) -> str:
+    return dumps(
+        {"type": "assistant", "payload": {"state": "full", "payload": message}}
+    )
+
+
+def context_frame(context: str) -> str:
+    return dumps({"type": "context", "payload": {"type": "user", "payload": context}})
+
+
+def action_frame(name: str, arguments: str) -> str:
+    return dumps({"type": "action", "payload": {"name": name, "arguments": arguments}})
+
+
+def message_frame(type: str, payload: str) -> str:
+    # voice socket messages (api.voice.Message)
+    return dumps({"type": type, "payload": payload})
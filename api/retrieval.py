@@ -0,0 +1,70 @@
+import re
+import math
+from collections import Counter, defaultdict
+from typing import Any, Collection, Dict, List, Tuple
+
+_token = re.compile(r"[a-z0-9]+")
+
+# field weights, applied by repeating the field text
+_fields = [("name", 3), ("category", 2), ("brand", 2), ("description", 1)]
+
+
+def tokenize(text: str) -> List[str]:
+    return _token.findall(text.lower())
+
+
+class ProductIndex:
+    """
+    In-process BM25 index over the product catalog (name, category, brand and
+    description). Built once from the product list, searching only touches the
+    postings of the query terms.
+    """
+
+    def __init__(self, products: List[Dict[str, Any]], k1: float = 1.2, b: float = 0.75):
+        self.products = list(products)
+        self.k1 = k1
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+        lengths = []
+        for doc, product in enumerate(self.products):
+            terms: Counter = Counter()
+            for field, weight in _fields:
+                for term in tokenize(str(product.get(field, ""))):
+                    terms[term] += weight
+            lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings[term].append((doc, tf))
+
+        count = len(self.products)
+        average = sum(lengths) / count if count > 0 else 0
+        # per document length normalization, precomputed
+        self._norm = [
+            k1 * (1 - b + b * length / average) if average > 0 else k1
+            for length in lengths
+        ]
+        self._idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(
+        self, query: str, k: int = 5, exclude: Collection[Any] = ()
+    ) -> List[Dict[str, Any]]:
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc, tf in self.postings[term]:
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + self._norm[doc])
+
+        ranked = sorted(scores, key=lambda doc: scores[doc], reverse=True)
+        results = []
+        for doc in ranked:
+            product = self.products[doc]
+            if product.get("id") in exclude:
+                continue
+            results.append(product)
+            if len(results) == k:
+                break
+        return results
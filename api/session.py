@@ -1,30 +1,112 @@
 import json
-from typing import Dict, List, Union
+import time
+from collections import OrderedDict
+from typing import Dict, List, Set, Tuple, Union
 from fastapi import WebSocket
 from prompty.tracer import trace
 from prompty.tracer import Tracer
 from fastapi.websockets import WebSocketState
+from api.catalog import Catalog
 from api.chat import create_response
+from api.chat.context import ChatContext
+from api.images import ImagePipeline
+from api.metrics import chat_turn_duration, timed, websocket_send_duration
+from api.state import MemorySessionState, SessionState
+from api.suggestions import SimpleMessage
 from api.models import (
+    START_ASSISTANT,
+    STOP_ASSISTANT,
     ClientMessage,
-    send_action,
-    send_context,
-    start_assistant,
-    stop_assistant,
-    stream_assistant,
+    action_frame,
+    context_frame,
+    message_frame,
+    stream_assistant_frame,
 )
 
 from api.voice import RealtimeClient, Message
 
 
 class ChatSession:
-    def __init__(self, client: WebSocket):
+    def __init__(
+        self,
+        client: WebSocket,
+        thread_id: Union[str, None] = None,
+        state: Union[SessionState, None] = None,
+        images: Union[ImagePipeline, None] = None,
+        catalog: Union[Catalog, None] = None,
+    ):
         self.client = client
+        self.thread_id = thread_id
+        # shared with the other workers, the voice call and the suggestion routes
+        self.state = state
         self.realtime: Union[RealtimeClient, None] = None
-        self.context: List[str] = []
+        self.context = ChatContext()
+        self.call = 0
+        self.images = images
+        self.catalog = catalog
+        # refs of the images the model has already been shown in this thread
+        self.seen_images: Set[str] = set()
+        self.last_active = time.monotonic()
+
+    async def restore(self) -> bool:
+        """
+        Pick up where the thread left off, possibly on another worker.
+        """
+        if self.state is None or self.thread_id is None:
+            return False
+        data = await self.state.load(self.thread_id)
+        if data is None:
+            return False
+        self.context = ChatContext.from_dict(data["context"])
+        self.call = data.get("call", 0)
+        self.seen_images = set(data.get("images", []))
+        return True
+
+    async def save(self):
+        if self.state is None or self.thread_id is None:
+            return
+        await self.state.save(
+            self.thread_id,
+            {
+                "context": self.context.to_dict(),
+                "call": self.call,
+                "images": sorted(self.seen_images),
+            },
+        )
+
+    async def prepare_image(self, msg: ClientMessage) -> Tuple[Union[str, None], str]:
+        """
+        The image to send to chat.prompty with the question, if any. An image
+        the model was already shown in this thread is referred to in the
+        question instead of being sent again.
+        """
+        image, ref = msg.image, msg.image_ref
+        if image is not None and self.images is not None:
+            try:
+                processed = await self.images.process(image)
+                image, ref = processed.data_url, processed.ref
+            except Exception as e:
+                print("Error processing image", e)
+
+        if ref is not None and ref in self.seen_images:
+            return None, f"{msg.text}\n(Same image as I shared earlier in our conversation.)"
+        if image is None:
+            if ref is not None:
+                print(f"Image {ref} was not uploaded in this thread")
+            return None, msg.text
+        if ref is not None:
+            self.seen_images.add(ref)
+        return image, msg.text
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    async def send_text(self, data: str):
+        with timed(websocket_send_duration, socket="chat"):
+            await self.client.send_text(data)
 
     async def send_message(self, message: Message):
-        await self.client.send_json(message.model_dump())
+        await self.send_text(message_frame(message.type, message.payload))
 
     def add_realtime(self, realtime: RealtimeClient):
         self.realtime = realtime
@@ -50,6 +132,8 @@ class ChatSession:
             with Tracer.start("chat_turn") as t:
                 t(Tracer.SIGNATURE, "api.session.ChatSession.start_chat")
                 message = await self.client.receive_json()
+                self.touch()
+                start = time.perf_counter()
                 msg = ClientMessage(**message)
 
                 t(
@@ -57,15 +141,30 @@ class ChatSession:
                     {
                         "request": msg.text,
                         "image": msg.image is not None,
+                        "image_ref": msg.image_ref,
                     },
                 )
 
+                # decoded and downscaled off the event loop
+                image, question = await self.prepare_image(msg)
+
                 # start assistant
-                await self.client.send_json(start_assistant())
+                await self.send_text(START_ASSISTANT)
+
+                # create response, the text is streamed as it is generated
+                streamed: List[str] = []
+
+                async def on_delta(delta: str):
+                    streamed.append(delta)
+                    await self.send_text(stream_assistant_frame(delta))
 
-                # create response
                 response = await create_response(
-                    msg.name, msg.text, self.context, msg.image
+                    msg.name,
+                    question,
+                    self.context.items(),
+                    image,
+                    on_delta,
+                    catalog=self.catalog,
                 )
 
                 # unpack response
@@ -73,16 +172,29 @@ class ChatSession:
                 context = response["context"]
                 call = response["call"]
 
-                # send response
-                await self.client.send_json(stream_assistant(text))
-                await self.client.send_json(stop_assistant())
+                # send whatever was not streamed (nothing, normally)
+                sent = "".join(streamed)
+                if len(text) > len(sent) and text.startswith(sent):
+                    await self.send_text(stream_assistant_frame(text[len(sent) :]))
+                await self.send_text(STOP_ASSISTANT)
 
                 # send context
-                await self.client.send_json(send_context(context))
-                await self.client.send_json(
-                    send_action("call", json.dumps({"score": call}))
+                await self.send_text(context_frame(context))
+                await self.send_text(
+                    action_frame("call", json.dumps({"score": call}))
                 )
-                self.context.append(response["context"])
+                self.context.add(msg.text, text, context)
+                self.call = call
+                if self.state is not None and self.thread_id is not None:
+                    await self.state.append(
+                        self.thread_id,
+                        [
+                            SimpleMessage(name="user", text=msg.text),
+                            SimpleMessage(name="assistant", text=text),
+                        ],
+                    )
+                    await self.save()
+                chat_turn_duration.record(time.perf_counter() - start)
                 t(
                     Tracer.RESULT,
                     {
@@ -99,18 +211,39 @@ class ChatSession:
 
 
 class SessionManager:
-    sessions: Dict[str, ChatSession] = {}
+    # ordered least to most recently used
+    sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+    # upper bound on sessions kept in memory
+    max_sessions: int = 1000
+    # seconds a closed session is kept around for reconnects
+    idle_ttl: float = 30 * 60
+    metrics: Dict[str, int] = {"created": 0, "reused": 0, "evicted": 0}
+    # session snapshots and transcripts by thread id, shared by the workers
+    state: SessionState = MemorySessionState()
+    # processing of uploaded images, shared by the sessions
+    images: Union[ImagePipeline, None] = None
+    # products and purchases for the prompt, shared by the sessions
+    catalog: Union[Catalog, None] = None
 
     @classmethod
     async def create_session(cls, thread_id: str, socket: WebSocket) -> ChatSession:
-        session = ChatSession(socket)
+        session = ChatSession(socket, thread_id, cls.state, cls.images, cls.catalog)
+        # a reconnect that landed on another worker
+        await session.restore()
         cls.sessions[thread_id] = session
+        cls.sessions.move_to_end(thread_id)
+        cls.metrics["created"] += 1
+        await cls.evict_overflow()
         return session
 
     @classmethod
     def get_session(cls, thread_id: str):
         if thread_id in cls.sessions:
-            return cls.sessions[thread_id]
+            session = cls.sessions[thread_id]
+            cls.sessions.move_to_end(thread_id)
+            session.touch()
+            cls.metrics["reused"] += 1
+            return session
         return None
 
     @classmethod
@@ -121,19 +254,44 @@ class SessionManager:
 
     @classmethod
     async def clear_sessions(cls):
-        for thread_id in cls.sessions:
+        for thread_id, session in list(cls.sessions.items()):
+            try:
+                await session.close()
+            except Exception as e:
+                print(f"Error closing session ({thread_id})", e)
+        cls.sessions = OrderedDict()
+
+    @classmethod
+    async def evict(cls, thread_id: str):
+        session = cls.sessions.pop(thread_id, None)
+        if session is None:
+            return
+        cls.metrics["evicted"] += 1
+        if not session.is_closed():
             try:
-                await cls.sessions[thread_id].close()
+                await session.close()
             except Exception as e:
                 print(f"Error closing session ({thread_id})", e)
-        cls.sessions = {}
+
+    @classmethod
+    async def evict_overflow(cls):
+        overflow = len(cls.sessions) - cls.max_sessions
+        if overflow <= 0:
+            return
+        # closed sessions before live ones, least recently used first
+        # (sorted is stable so LRU order holds within each group)
+        candidates = sorted(cls.sessions, key=lambda t: not cls.sessions[t].is_closed())
+        for thread_id in candidates[:overflow]:
+            await cls.evict(thread_id)
 
     @classmethod
     async def clear_closed_sessions(cls):
-        threads = cls.sessions.keys()
-        for thread_id in threads:
-            if cls.sessions[thread_id].is_closed():
-                try:
-                    del cls.sessions[thread_id]
-                except Exception as e:
-                    print(f"Error closing session ({thread_id})", e)
+        now = time.monotonic()
+        for thread_id, session in list(cls.sessions.items()):
+            if session.is_closed() and now - session.last_active > cls.idle_ttl:
+                await cls.evict(thread_id)
+        await cls.evict_overflow()
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        return {"live": len(cls.sessions), **cls.metrics}
@@ -0,0 +1,193 @@
+import asyncio
+from abc import ABC, abstractmethod
+from functools import partial
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, TypeVar, Union
+
+import orjson
+
+from api.store import MemoryTranscriptStore, TranscriptStore
+from api.suggestions import SimpleMessage
+
+T = TypeVar("T")
+
+
+class SessionState(ABC):
+    """
+    What a chat session needs to resume on any worker: a snapshot of the
+    session (chat context and call score) and the thread's transcript.
+    """
+
+    def __init__(self):
+        self.metrics = {"loads": 0, "resumed": 0, "saves": 0, "appends": 0}
+
+    @abstractmethod
+    async def load(self, thread_id: str) -> Union[Dict[str, Any], None]:
+        pass
+
+    @abstractmethod
+    async def save(self, thread_id: str, data: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    async def append(self, thread_id: str, messages: List[SimpleMessage]):
+        pass
+
+    @abstractmethod
+    async def messages(self, thread_id: str) -> List[SimpleMessage]:
+        pass
+
+    @abstractmethod
+    async def delete(self, thread_id: str):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.metrics)
+
+
+class MemorySessionState(SessionState):
+    """
+    State kept in this process (transcripts in the given TranscriptStore),
+    for a single worker. A store doing I/O (SQLite) is called on its own
+    thread, one call at a time so appends keep their order.
+    """
+
+    def __init__(
+        self,
+        transcripts: Union[TranscriptStore, None] = None,
+        max_threads: int = 1000,
+    ):
+        super().__init__()
+        self.max_threads = max_threads
+        self.transcripts = transcripts or MemoryTranscriptStore(max_threads)
+        self.sessions: "OrderedDict[str, bytes]" = OrderedDict()
+        self.executor: Union[ThreadPoolExecutor, None] = None
+        if self.transcripts.blocking:
+            self.executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="transcripts"
+            )
+
+    async def _run(self, function: Callable[..., T], *args: Any) -> T:
+        if self.executor is None:
+            return function(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(function, *args))
+
+    async def load(self, thread_id: str) -> Union[Dict[str, Any], None]:
+        self.metrics["loads"] += 1
+        data = self.sessions.get(thread_id)
+        if data is None:
+            return None
+        self.metrics["resumed"] += 1
+        self.sessions.move_to_end(thread_id)
+        return orjson.loads(data)
+
+    async def save(self, thread_id: str, data: Dict[str, Any]):
+        # serialized like the shared backends, callers get copies
+        self.metrics["saves"] += 1
+        self.sessions[thread_id] = orjson.dumps(data)
+        self.sessions.move_to_end(thread_id)
+        while len(self.sessions) > self.max_threads:
+            self.sessions.popitem(last=False)
+
+    async def append(self, thread_id: str, messages: List[SimpleMessage]):
+        self.metrics["appends"] += 1
+        await self._run(self.transcripts.extend, thread_id, messages)
+
+    async def messages(self, thread_id: str) -> List[SimpleMessage]:
+        return await self._run(self.transcripts.messages, thread_id)
+
+    async def delete(self, thread_id: str):
+        self.sessions.pop(thread_id, None)
+        await self._run(self.transcripts.clear, thread_id)
+
+    async def close(self):
+        await self._run(self.transcripts.close)
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "transcripts": self.transcripts.stats(),
+            **self.metrics,
+        }
+
+
+class RedisSessionState(SessionState):
+    """
+    State shared by every worker and node through Redis (or anything that
+    speaks its protocol). Keys expire ``ttl`` seconds after the last write.
+
+        {prefix}:session:{thread_id}     session snapshot (JSON)
+        {prefix}:transcript:{thread_id}  list of messages (JSON)
+    """
+
+    def __init__(self, url: str, ttl: float = 1800, prefix: str = "contoso"):
+        super().__init__()
+        self.url = url
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        # imported here, single worker deployments never need it
+        from redis import asyncio as redis
+
+        # RESP2 is spoken by every Redis compatible server
+        self.redis = redis.from_url(url, protocol=2)
+
+    def _session(self, thread_id: str) -> str:
+        return f"{self.prefix}:session:{thread_id}"
+
+    def _transcript(self, thread_id: str) -> str:
+        return f"{self.prefix}:transcript:{thread_id}"
+
+    async def load(self, thread_id: str) -> Union[Dict[str, Any], None]:
+        self.metrics["loads"] += 1
+        data = await self.redis.get(self._session(thread_id))
+        if data is None:
+            return None
+        self.metrics["resumed"] += 1
+        return orjson.loads(data)
+
+    async def save(self, thread_id: str, data: Dict[str, Any]):
+        self.metrics["saves"] += 1
+        await self.redis.set(self._session(thread_id), orjson.dumps(data), ex=self.ttl)
+
+    async def append(self, thread_id: str, messages: List[SimpleMessage]):
+        if len(messages) == 0:
+            return
+        self.metrics["appends"] += 1
+        key = self._transcript(thread_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, *[orjson.dumps(m.model_dump()) for m in messages])
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def messages(self, thread_id: str) -> List[SimpleMessage]:
+        items = await self.redis.lrange(self._transcript(thread_id), 0, -1)
+        return [SimpleMessage(**orjson.loads(item)) for item in items]
+
+    async def delete(self, thread_id: str):
+        await self.redis.delete(self._session(thread_id), self._transcript(thread_id))
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+def create_state(
+    url: str,
+    transcripts: Union[TranscriptStore, None] = None,
+    max_threads: int = 1000,
+    ttl: float = 1800,
+) -> SessionState:
+    """
+    ``memory`` (this worker only) or ``redis://host:port/db``.
+    """
+    if url == "memory":
+        return MemorySessionState(transcripts, max_threads=max_threads)
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        return RedisSessionState(url, ttl=ttl)
+    raise ValueError(f"Unknown session state {url}")
@@ -0,0 +1,151 @@
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Union
+
+from api.suggestions import SimpleMessage
+
+
+class TranscriptStore(ABC):
+    """
+    Conversation transcript per thread, shared by the chat session, the
+    voice call and the suggestion routes so clients only send a thread id.
+    """
+
+    # whether calls do I/O and should stay off the event loop
+    blocking = False
+
+    def append(self, thread_id: str, name: str, text: str):
+        self.extend(thread_id, [SimpleMessage(name=name, text=text)])
+
+    @abstractmethod
+    def extend(self, thread_id: str, messages: List[SimpleMessage]):
+        pass
+
+    @abstractmethod
+    def messages(self, thread_id: str) -> List[SimpleMessage]:
+        pass
+
+    @abstractmethod
+    def clear(self, thread_id: str):
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryTranscriptStore(TranscriptStore):
+    """
+    Transcripts kept in process, least recently used threads dropped past
+    ``max_threads``. Lost on restart.
+    """
+
+    def __init__(self, max_threads: int = 1000):
+        self.max_threads = max_threads
+        self.threads: "OrderedDict[str, List[SimpleMessage]]" = OrderedDict()
+
+    def extend(self, thread_id: str, messages: List[SimpleMessage]):
+        transcript = self.threads.get(thread_id)
+        if transcript is None:
+            transcript = []
+            self.threads[thread_id] = transcript
+            while len(self.threads) > self.max_threads:
+                self.threads.popitem(last=False)
+        self.threads.move_to_end(thread_id)
+        transcript.extend(messages)
+
+    def messages(self, thread_id: str) -> List[SimpleMessage]:
+        transcript = self.threads.get(thread_id)
+        if transcript is None:
+            return []
+        self.threads.move_to_end(thread_id)
+        return list(transcript)
+
+    def clear(self, thread_id: str):
+        self.threads.pop(thread_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "threads": len(self.threads),
+            "messages": sum(len(t) for t in self.threads.values()),
+        }
+
+
+class SqliteTranscriptStore(TranscriptStore):
+    """
+    Transcripts in a local SQLite database (WAL mode), kept across restarts.
+    """
+
+    blocking = True
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " thread_id TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " name TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " PRIMARY KEY (thread_id, seq))"
+            )
+
+    def extend(self, thread_id: str, messages: List[SimpleMessage]):
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT COALESCE(MAX(seq), -1) FROM messages WHERE thread_id = ?",
+                (thread_id,),
+            ).fetchone()
+            self.connection.executemany(
+                "INSERT INTO messages (thread_id, seq, name, text) VALUES (?, ?, ?, ?)",
+                [
+                    (thread_id, row[0] + 1 + i, m.name, m.text)
+                    for i, m in enumerate(messages)
+                ],
+            )
+
+    def messages(self, thread_id: str) -> List[SimpleMessage]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT name, text FROM messages WHERE thread_id = ? ORDER BY seq",
+                (thread_id,),
+            ).fetchall()
+        return [SimpleMessage(name=name, text=text) for name, text in rows]
+
+    def clear(self, thread_id: str):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM messages WHERE thread_id = ?", (thread_id,)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            threads, messages = self.connection.execute(
+                "SELECT COUNT(DISTINCT thread_id), COUNT(*) FROM messages"
+            ).fetchone()
+        return {"threads": threads, "messages": messages}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def create_store(url: str, max_threads: int = 1000) -> TranscriptStore:
+    """
+    ``memory`` or ``sqlite:///path/to/transcripts.db``.
+    """
+    if url == "memory":
+        return MemoryTranscriptStore(max_threads=max_threads)
+    if url.startswith("sqlite:///"):
+        return SqliteTranscriptStore(url[len("sqlite:///") :])
+    raise ValueError(f"Unknown transcript store {url}")
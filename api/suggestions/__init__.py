@@ -1,22 +1,34 @@
+import time
 import asyncio
 import prompty
-import prompty.azure
-from typing import List
+from pathlib import Path
+from typing import List, Union
 
 from pydantic import BaseModel
 from prompty.tracer import trace
 
-suggestions_prompty = prompty.load("suggestions.prompty")
-writeup_prompty = prompty.load("writeup.prompty")
+from api import lazy_prompty
+from api.catalog import Catalog, default_catalog
+from api.metrics import llm_duration, llm_time_to_first_token, timed
+
+suggestions_prompty = lazy_prompty(Path(__file__).parent / "suggestions.prompty")
+writeup_prompty = lazy_prompty(Path(__file__).parent / "writeup.prompty")
 
 class SimpleMessage(BaseModel):
     name: str
     text: str
 
 @trace
-async def create_suggestion(customer: str, messages: List[SimpleMessage]):
+async def create_suggestion(
+    customer: str,
+    messages: List[SimpleMessage],
+    catalog: Union[Catalog, None] = None,
+):
+    snapshot = (catalog or default_catalog()).current()
     inputs = {
         "customer": customer,
+        "products": list(snapshot.products),
+        "purchases": list(snapshot.purchases),
         "context": [
             {
                 "name": message.name,
@@ -26,30 +38,40 @@ async def create_suggestion(customer: str, messages: List[SimpleMessage]):
         ],
     }
 
+    start = time.perf_counter()
     result = await prompty.execute_async(
-        suggestions_prompty,
+        suggestions_prompty(),
         parameters={"stream": True},
         inputs=inputs,
     )
 
+    first = True
     async for item in result:
+        if first:
+            llm_time_to_first_token.record(
+                time.perf_counter() - start, {"prompt": "suggestions"}
+            )
+            first = False
         yield item
 
+    llm_duration.record(time.perf_counter() - start, {"prompt": "suggestions"})
+
 
 @trace
 async def suggestion_requested(messages: List[SimpleMessage]):
-    result: str = await prompty.execute_async(
-        writeup_prompty,
-        inputs={
-            "context": [
-                {
-                    "name": message.name,
-                    "text": message.text,
-                }
-                for message in messages
-            ],
-        },
-    )
+    with timed(llm_duration, prompt="writeup"):
+        result: str = await prompty.execute_async(
+            writeup_prompty(),
+            inputs={
+                "context": [
+                    {
+                        "name": message.name,
+                        "text": message.text,
+                    }
+                    for message in messages
+                ],
+            },
+        )
 
     return result.lower().startswith("y")
 
@@ -0,0 +1,196 @@
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Set,
+    Tuple,
+    Union,
+)
+
+import orjson
+from pydantic import BaseModel
+
+
+def normalize(value: Any) -> Any:
+    """
+    Canonical form of a request for keying: models become dicts and strings
+    are stripped, lowercased and have their whitespace collapsed.
+    """
+    if isinstance(value, BaseModel):
+        return normalize(value.model_dump())
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value
+
+
+def cache_key(*parts: Any) -> str:
+    data = orjson.dumps(normalize(list(parts)), option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(data).hexdigest()
+
+
+class StreamEntry:
+    """
+    Records the chunks of a streamed response as they arrive so any number
+    of readers can replay them, while it is still streaming or afterwards.
+    """
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Union[BaseException, None] = None
+        self._updated = asyncio.Event()
+
+    def _notify(self):
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+
+    async def record(self, source: AsyncIterator[Any]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def replay(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._updated.wait()
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for prompt results, keyed on the normalized
+    inputs (see cache_key). Entries expire after ``ttl`` seconds and the
+    least recently used are evicted past ``max_entries``. Identical requests
+    made while one is in flight share its upstream call.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.inflight: Dict[str, Union[asyncio.Future, StreamEntry]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evicted": 0,
+            "expired": 0,
+        }
+
+    def get(self, key: str) -> Union[Any, None]:
+        if key not in self.entries:
+            return None
+        created, value = self.entries[key]
+        if time.monotonic() - created > self.ttl:
+            del self.entries[key]
+            self.metrics["expired"] += 1
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any):
+        self.entries[key] = (time.monotonic(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.metrics["evicted"] += 1
+
+    async def get_or_create(self, key: str, create: Callable[[], Awaitable[Any]]):
+        value = self.get(key)
+        if value is not None:
+            self.metrics["hits"] += 1
+            return value
+
+        pending = self.inflight.get(key)
+        if isinstance(pending, asyncio.Future):
+            self.metrics["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not pending.cancelled() or (task and task.cancelling()):
+                    raise
+            # the request we waited on was cancelled, not this one
+            return await self.get_or_create(key, create)
+
+        self.metrics["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            value = await create()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # retrieved here so an exception nobody else waited on is not logged
+            future.exception()
+            raise
+        finally:
+            # cancelled (or failed with a BaseException): waiters try again
+            if not future.done():
+                future.cancel()
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+    def stream(
+        self, key: str, create: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """
+        Chunks of the streamed response for key: replayed from the cache,
+        followed along with an identical request in flight, or streamed from
+        a new upstream call. The upstream call runs to completion even if
+        the reader goes away, so the result is cached for the next one.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.metrics["hits"] += 1
+            return entry.replay()
+
+        pending = self.inflight.get(key)
+        if isinstance(pending, StreamEntry):
+            self.metrics["coalesced"] += 1
+            return pending.replay()
+
+        self.metrics["misses"] += 1
+        entry = StreamEntry()
+        self.inflight[key] = entry
+        task = asyncio.create_task(self._record(key, entry, create()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return entry.replay()
+
+    async def _record(self, key: str, entry: StreamEntry, source: AsyncIterator[Any]):
+        try:
+            await entry.record(source)
+            if entry.error is None:
+                self.put(key, entry)
+        finally:
+            del self.inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self.entries), **self.metrics}
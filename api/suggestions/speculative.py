@@ -0,0 +1,201 @@
+import re
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Sequence, Set, Union
+
+from api.retrieval import tokenize
+from api.suggestions import SimpleMessage
+from api.suggestions.cache import StreamEntry
+
+# a camel case first word, e.g. "SkyView" or "TrekReady"
+BRAND = re.compile(r"[A-Z][a-z]+[A-Z]\w*\b")
+
+
+class ProductMentions:
+    """
+    Finds the catalog products a transcript mentions, by full name or by the
+    product line (the first word of the name, e.g. "SkyView"). Only brand
+    style line names are matched on their own, so ordinary words that start
+    a name ("Summit Breeze Jacket", "Alpine Explorer Tent") are not taken for
+    a mention. Transcribed speech may split a line name ("Sky View"), so
+    adjacent words are also tried joined.
+    """
+
+    def __init__(self, products: Sequence[Dict[str, Any]]):
+        self.names: Dict[str, Any] = {}
+        for product in products:
+            words = tokenize(product["name"])
+            if len(words) == 0:
+                continue
+            self.names["".join(words)] = product["id"]
+            if BRAND.match(product["name"]):
+                self.names.setdefault(words[0], product["id"])
+
+    def find(self, text: str) -> Set[Any]:
+        words = tokenize(text)
+        found = set()
+        for i in range(len(words)):
+            # single words, pairs and longer runs up to a full product name
+            for j in range(i + 1, min(i + 5, len(words)) + 1):
+                product = self.names.get("".join(words[i:j]))
+                if product is not None:
+                    found.add(product)
+        return found
+
+
+class Speculation:
+    def __init__(self, customer: str, messages: List[SimpleMessage]):
+        self.customer = customer
+        self.messages = messages
+        self.mentioned: Set[Any] = set()
+        self.entry: Union[StreamEntry, None] = None
+        self.task: Union[asyncio.Task, None] = None
+        # restart waiting for the turns to settle
+        self.timer: Union[asyncio.TimerHandle, None] = None
+        self.started = 0.0
+        # messages the running speculation was started from
+        self.based_on = 0
+
+
+class SpeculativeSuggestions:
+    """
+    Suggestions generated ahead of the request during a voice call.
+
+    The call transcript is followed per thread and, once it mentioned a
+    product, a suggestion stream is (re)started over the transcript so far
+    on every new turn, ``debounce`` seconds after the last one so a burst of
+    transcripts starts one stream. A later /api/suggestion for the thread
+    takes the warm stream, in flight or finished, instead of starting from
+    nothing, as long as no turn came after it. Speculations nobody took are
+    replaced by the next one and forgotten after ``ttl`` seconds; at most
+    ``max_inflight`` run at once.
+    """
+
+    def __init__(
+        self,
+        create: Callable[[str, List[SimpleMessage]], AsyncIterator[str]],
+        mentions: ProductMentions,
+        max_threads: int = 1000,
+        max_inflight: int = 8,
+        ttl: float = 300,
+        debounce: float = 0.2,
+    ):
+        self.create = create
+        self.mentions = mentions
+        self.max_threads = max_threads
+        self.max_inflight = max_inflight
+        self.ttl = ttl
+        self.debounce = debounce
+        self.threads: "OrderedDict[str, Speculation]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self.metrics = {
+            "started": 0,
+            "cancelled": 0,
+            "skipped": 0,
+            "attached": 0,
+            "stale": 0,
+            "missed": 0,
+        }
+
+    def start(self, thread_id: str, customer: str, messages: List[SimpleMessage]):
+        """
+        A call starts on the thread, ``messages`` is the chat so far.
+        """
+        current = self.threads.pop(thread_id, None)
+        if current is not None:
+            self._cancel(current)
+        self.threads[thread_id] = Speculation(customer, list(messages))
+        while len(self.threads) > self.max_threads:
+            _, speculation = self.threads.popitem(last=False)
+            self._cancel(speculation)
+
+    def observe(self, thread_id: str, name: str, text: str):
+        speculation = self.threads.get(thread_id)
+        if speculation is None:
+            return
+        speculation.messages.append(SimpleMessage(name=name, text=text))
+        speculation.mentioned |= self.mentions.find(text)
+        if len(speculation.mentioned) == 0:
+            return
+        if speculation.timer is not None:
+            speculation.timer.cancel()
+        if self.debounce > 0:
+            loop = asyncio.get_running_loop()
+            speculation.timer = loop.call_later(
+                self.debounce, self._speculate, speculation
+            )
+        else:
+            self._speculate(speculation)
+
+    def _speculate(self, speculation: Speculation):
+        self._cancel(speculation)
+        if len(self._tasks) >= self.max_inflight:
+            self.metrics["skipped"] += 1
+            return
+
+        self.metrics["started"] += 1
+        entry = StreamEntry()
+        task = asyncio.create_task(
+            entry.record(
+                self.create(speculation.customer, list(speculation.messages))
+            )
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        speculation.entry, speculation.task = entry, task
+        speculation.started = time.monotonic()
+        speculation.based_on = len(speculation.messages)
+
+    def _cancel(self, speculation: Speculation):
+        # only speculations nobody attached to are left here
+        if speculation.timer is not None:
+            speculation.timer.cancel()
+            speculation.timer = None
+        if speculation.task is not None and not speculation.task.done():
+            speculation.task.cancel()
+            self.metrics["cancelled"] += 1
+        speculation.entry, speculation.task = None, None
+
+    def attach(self, thread_id: str) -> Union[StreamEntry, None]:
+        """
+        Take the warm suggestion stream for the thread, if there is a usable
+        one. It is handed over to the caller, the next mention starts anew.
+        A stream started before the latest turns is not usable: it would
+        leave out what was said since.
+        """
+        speculation = self.threads.get(thread_id)
+        entry = speculation.entry if speculation is not None else None
+        if entry is not None and len(speculation.messages) > speculation.based_on:
+            self.metrics["stale"] += 1
+            self._cancel(speculation)
+            entry = None
+        if (
+            speculation is None
+            or entry is None
+            or entry.error is not None
+            or time.monotonic() - speculation.started > self.ttl
+        ):
+            self.metrics["missed"] += 1
+            return None
+
+        self.threads.move_to_end(thread_id)
+        speculation.entry, speculation.task = None, None
+        self.metrics["attached"] += 1
+        return entry
+
+    async def close(self):
+        for speculation in self.threads.values():
+            if speculation.timer is not None:
+                speculation.timer.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.threads.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "threads": len(self.threads),
+            "inflight": len(self._tasks),
+            **self.metrics,
+        }
@@ -0,0 +1,145 @@
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Literal, Union
+
+from api.suggestions import SimpleMessage
+
+Decision = Literal["no", "unsure"]
+
+# the customer asking to see the products (strong) or something that might be
+# that (weak), and the assistant agreeing to put something on screen
+STRONG_ASK = re.compile(
+    r"\b(write[- ]?ups?|visual(ly)?|visual description|show (this|it|them|these) to me"
+    r"|see (the|these|those) products|send me|pictures?|on (my|the) screen)\b",
+    re.IGNORECASE,
+)
+WEAK_ASK = re.compile(
+    r"\b(show me|can i see|let me see|look at|see them|see it)\b", re.IGNORECASE
+)
+ECHO = re.compile(
+    r"\b(write[- ]?ups?|visual(ly)?|put (it|this|that|them) together|put together"
+    r"|(show|send) (you|them)|on (your|the) screen|(pull|bring) (it|them|those) up)\b",
+    re.IGNORECASE,
+)
+# common English words, the patterns above only read English
+ENGLISH = re.compile(
+    r"\b(the|a|an|to|you|your|i|me|my|it|is|are|can|could|would|this|that"
+    r"|of|for|and|what|how|please|do|have|with|some|these|those)\b",
+    re.IGNORECASE,
+)
+
+
+def readable(text: str) -> bool:
+    """
+    Whether the keyword patterns can tell anything from text: mostly ASCII
+    letters and, past a few words, some common English words.
+    """
+    letters = [c for c in text if c.isalpha()]
+    if sum(not c.isascii() for c in letters) > len(letters) / 10:
+        return False
+    return len(text.split()) <= 3 or ENGLISH.search(text) is not None
+
+
+class WriteupDetector:
+    """
+    Incremental version of suggestion_requested for one conversation.
+
+    Only the messages added since the last call are looked at. A keyword
+    pass answers NO locally when there is no ask in sight; an ask, an echo
+    by the assistant, or a message the patterns cannot read (not English)
+    sends the last few messages to writeup.prompty, which makes every YES.
+    Once the model said a write up was requested the answer stays YES.
+    """
+
+    def __init__(
+        self,
+        escalate: Callable[[List[SimpleMessage]], Awaitable[bool]],
+        window: int = 4,
+    ):
+        self.escalate = escalate
+        self.window = window
+        self.messages: List[SimpleMessage] = []
+        self.requested = False
+        # customer message that may be asking for a write up, and how clearly
+        self.ask: Union[int, None] = None
+        self.strong = False
+        # the ask an "unsure" decision is about
+        self.focus = 0
+        self.metrics = {"calls": 0, "local": 0, "escalated": 0}
+
+    def classify(self, messages: List[SimpleMessage]) -> Decision:
+        decision: Decision = "no"
+        for message in messages:
+            index = len(self.messages)
+            self.messages.append(message)
+            if message.name == "user":
+                if STRONG_ASK.search(message.text):
+                    self.ask, self.strong = index, True
+                elif self.strong:
+                    continue
+                elif WEAK_ASK.search(message.text) or not readable(message.text):
+                    self.ask, self.strong = index, False
+            elif self.ask is not None:
+                # the assistant answered the ask, echoing it or not; a refusal
+                # can echo a clear ask too ("I can't send you receipts")
+                echo = ECHO.search(message.text) or not readable(message.text)
+                if echo or self.strong:
+                    decision, self.focus = "unsure", self.ask
+                self.ask, self.strong = None, False
+        return decision
+
+    async def update(self, messages: List[SimpleMessage]) -> bool:
+        """
+        ``messages`` is the whole transcript so far, as the client sends it.
+        """
+        self.metrics["calls"] += 1
+        if self.requested:
+            return True
+
+        seen = len(self.messages)
+        if seen > 0 and (len(messages) < seen or messages[seen - 1] != self.messages[-1]):
+            # a different transcript for this thread, start over
+            self.messages, self.ask, self.strong = [], None, False
+            seen = 0
+
+        decision = self.classify(messages[seen:])
+        if decision == "unsure":
+            self.metrics["escalated"] += 1
+            # the ask in question and what followed, at least the last window
+            start = max(min(self.focus, len(self.messages) - self.window), 0)
+            self.requested = await self.escalate(self.messages[start:])
+            return self.requested
+        self.metrics["local"] += 1
+        return False
+
+
+class WriteupDetectors:
+    """
+    One detector per thread, least recently used dropped past ``max_threads``.
+    """
+
+    def __init__(
+        self,
+        escalate: Callable[[List[SimpleMessage]], Awaitable[bool]],
+        max_threads: int = 1000,
+    ):
+        self.escalate = escalate
+        self.max_threads = max_threads
+        self.detectors: "OrderedDict[str, WriteupDetector]" = OrderedDict()
+
+    def get(self, thread_id: str) -> WriteupDetector:
+        detector = self.detectors.get(thread_id)
+        if detector is None:
+            detector = WriteupDetector(self.escalate)
+            self.detectors[thread_id] = detector
+            while len(self.detectors) > self.max_threads:
+                self.detectors.popitem(last=False)
+        self.detectors.move_to_end(thread_id)
+        return detector
+
+    def stats(self) -> Dict[str, int]:
+        totals = {"threads": len(self.detectors), "calls": 0, "local": 0, "escalated": 0}
+        for detector in self.detectors.values():
+            for key, value in detector.metrics.items():
+                totals[key] += value
+        return totals
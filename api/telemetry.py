@@ -1,76 +1,277 @@
 import os
 import json
 import logging
+import time
+import threading
 import contextlib
 from pathlib import Path
-from typing import Union
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Literal, Tuple, Union
 from prompty.tracer import Tracer, PromptyTracer
 from opentelemetry import trace as oteltrace
-from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import StatusCode
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.sdk.resources import SERVICE_NAME, Resource
 
 base_path = Path(__file__).resolve().parent
 _tracer = "prompty"
 
+# fields never written out verbatim (images and audio are base64 payloads)
+REDACTED_FIELDS = ("image", "images", "audio", "delta", "b64_json")
+
 
 class GenAIOTel:
-    def __init__(self, file_path: Union[str, Path]):
+    """
+    Maps prompty trace values onto span attributes, within a budget: at most
+    ``max_attributes`` attributes per span, string values cut at
+    ``max_value_size`` characters, and large or binary fields (images, audio,
+    base64 data urls) replaced by a size marker. Keys from the semantic mapper
+    are always kept, even once the budget is spent.
+    """
+
+    def __init__(
+        self,
+        file_path: Union[str, Path],
+        max_attributes: Union[int, None] = 128,
+        max_value_size: Union[int, None] = 1024,
+        redact: Iterable[str] = REDACTED_FIELDS,
+        provider: Union[oteltrace.TracerProvider, None] = None,
+    ):
         if not isinstance(file_path, Path):
             self.file_path = Path(file_path).resolve().absolute()
         else:
             self.file_path = file_path.resolve().absolute()
         self.writeable_types = (bool, str, bytes, int, float)
+        self.max_attributes = max_attributes
+        self.max_value_size = max_value_size
+        self.redact = frozenset(redact)
+        # the global tracer provider unless given one
+        self.provider = provider
 
         if not self.file_path.exists():
             raise FileNotFoundError(f"File not found: {self.file_path}")
 
         with open(self.file_path, "r") as file:
-            self._mapper = json.load(file)
+            self._mapper: Dict[str, str] = json.load(file)
+
+        # every prefix of a mapped key, so subtrees that cannot contain one
+        # are skipped outright once the attribute budget is spent
+        self._prefixes = frozenset(
+            ".".join(key.split(".")[:i])
+            for key in self._mapper
+            for i in range(1, key.count(".") + 2)
+        )
 
     def get_key(self, key: str) -> str:
-        if key in self._mapper:
-            return self._mapper[key]
-        return key
+        return self._mapper.get(key, key)
+
+    def _value(self, key: str, value: Any) -> Any:
+        if isinstance(value, dict):
+            return f"<redacted {len(value)} fields>"
+        if isinstance(value, bytes):
+            return f"<{len(value)} bytes>"
+        if isinstance(value, str):
+            if key.rsplit(".", 1)[-1] in self.redact or value.startswith("data:"):
+                return f"<redacted {len(value)} chars>"
+            size = self.max_value_size
+            if size is not None and len(value) > size:
+                return f"{value[:size]}...(+{len(value) - size})"
+            return value
+        if isinstance(value, (bool, int, float)):
+            return value
+        return self._value(key, str(value))
 
     @contextlib.contextmanager
     def trace_span(self, name: str):
-        tracer = oteltrace.get_tracer(_tracer)
+        tracer = oteltrace.get_tracer(_tracer, tracer_provider=self.provider)
 
         with tracer.start_as_current_span(name, attributes={"task": name}) as span:
+            # not sampled, skip flattening altogether
+            if not span.is_recording():
+                yield lambda key, value: None
+                return
+
+            budget = self.max_attributes
+            written = 0
+            dropped = 0
 
             def verbose_trace(key, value):
+                nonlocal written, dropped
+                over = budget is not None and written >= budget
+                if over and key not in self._prefixes:
+                    dropped += 1
+                    return
                 if isinstance(value, dict):
-                    for k, v in value.items():
-                        verbose_trace(f"{key}.{k}", v)
+                    if key.rsplit(".", 1)[-1] not in self.redact:
+                        for k, v in value.items():
+                            verbose_trace(f"{key}.{k}", v)
+                        return
                 elif isinstance(value, (list, tuple)):
                     for index, item in enumerate(value):
                         verbose_trace(f"{key}.{index}", item)
-                else:
-                    attr = self.get_key(key)
-                    if isinstance(value, self.writeable_types):
-                        span.set_attribute(attr, str(value))
-                    else:
-                        span.set_attribute(attr, str(value))
+                    return
+
+                attr = self._mapper.get(key)
+                if attr is None:
+                    if over:
+                        dropped += 1
+                        return
+                    attr = key
+                span.set_attribute(attr, self._value(key, value))
+                written += 1
 
             yield verbose_trace
 
+            if dropped > 0:
+                span.set_attribute("trace.dropped_attributes", dropped)
+
+
+class TailSampler(SpanProcessor):
+    """
+    Buffers the spans of each trace until its local root ends, then exports
+    the whole trace if it failed, was slower than ``slow_ms``, or falls in the
+    ``rate`` fraction of traces kept at random. Traces with more than
+    ``max_spans`` buffered spans keep only the first ones.
+
+    Spans that end after their local root (background tasks) follow the
+    decision already made for the trace. At most ``max_traces`` traces are
+    buffered; past that, or once a trace's root has not ended after
+    ``max_age`` seconds (a long voice call), the trace is decided on what was
+    buffered so far and its later spans, the root included, follow that
+    decision.
+    """
+
+    def __init__(
+        self,
+        delegate: SpanProcessor,
+        rate: float = 0.1,
+        slow_ms: float = 2000,
+        max_spans: int = 512,
+        max_traces: int = 1024,
+        max_age: float = 300,
+    ):
+        self.delegate = delegate
+        self.rate = rate
+        self.slow_ms = slow_ms
+        self.max_spans = max_spans
+        self.max_traces = max_traces
+        self.max_age = max_age
+        # trace id -> (first span seen, spans), oldest first
+        self._traces: OrderedDict[int, Tuple[float, List[ReadableSpan]]] = (
+            OrderedDict()
+        )
+        # trace id -> kept, for the traces already decided
+        self._decided: OrderedDict[int, bool] = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {"kept": 0, "dropped": 0, "evicted": 0}
+
+    def on_start(self, span, parent_context=None):
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan):
+        context = span.context
+        if context is None:
+            return
+        root = span.parent is None or span.parent.is_remote
+        with self._lock:
+            now = time.monotonic()
+            exports = self._evict(now)
+            if context.trace_id in self._decided:
+                if self._decided[context.trace_id]:
+                    exports.append(span)
+            else:
+                _, spans = self._traces.setdefault(context.trace_id, (now, []))
+                if len(spans) < self.max_spans:
+                    spans.append(span)
+                if root:
+                    self._traces.pop(context.trace_id)
+                    duration = None
+                    if span.start_time is not None and span.end_time is not None:
+                        duration = (span.end_time - span.start_time) / 1e6
+                    if self._decide(context.trace_id, spans, duration):
+                        exports.extend(spans)
+
+        for item in exports:
+            self.delegate.on_end(item)
+
+    def _decide(
+        self, trace_id: int, spans: List[ReadableSpan], duration: Union[float, None]
+    ) -> bool:
+        keep = self._keep(trace_id, spans, duration)
+        self._decided[trace_id] = keep
+        self._decided.move_to_end(trace_id)
+        while len(self._decided) > self.max_traces:
+            self._decided.popitem(last=False)
+        self.metrics["kept" if keep else "dropped"] += 1
+        return keep
+
+    def _evict(self, now: float) -> List[ReadableSpan]:
+        # decided early on the spans so far, instead of being lost
+        exports: List[ReadableSpan] = []
+        while len(self._traces) > 0:
+            started, _ = next(iter(self._traces.values()))
+            if len(self._traces) < self.max_traces and now - started < self.max_age:
+                break
+            trace_id, (_, spans) = self._traces.popitem(last=False)
+            self.metrics["evicted"] += 1
+            starts = [s.start_time for s in spans if s.start_time is not None]
+            duration = (time.time_ns() - min(starts)) / 1e6 if starts else None
+            if self._decide(trace_id, spans, duration):
+                exports.extend(spans)
+        return exports
+
+    def _keep(
+        self, trace_id: int, spans: List[ReadableSpan], duration: Union[float, None]
+    ) -> bool:
+        if any(s.status.status_code == StatusCode.ERROR for s in spans):
+            return True
+        if duration is not None and duration >= self.slow_ms:
+            return True
+        # same decision for a trace id as TraceIdRatioBased would make
+        return (trace_id & ((1 << 64) - 1)) < self.rate * (1 << 64)
+
+    def shutdown(self):
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
 
-def init_tracing(local_tracing: bool = True):
+
+def init_tracing(
+    local_tracing: bool = True,
+    sampling: Literal["head", "tail"] = "head",
+    sample_rate: float = 1.0,
+    slow_ms: float = 2000,
+    max_attributes: Union[int, None] = 128,
+    max_value_size: Union[int, None] = 1024,
+):
     """
     Initialize tracing for the application
     If local_tracing is True, use the PromptyTracer
     If remote_tracing is True, use the OpenTelemetry tracer
     If remote_tracing is not specified, defaults to using the OpenTelemetry tracer only if local_tracing is False
+
+    OpenTelemetry traces are sampled either up front (head: sample_rate of
+    traces are recorded at all) or once finished (tail: everything is
+    recorded, errors, traces slower than slow_ms and sample_rate of the rest
+    are exported).
     """
 
     if local_tracing:
         local_trace = PromptyTracer()
         Tracer.add("PromptyTracer", local_trace.tracer)
     else:
+        # only needed when exporting, a slow import otherwise paid for nothing
+        from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+
         # Initialize OpenTelemetry Tracer
-        otel_genai_mapper = GenAIOTel(base_path / "semantic-mapper.json")
+        otel_genai_mapper = GenAIOTel(
+            base_path / "semantic-mapper.json",
+            max_attributes=max_attributes,
+            max_value_size=max_value_size,
+        )
         Tracer.add("OpenTelemetry", otel_genai_mapper.trace_span)
 
         azmon_logger = logging.getLogger("azure")
@@ -84,12 +285,20 @@ def init_tracing(local_tracing: bool = True):
         # Add the Azure exporter to the tracer provider
         resource = Resource(attributes={SERVICE_NAME: "contoso-voice-api"})
 
-        provider = TracerProvider(resource=resource)
-        provider.add_span_processor(
-            BatchSpanProcessor(
-                AzureMonitorTraceExporter(connection_string=app_insights)
-            )
+        exporter = BatchSpanProcessor(
+            AzureMonitorTraceExporter(connection_string=app_insights)
         )
+        if sampling == "tail":
+            provider = TracerProvider(resource=resource)
+            provider.add_span_processor(
+                TailSampler(exporter, rate=sample_rate, slow_ms=slow_ms)
+            )
+        else:
+            provider = TracerProvider(
+                resource=resource,
+                sampler=ParentBased(TraceIdRatioBased(sample_rate)),
+            )
+            provider.add_span_processor(exporter)
 
         oteltrace.set_tracer_provider(provider)
         return oteltrace.get_tracer(_tracer)
@@ -0,0 +1,5 @@
+import os
+
+# prompty resolves ${env:...} connection settings when the prompts load
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://localhost")
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "fake_key")
@@ -0,0 +1,125 @@
+import os
+import json
+import pytest
+
+from api.catalog import Catalog, default_catalog
+
+products = [
+    {"id": 1, "name": "Trail Tent", "category": "Tents", "brand": "OutdoorLiving"},
+    {"id": 2, "name": "Snow Bag", "category": "Sleeping Bags", "brand": "CozyNights"},
+    {"id": 3, "name": "Summit Tent", "category": "Tents", "brand": "CozyNights"},
+]
+purchases = [{"id": 4, "name": "Old Boots", "category": "Boots", "brand": "TrekReady"}]
+
+
+def write(path, data, bump=0):
+    path.write_text(json.dumps(data))
+    if bump:
+        stat = path.stat()
+        os.utime(path, (stat.st_atime, stat.st_mtime + bump))
+
+
+def test_catalog_indexes(tmp_path):
+    write(tmp_path / "products.json", products)
+    write(tmp_path / "purchases.json", purchases)
+    snapshot = Catalog(tmp_path / "products.json", tmp_path / "purchases.json").current()
+
+    assert snapshot.get(2)["name"] == "Snow Bag"
+    assert snapshot.named("trail tent")["id"] == 1
+    assert [p["id"] for p in snapshot.in_category("tents")] == [1, 3]
+    assert [p["id"] for p in snapshot.from_brand("CozyNights")] == [2, 3]
+    assert snapshot.in_category("Kayaks") == ()
+    assert snapshot.purchases[0]["name"] == "Old Boots"
+    assert snapshot.index.search("tent", k=1)[0]["category"] == "Tents"
+    # the same product objects everywhere
+    assert snapshot.by_id[3] is snapshot.by_brand["cozynights"][1]
+
+
+def test_catalog_products_are_read_only(tmp_path):
+    write(tmp_path / "products.json", [{**products[0], "images": ["a.png"]}])
+    write(tmp_path / "purchases.json", purchases)
+    snapshot = Catalog(tmp_path / "products.json", tmp_path / "purchases.json").current()
+
+    product = snapshot.get(1)
+    with pytest.raises(TypeError):
+        product["name"] = "Renamed"
+    with pytest.raises(TypeError):
+        snapshot.purchases[0].update(name="Renamed")
+    with pytest.raises(AttributeError):
+        product["images"].append("b.png")
+    # still serializes as the product it was loaded from
+    assert json.loads(json.dumps(product))["images"] == ["a.png"]
+
+
+def test_catalog_reloads_on_change(tmp_path):
+    write(tmp_path / "products.json", products)
+    write(tmp_path / "purchases.json", purchases)
+    catalog = Catalog(tmp_path / "products.json", tmp_path / "purchases.json", 0)
+    before = catalog.current()
+    assert catalog.current() is before
+
+    write(tmp_path / "products.json", products[:1], bump=10)
+    after = catalog.current()
+    assert after is not before
+    assert len(after.products) == 1
+    # whoever holds the old snapshot still sees the old catalog
+    assert len(before.products) == 3
+
+    # a half written file keeps the last good catalog, and is retried
+    (tmp_path / "products.json").write_text("[{")
+    write(tmp_path / "purchases.json", [], bump=20)
+    assert catalog.current() is after
+    write(tmp_path / "products.json", products, bump=30)
+    assert len(catalog.current().products) == 3
+    assert catalog.current().purchases == ()
+
+
+def test_catalog_missing_file_keeps_last_snapshot(tmp_path):
+    write(tmp_path / "products.json", products)
+    write(tmp_path / "purchases.json", purchases)
+    catalog = Catalog(tmp_path / "products.json", tmp_path / "purchases.json", 0)
+    before = catalog.current()
+
+    (tmp_path / "products.json").unlink()
+    assert catalog.current() is before
+    # starts empty when there is nothing to load yet
+    empty = Catalog(tmp_path / "products.json", tmp_path / "purchases.json", 0)
+    assert empty.current().products == ()
+    assert empty.version == 0
+
+
+def test_catalog_malformed_product_keeps_last_snapshot(tmp_path):
+    write(tmp_path / "products.json", products)
+    write(tmp_path / "purchases.json", purchases)
+    catalog = Catalog(tmp_path / "products.json", tmp_path / "purchases.json", 0)
+    before = catalog.current()
+
+    bump = 10
+    for malformed in (
+        [{"id": 5, "name": None, "category": "Tents"}],
+        ["Trail Tent"],
+        7,
+    ):
+        write(tmp_path / "products.json", malformed, bump=bump)
+        assert catalog.current() is before
+        bump += 10
+    assert catalog.version == 1
+
+
+def test_catalog_checks_files_at_most_every_interval(tmp_path):
+    write(tmp_path / "products.json", products)
+    write(tmp_path / "purchases.json", purchases)
+    catalog = Catalog(tmp_path / "products.json", tmp_path / "purchases.json", 60)
+    before = catalog.current()
+    write(tmp_path / "products.json", products[:1], bump=10)
+    assert catalog.current() is before
+    assert catalog.refresh()
+    assert len(catalog.current().products) == 1
+
+
+def test_default_catalog_is_shared():
+    catalog = default_catalog()
+    assert catalog is default_catalog()
+    assert len(catalog.current().products) == 20
+    ids = {p["id"] for p in catalog.current().products}
+    assert {p["id"] for p in catalog.current().purchases} <= ids
@@ -1,14 +1,97 @@
+import json
+import random
+import pytest
 
-def test_groundedness():
-    pass
+from api.chat.context import ChatContext
+from api.chat.stream import JsonFieldStream
 
 
-def test_relevance():
-    pass
+def test_context_keeps_latest_summary():
+    context = ChatContext(token_budget=1000, max_turns=2)
+    context.add("q1", "r1", "summary 1")
+    context.add("q2", "r2", "summary 1 and 2")
+    context.add("q3", "r3", "summary 1, 2 and 3")
 
+    items = context.items()
+    assert items[0] == "Summary so far: summary 1, 2 and 3"
+    assert len(items) == 3
+    assert "q1" not in "".join(items)
 
-def test_coherence():
-    pass
 
-def test_fluency():
-    pass
\ No newline at end of file
+def test_context_compacts_to_budget():
+    context = ChatContext(token_budget=100, max_turns=10)
+    for i in range(10):
+        context.add(f"question {i} " * 5, f"response {i} " * 5, "summary " * (i * 10))
+
+    assert context.tokens() <= 100
+    assert context.compactions > 0
+    assert context.items()[0].startswith("Summary so far: ...")
+
+
+def feed_in_pieces(text, field="response", seed=0):
+    rng = random.Random(seed)
+    stream = JsonFieldStream(field)
+    deltas = []
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 6)
+        deltas.append(stream.feed(text[i : i + size]))
+        i += size
+    return stream, deltas
+
+
+def test_stream_field_across_chunks():
+    response = {
+        "response": 'Hi Seth! 🏕️ The "SkyView" tent\nis great:\n\t- warm\\dry é',
+        "context": 'Asked about {tents}, "response": [no]',
+        "call": 2,
+    }
+    for ensure_ascii in (True, False):
+        text = json.dumps(response, ensure_ascii=ensure_ascii)
+        for seed in range(50):
+            stream, deltas = feed_in_pieces(text, seed=seed)
+            assert "".join(deltas) == response["response"]
+            assert stream.result() == response
+
+
+def test_stream_field_not_first():
+    text = json.dumps({"context": "summary", "call": 1, "response": "Hello"})
+    stream, deltas = feed_in_pieces(text)
+    assert "".join(deltas) == "Hello"
+
+
+def test_stream_text_arrives_early():
+    text = json.dumps({"response": "Hello there", "context": "x" * 200, "call": 1})
+    stream = JsonFieldStream("response")
+    assert stream.feed(text[:19]) == "Hello"
+
+
+@pytest.mark.asyncio
+async def test_fake_chat_server_streams_structured_reply():
+    from openai import AsyncAzureOpenAI
+    from api.benchmarks.fakes import FakeChatServer
+
+    async with FakeChatServer(first_delay=0, tokens_per_second=10000) as server:
+        client = AsyncAzureOpenAI(
+            azure_endpoint=server.url, api_key="fake_key", api_version="2024-08-01-preview"
+        )
+        messages = [{"role": "system", "content": "You are helpful."}]
+        stream = JsonFieldStream("response")
+        streamed = []
+        async for chunk in await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,  # type: ignore
+            response_format={"type": "json_object"},
+            stream=True,
+        ):
+            streamed.append(stream.feed(chunk.choices[0].delta.content or ""))
+
+        completion = await client.chat.completions.create(
+            model="gpt-4o-mini", messages=messages  # type: ignore
+        )
+        await client.close()
+
+    assert "".join(streamed) == server.chat_reply["response"]
+    assert stream.result() == server.chat_reply
+    assert completion.choices[0].message.content == server.suggestion_reply
+    assert server.received == {"chat": 1, "suggestions": 1}
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from azure.ai.evaluation import F1ScoreEvaluator, RougeScoreEvaluator, RougeType
+
+from api.evaluation import EvaluationRunner, OutputCache, load_dataset, summarize
+from api.evaluation.metrics import METRICS, score, score_batch
+
+
+def test_metrics_match_evaluators():
+    f1 = F1ScoreEvaluator()
+    rouge = RougeScoreEvaluator(RougeType.ROUGE_L)
+    for row in load_dataset()[:20]:
+        scored = score(row["context"], row["answer"])
+        expected = f1(response=row["context"], ground_truth=row["answer"])
+        assert scored["f1_score"] == pytest.approx(expected["f1_score"])
+        expected = rouge(response=row["context"], ground_truth=row["answer"])
+        assert scored["rouge"] == pytest.approx(expected["rouge"])
+
+
+def test_metrics_bounds():
+    same = score("Spring, summer, and fall", "Spring, summer, and fall")
+    assert all(same[metric] == pytest.approx(1.0) for metric in METRICS)
+    different = score("Leather", "Nylon")
+    assert all(different[metric] == pytest.approx(0.0) for metric in METRICS)
+
+
+@pytest.mark.asyncio
+async def test_runner_bounds_concurrency_and_caches(tmp_path):
+    rows = load_dataset()[:12]
+    calls = []
+    running = 0
+    most = 0
+
+    async def create(inputs):
+        nonlocal running, most
+        calls.append(inputs["question"])
+        running += 1
+        most = max(most, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return inputs["context"][0]
+
+    cache = OutputCache(tmp_path / "outputs.jsonl", version="1")
+    runner = EvaluationRunner(create, cache, concurrency=3, workers=0)
+    results = await runner.run(rows)
+    assert len(calls) == 12
+    assert most == 3
+    assert not any(r["cached"] for r in results)
+
+    # re-scoring reads the outputs back instead of generating them
+    cache = OutputCache(tmp_path / "outputs.jsonl", version="1")
+    again = await EvaluationRunner(create, cache, workers=0).run(rows)
+    assert len(calls) == 12
+    assert all(r["cached"] for r in again)
+    assert [r["f1_score"] for r in again] == [r["f1_score"] for r in results]
+
+    # a new prompt version misses
+    cache = OutputCache(tmp_path / "outputs.jsonl", version="2")
+    await EvaluationRunner(create, cache, workers=0).run(rows[:1])
+    assert len(calls) == 13
+
+
+@pytest.mark.asyncio
+async def test_runner_scores_in_process_pool():
+    rows = load_dataset()[:10]
+    pairs = [(row["context"], row["answer"]) for row in rows]
+    runner = EvaluationRunner(None, workers=2, batch_size=3)  # type: ignore
+    assert await runner.score(pairs) == score_batch(pairs)
+
+
+@pytest.mark.asyncio
+async def test_runner_keeps_failures():
+    async def create(inputs):
+        raise RuntimeError("rate limited")
+
+    results = await EvaluationRunner(create, workers=0).run(load_dataset()[:2])
+    assert [r["error"] for r in results] == ["rate limited"] * 2
+    assert all(r["f1_score"] is None for r in results)
+    assert summarize(results)["f1_score"]["mean"] == 0.0
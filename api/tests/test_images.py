@@ -0,0 +1,122 @@
+import io
+import base64
+
+import pytest
+from PIL import Image
+
+from api.images import ImagePipeline, image_ref, split_data_url
+from api.models import ClientMessage
+from api.session import ChatSession
+
+
+def data_url(image: Image.Image, format="JPEG", **params) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    media_type = f"image/{format.lower()}"
+    return f"data:{media_type};base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+
+def decode(url: str) -> Image.Image:
+    _, data = split_data_url(url)
+    return Image.open(io.BytesIO(data))
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = ImagePipeline(max_dimension=512, quality=75)
+    yield pipeline
+    pipeline.close()
+
+
+@pytest.mark.asyncio
+async def test_large_photo_downscaled(pipeline):
+    photo = Image.effect_noise((3000, 2000), 64).convert("RGB")
+    upload = data_url(photo, quality=95)
+    processed = await pipeline.process(upload)
+
+    image = decode(processed.data_url)
+    assert image.format == "JPEG"
+    assert image.size == (512, 341)
+    assert (processed.width, processed.height) == (512, 341)
+    assert processed.size < processed.original_size / 5
+    assert processed.ref == image_ref(split_data_url(upload)[1])
+
+
+@pytest.mark.asyncio
+async def test_repeated_upload_processed_once(pipeline):
+    upload = data_url(Image.new("RGB", (1000, 1000), (10, 120, 40)))
+    first = await pipeline.process(upload)
+    second = await pipeline.process(upload)
+    assert first is second
+    assert pipeline.stats()["processed"] == 1
+    assert pipeline.stats()["cached"] == 1
+
+
+@pytest.mark.asyncio
+async def test_transparent_png_to_jpeg(pipeline):
+    image = Image.new("RGBA", (100, 50), (0, 0, 0, 0))
+    processed = await pipeline.process(data_url(image, format="PNG"))
+    converted = decode(processed.data_url)
+    assert processed.data_url.startswith("data:image/jpeg;base64,")
+    assert converted.mode == "RGB"
+    assert converted.getpixel((10, 10)) == (255, 255, 255)
+
+
+@pytest.mark.asyncio
+async def test_small_jpeg_kept(pipeline):
+    image = Image.effect_noise((64, 64), 64).convert("RGB")
+    upload = data_url(image, quality=30, optimize=True)
+    processed = await pipeline.process(upload)
+    assert processed.data_url == upload
+
+
+@pytest.mark.asyncio
+async def test_exif_orientation_applied(pipeline):
+    image = Image.new("RGB", (200, 100), (0, 0, 255))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees
+    processed = await pipeline.process(data_url(image, exif=exif.tobytes()))
+    assert decode(processed.data_url).size == (100, 200)
+
+
+@pytest.mark.asyncio
+async def test_webp(pipeline):
+    pipeline.format = "WEBP"
+    processed = await pipeline.process(data_url(Image.new("RGB", (800, 600))))
+    assert decode(processed.data_url).format == "WEBP"
+
+
+@pytest.mark.asyncio
+async def test_not_an_image(pipeline):
+    with pytest.raises(ValueError):
+        await pipeline.process("https://example.com/image.jpg")
+    with pytest.raises(Exception):
+        await pipeline.process("data:image/jpeg;base64,aGVsbG8=")
+    assert pipeline.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_session_refers_to_repeated_image(pipeline):
+    session = ChatSession(None, "thread", images=pipeline)  # type: ignore
+    upload = data_url(Image.new("RGB", (1000, 800), (10, 120, 40)))
+
+    image, question = await session.prepare_image(
+        ClientMessage(name="Seth", text="What is this?", image=upload)
+    )
+    assert image is not None and image != upload
+    assert question == "What is this?"
+
+    ref = image_ref(split_data_url(upload)[1])
+    for message in [
+        ClientMessage(name="Seth", text="And now?", image=upload),
+        ClientMessage(name="Seth", text="And now?", image_ref=ref),
+    ]:
+        image, question = await session.prepare_image(message)
+        assert image is None
+        assert question.startswith("And now?\n")
+
+    # a ref the thread has never seen is dropped
+    image, question = await session.prepare_image(
+        ClientMessage(name="Seth", text="Hi", image_ref="0" * 64)
+    )
+    assert image is None and question == "Hi"
@@ -0,0 +1,45 @@
+import pytest
+
+from api import metrics
+from api.voice.relay import Relay
+
+
+def scrape() -> str:
+    return metrics.render().decode()
+
+
+def test_histograms_exposed():
+    metrics.init_metrics()
+    with metrics.timed(metrics.llm_duration, prompt="chat"):
+        pass
+    metrics.llm_time_to_first_token.record(0.2, {"prompt": "suggestions"})
+
+    text = scrape()
+    assert 'llm_call_duration_seconds_bucket{' in text
+    assert 'prompt="chat"' in text
+    assert 'llm_time_to_first_token_seconds_count{' in text
+    # latency buckets instead of the SDK defaults
+    assert 'le="0.0025"' in text
+
+
+def test_gauge_with_labels():
+    metrics.init_metrics()
+    metrics.observe("test.queue.depth", lambda: {"a": 1, "b": 2}, key="queue")
+    text = scrape()
+    assert 'queue="a"' in text and 'queue="b"' in text
+
+
+@pytest.mark.asyncio
+async def test_relay_records_send_latency():
+    metrics.init_metrics()
+    sent = []
+
+    async def send(item):
+        sent.append(item)
+
+    relay = Relay(send, name="voice.test")
+    await relay.put("hello")
+    await relay.join()
+    await relay.close()
+
+    assert 'socket="voice.test"' in scrape()
@@ -0,0 +1,28 @@
+import json
+
+from api.models import (
+    START_ASSISTANT,
+    STOP_ASSISTANT,
+    action_frame,
+    context_frame,
+    full_assistant,
+    full_assistant_frame,
+    send_action,
+    send_context,
+    start_assistant,
+    stop_assistant,
+    stream_assistant,
+    stream_assistant_frame,
+)
+
+
+def test_frames_match_models():
+    text = "Hello 👋 \"quoted\" \n newline"
+    assert json.loads(START_ASSISTANT) == start_assistant()
+    assert json.loads(STOP_ASSISTANT) == stop_assistant()
+    assert json.loads(stream_assistant_frame(text)) == stream_assistant(text)
+    assert json.loads(full_assistant_frame(text)) == full_assistant(text)
+    assert json.loads(context_frame(text)) == send_context(text)
+    assert json.loads(action_frame("call", '{"score": 5}')) == send_action(
+        "call", '{"score": 5}'
+    )
@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from openai import AsyncAzureOpenAI
+
+from api.benchmarks.fakes import FakeRealtimeServer
+from api.voice import create_session, session_delta
+from api.voice.pool import RealtimePool
+
+
+def create_client(url: str) -> AsyncAzureOpenAI:
+    return AsyncAzureOpenAI(
+        azure_endpoint="https://localhost",
+        api_key="fake_key",
+        api_version="2024-10-01-preview",
+        websocket_base_url=url,
+    )
+
+
+async def wait_for(condition, timeout: float = 5):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_session_delta():
+    base = create_session(None)
+    delta = session_delta(base, create_session("Be brief."))
+    assert delta.model_dump(exclude_unset=True) == {"instructions": "Be brief."}
+
+    delta = session_delta(base, create_session("Be brief.", threshold=0.5))
+    assert set(delta.model_dump(exclude_unset=True)) == {
+        "instructions",
+        "turn_detection",
+    }
+
+
+@pytest.mark.asyncio
+async def test_pool_prewarms_and_refills():
+    async with FakeRealtimeServer() as server:
+        client = create_client(server.url)
+        pool = RealtimePool(client, create_session(None), size=2)
+        await pool.start()
+        try:
+            await wait_for(lambda: pool.idle == 2)
+            assert server.connections == 2
+
+            async with pool.connection() as (connection, configured):
+                assert configured is pool.session
+                await connection.send({"type": "response.create"})
+                async for event in connection:
+                    if event.type == "response.done":
+                        break
+
+            # refilled in the background
+            await wait_for(lambda: pool.idle == 2)
+            assert server.connections == 3
+            assert pool.metrics["hits"] == 1
+            await wait_for(lambda: server.received["session.update"] == 3)
+        finally:
+            await pool.close()
+            await client.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_expires_idle_connections():
+    async with FakeRealtimeServer() as server:
+        client = create_client(server.url)
+        pool = RealtimePool(client, create_session(None), size=1, max_idle=0.05)
+        await pool.start()
+        try:
+            await wait_for(lambda: pool.idle == 1)
+            # stale connections are closed and replaced in the background
+            await wait_for(lambda: pool.metrics["expired"] >= 1)
+            await wait_for(lambda: server.connections >= 2)
+        finally:
+            await pool.close()
+            await client.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_skips_connections_closed_by_server():
+    async with FakeRealtimeServer() as server:
+        client = create_client(server.url)
+        pool = RealtimePool(client, create_session(None), size=1)
+        await pool.start()
+        try:
+            await wait_for(lambda: pool.idle == 1)
+            _, stale = pool._idle[0]
+            # the server drops the idle connection
+            await server.stop()
+            await wait_for(lambda: not pool._alive(stale))
+            await server.start()
+
+            connection, configured = await pool.acquire()
+            try:
+                assert connection is not stale
+                assert configured is None
+                assert pool.metrics["dropped"] == 1
+                assert pool.metrics["hits"] == 0
+            finally:
+                await connection.close()
+        finally:
+            await pool.close()
+            await client.close()
+        assert len(pool._closing) == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_disabled_connects_on_demand():
+    async with FakeRealtimeServer() as server:
+        client = create_client(server.url)
+        pool = RealtimePool(client, create_session(None), size=0)
+        await pool.start()
+        async with pool.connection() as (_, configured):
+            assert configured is None
+        assert server.connections == 1
+        assert pool.metrics["misses"] == 1
+        await pool.close()
+        await client.close()
@@ -0,0 +1,133 @@
+import json
+import base64
+import pytest
+
+from api.benchmarks.replay import replay, synthetic_call
+from api.voice.frames import encode_audio
+from api.voice.recording import (
+    AUDIO,
+    CLIENT,
+    FRAME,
+    REALTIME,
+    TEXT,
+    Recorder,
+    parse_event,
+    read_recording,
+)
+
+
+def test_recording_roundtrip(tmp_path):
+    pcm = bytes(range(256)) * 4
+    audio = base64.b64encode(pcm).decode("ascii")
+    user = json.dumps({"type": "user", "payload": "Hi"})
+    delta = {
+        "type": "response.audio.delta",
+        "event_id": "event_2",
+        "response_id": "resp_1",
+        "item_id": "item_1",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": audio,
+    }
+
+    started = {
+        "type": "input_audio_buffer.speech_started",
+        "event_id": "event_1",
+        "audio_start_ms": 0,
+        "item_id": "item_0",
+    }
+    received = {"type": "websocket.receive"}
+
+    recorder = Recorder(tmp_path / "call.cvr")
+    recorder.client({**received, "text": user}, at=0.0)
+    audio_message = json.dumps({"type": "audio", "payload": audio})
+    recorder.client({**received, "text": audio_message}, at=0.02)
+    recorder.client({**received, "bytes": encode_audio(pcm)}, at=0.04)
+    recorder.realtime(parse_event(started), at=0.5)
+    recorder.realtime(parse_event(delta), at=1.25)
+    recorder.close()
+
+    records = list(read_recording(tmp_path / "call.cvr"))
+    assert [(r.source, r.kind) for r in records] == [
+        (CLIENT, TEXT),
+        (CLIENT, AUDIO),
+        (CLIENT, FRAME),
+        (REALTIME, TEXT),
+        (REALTIME, AUDIO),
+    ]
+    assert [r.time for r in records] == [0.0, 0.02, 0.04, 0.5, 1.25]
+    assert records[0].message()["text"] == user
+    assert json.loads(records[1].message()["text"]) == json.loads(audio_message)
+    assert records[2].message()["bytes"] == encode_audio(pcm)
+    assert records[3].event().to_dict() == started
+    assert records[4].event().to_dict() == delta
+    # audio is stored as PCM, not base64
+    assert records[4].audio_size() == len(pcm)
+    assert (tmp_path / "call.cvr").stat().st_size < len(audio) * 3
+
+
+def test_not_a_recording(tmp_path):
+    (tmp_path / "call.cvr").write_bytes(b"{}")
+    with pytest.raises(ValueError):
+        list(read_recording(tmp_path / "call.cvr"))
+
+
+@pytest.mark.asyncio
+async def test_replay_through_realtime_client(tmp_path):
+    records = list(read_recording(synthetic_call(tmp_path / "call.cvr", turns=2)))
+
+    transcripts = []
+
+    async def on_transcript(name, text):
+        transcripts.append(name)
+
+    result = await replay(records, keep=True, on_transcript=on_transcript)
+
+    assert transcripts == ["user", "assistant", "user", "assistant"]
+    # customer audio went on to the realtime API
+    sent = [e.type for e in result.realtime.sent]
+    assert sent.count("input_audio_buffer.append") == 200
+    # and the answers to the browser
+    assert result.browser.audio_bytes[-1] == 2 * 50 * 100 * 48
+    delays = result.browser.relay_delays(result.realtime)
+    assert len(delays) == len(result.browser.audio_bytes)
+    assert all(d >= 0 for d in delays)
+
+
+@pytest.mark.asyncio
+async def test_recorded_replay_matches_recording(tmp_path):
+    records = list(read_recording(synthetic_call(tmp_path / "call.cvr", turns=1)))
+
+    recorder = Recorder(tmp_path / "again.cvr")
+    await replay(records, recorder=recorder)
+
+    again = list(read_recording(tmp_path / "again.cvr"))
+    assert sorted((r.source, r.kind, r.payload) for r in again) == sorted(
+        (r.source, r.kind, r.payload) for r in records
+    )
+
+
+@pytest.mark.asyncio
+async def test_failing_recorder_does_not_end_the_call(tmp_path):
+    records = list(read_recording(synthetic_call(tmp_path / "call.cvr", turns=2)))
+
+    class FullDisk(Recorder):
+        def write(self, source, kind, payload, at=None):
+            if self.records >= 10:
+                raise OSError(28, "No space left on device")
+            super().write(source, kind, payload, at)
+
+    transcripts = []
+
+    async def on_transcript(name, text):
+        transcripts.append(name)
+
+    recorder = FullDisk(tmp_path / "again.cvr")
+    result = await replay(records, recorder=recorder, on_transcript=on_transcript)
+
+    assert transcripts == ["user", "assistant", "user", "assistant"]
+    sent = [e.type for e in result.realtime.sent]
+    assert sent.count("input_audio_buffer.append") == 200
+    # given up after the failure, what was written is still readable
+    assert recorder.file is None
+    assert len(list(read_recording(tmp_path / "again.cvr"))) == 10
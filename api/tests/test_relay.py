@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+
+from api.voice.relay import Relay
+
+
+class SlowSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def send(self, item):
+        await self.gate.wait()
+        if self.delay > 0:
+            await asyncio.sleep(self.delay)
+        self.sent.append(item)
+
+
+@pytest.mark.asyncio
+async def test_relay_preserves_order():
+    socket = SlowSocket()
+    relay = Relay(socket.send, maxsize=4, policy="block")
+    for i in range(10):
+        await relay.put(f"m{i}")
+    await relay.join()
+    assert socket.sent == [f"m{i}" for i in range(10)]
+    assert relay.metrics["sent"] == 10
+    assert relay.metrics["max_depth"] <= 4
+    await relay.close()
+
+
+@pytest.mark.asyncio
+async def test_relay_coalesces_audio_when_full():
+    socket = SlowSocket()
+    socket.gate.clear()
+    relay = Relay(socket.send, maxsize=3, policy="coalesce")
+    await relay.put(b"\x00\x00", audio=True)
+    await asyncio.sleep(0)  # writer picks up the first chunk and waits
+    for i in range(1, 6):
+        await asyncio.wait_for(relay.put(bytes([i, i]), audio=True), 1)
+    await relay.put("done")
+    socket.gate.set()
+    await relay.join()
+
+    assert socket.sent[-1] == "done"
+    assert b"".join(socket.sent[:-1]) == b"".join(bytes([i, i]) for i in range(6))
+    assert relay.metrics["coalesced"] > 0
+    await relay.close()
+
+
+@pytest.mark.asyncio
+async def test_relay_drop_oldest_keeps_control_messages():
+    socket = SlowSocket()
+    socket.gate.clear()
+    relay = Relay(socket.send, maxsize=2, policy="drop_oldest")
+    await relay.put("first")
+    await asyncio.sleep(0)
+    await relay.put(b"a", audio=True)
+    await relay.put("control")
+    await asyncio.wait_for(relay.put(b"b", audio=True), 1)
+    socket.gate.set()
+    await relay.join()
+
+    assert socket.sent == ["first", "control", b"b"]
+    assert relay.metrics["dropped"] == 1
+    await relay.close()
+
+
+@pytest.mark.asyncio
+async def test_interrupt_not_stuck_behind_audio():
+    # a slow browser has a backlog of audio when the user starts talking
+    socket = SlowSocket(delay=0.005)
+    relay = Relay(socket.send, maxsize=256, policy="coalesce")
+    for _ in range(100):
+        await relay.put(bytes(960), audio=True)
+
+    assert relay.discard_audio() > 0
+    await relay.put("interrupt")
+    await asyncio.wait_for(relay.join(), 0.5)
+
+    assert socket.sent[-1] == "interrupt"
+    assert len(socket.sent) <= 3
+    await relay.close()
+
+
+@pytest.mark.asyncio
+async def test_relay_stops_on_send_error():
+    async def broken(item):
+        raise RuntimeError("socket closed")
+
+    relay = Relay(broken)
+    await relay.put("a")
+    await asyncio.wait_for(relay.join(), 1)
+    assert relay.closed
+    await relay.put("b")
+    assert relay.depth == 0
+    await relay.close()
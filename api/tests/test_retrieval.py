@@ -0,0 +1,29 @@
+import json
+from pathlib import Path
+
+from api.retrieval import ProductIndex, tokenize
+
+products = json.loads((Path(__file__).parent.parent / "products.json").read_text())
+
+
+def test_tokenize():
+    assert tokenize("SkyView 2-Person Tent!") == ["skyview", "2", "person", "tent"]
+
+
+def test_search_ranks_by_relevance():
+    index = ProductIndex(products)
+    results = index.search("I need a warm sleeping bag for winter", k=2)
+    assert len(results) == 2
+    assert all(p["category"] == "Sleeping Bags" for p in results)
+
+
+def test_search_excludes_and_limits():
+    index = ProductIndex(products)
+    results = index.search("hiking boots shoes", k=3, exclude={4})
+    assert len(results) <= 3
+    assert 4 not in [p["id"] for p in results]
+
+
+def test_search_no_match():
+    index = ProductIndex(products)
+    assert index.search("zzzz qqqq") == []
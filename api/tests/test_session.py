@@ -0,0 +1,127 @@
+import pytest
+from collections import OrderedDict
+from fastapi.websockets import WebSocketState
+
+from api.session import SessionManager
+
+
+class FakeSocket:
+    def __init__(self, state=WebSocketState.CONNECTED):
+        self.client_state = state
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+@pytest.fixture(autouse=True)
+def manager():
+    SessionManager.sessions = OrderedDict()
+    SessionManager.metrics = {"created": 0, "reused": 0, "evicted": 0}
+    SessionManager.max_sessions = 1000
+    SessionManager.idle_ttl = 30 * 60
+    yield SessionManager
+    SessionManager.sessions = OrderedDict()
+
+
+@pytest.mark.asyncio
+async def test_reuse_counts():
+    await SessionManager.create_session("a", FakeSocket())
+    assert SessionManager.get_session("a") is not None
+    assert SessionManager.get_session("b") is None
+    assert SessionManager.stats() == {
+        "live": 1,
+        "created": 1,
+        "reused": 1,
+        "evicted": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_max_sessions_evicts_lru():
+    SessionManager.max_sessions = 2
+    a = FakeSocket()
+    await SessionManager.create_session("a", a)
+    await SessionManager.create_session("b", FakeSocket())
+    SessionManager.get_session("a")
+    await SessionManager.create_session("c", FakeSocket())
+
+    assert list(SessionManager.sessions) == ["a", "c"]
+    assert SessionManager.stats()["evicted"] == 1
+    assert not a.closed
+
+
+@pytest.mark.asyncio
+async def test_max_sessions_prefers_closed():
+    SessionManager.max_sessions = 2
+    await SessionManager.create_session("a", FakeSocket())
+    await SessionManager.create_session("b", FakeSocket(WebSocketState.DISCONNECTED))
+    await SessionManager.create_session("c", FakeSocket())
+
+    assert list(SessionManager.sessions) == ["a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_reaper_evicts_idle_closed_sessions():
+    await SessionManager.create_session("open", FakeSocket())
+    await SessionManager.create_session(
+        "recent", FakeSocket(WebSocketState.DISCONNECTED)
+    )
+    stale = await SessionManager.create_session(
+        "stale", FakeSocket(WebSocketState.DISCONNECTED)
+    )
+    stale.last_active -= SessionManager.idle_ttl + 1
+
+    await SessionManager.clear_closed_sessions()
+
+    assert list(SessionManager.sessions) == ["open", "recent"]
+    assert SessionManager.stats()["evicted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_turn_streams_response(monkeypatch):
+    import json
+    from fastapi import WebSocketDisconnect
+    from api import session as session_module
+
+    class ChatSocket(FakeSocket):
+        def __init__(self):
+            super().__init__()
+            self.incoming = [{"name": "Seth", "text": "Do you have tents?"}]
+            self.sent = []
+
+        async def receive_json(self):
+            if len(self.incoming) == 0:
+                self.client_state = WebSocketState.DISCONNECTED
+                raise WebSocketDisconnect()
+            return self.incoming.pop(0)
+
+        async def send_text(self, data):
+            self.sent.append(json.loads(data))
+
+    async def create_response(customer, question, context, image, on_delta, catalog=None):
+        for delta in ["The Sky", "View tent ", "is warm."]:
+            await on_delta(delta)
+        return {"response": "The SkyView tent is warm.", "context": "tents", "call": 1}
+
+    monkeypatch.setattr(session_module, "create_response", create_response)
+    socket = ChatSocket()
+    chat = await SessionManager.create_session("streamed", socket)
+    with pytest.raises(WebSocketDisconnect):
+        await chat.receive_chat()
+
+    assistant = [m["payload"] for m in socket.sent if m["type"] == "assistant"]
+    assert [m["state"] for m in assistant] == [
+        "start",
+        "stream",
+        "stream",
+        "stream",
+        "complete",
+    ]
+    assert "".join(m["payload"] for m in assistant[1:-1]) == "The SkyView tent is warm."
+    assert chat.call == 1
+    assert [m.text for m in await chat.state.messages("streamed")] == [
+        "Do you have tents?",
+        "The SkyView tent is warm.",
+    ]
@@ -0,0 +1,168 @@
+import json
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from api.suggestions import SimpleMessage
+from api.suggestions.speculative import ProductMentions, SpeculativeSuggestions
+
+products = json.loads((Path(__file__).parent.parent / "products.json").read_text())
+
+
+class Generator:
+    def __init__(self, chunks=3, gate=None):
+        self.chunks = chunks
+        self.gate = gate
+        self.calls = []
+        self.cancelled = 0
+
+    async def __call__(self, customer, messages):
+        self.calls.append((customer, [m.text for m in messages]))
+        try:
+            for i in range(self.chunks):
+                if self.gate is not None:
+                    await self.gate.wait()
+                await asyncio.sleep(0)
+                yield f"chunk {i} "
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+async def collect(entry):
+    return "".join([chunk async for chunk in entry.replay()])
+
+
+def test_product_mentions():
+    mentions = ProductMentions(products)
+    assert mentions.find("The SkyView 2-Person Tent is great") == {15}
+    # product line only, and split up by the transcription
+    assert mentions.find("what about the sky view?") == {15}
+    assert mentions.find("MountainDream or CozyNights bags") == {14, 7}
+    assert mentions.find("I am going camping in the snow") == set()
+    # ordinary words starting a product name are not a mention
+    assert mentions.find("We reached the summit, a real alpine adventure") == set()
+    assert mentions.find("The Summit Breeze Jacket") == {3}
+
+
+@pytest.mark.asyncio
+async def test_no_mention_no_generation():
+    generate = Generator()
+    speculative = SpeculativeSuggestions(generate, ProductMentions(products), debounce=0)
+    speculative.start("t1", "Seth", [SimpleMessage(name="user", text="hi")])
+    speculative.observe("t1", "user", "I am going camping in the snow")
+    speculative.observe("t1", "assistant", "Sounds fun, what do you need?")
+    assert generate.calls == []
+    assert speculative.attach("t1") is None
+    assert speculative.stats()["missed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_attach_to_inflight_stream():
+    gate = asyncio.Event()
+    generate = Generator(gate=gate)
+    speculative = SpeculativeSuggestions(generate, ProductMentions(products), debounce=0)
+    speculative.start("t1", "Seth", [SimpleMessage(name="user", text="hi")])
+    speculative.observe("t1", "assistant", "The SkyView tent would suit you.")
+    await asyncio.sleep(0)
+
+    entry = speculative.attach("t1")
+    assert entry is not None
+    reader = asyncio.create_task(collect(entry))
+    gate.set()
+    assert await reader == "chunk 0 chunk 1 chunk 2 "
+    assert generate.calls == [("Seth", ["hi", "The SkyView tent would suit you."])]
+    # handed over, the next request does not get it again
+    assert speculative.attach("t1") is None
+
+
+@pytest.mark.asyncio
+async def test_attach_to_finished_stream():
+    generate = Generator()
+    speculative = SpeculativeSuggestions(generate, ProductMentions(products), debounce=0)
+    speculative.start("t1", "Seth", [])
+    speculative.observe("t1", "user", "Do you have the RainGuard jacket?")
+    await asyncio.gather(*speculative._tasks)
+    entry = speculative.attach("t1")
+    assert entry is not None and entry.done
+    assert await collect(entry) == "chunk 0 chunk 1 chunk 2 "
+
+
+@pytest.mark.asyncio
+async def test_turns_after_a_mention_restart():
+    gate = asyncio.Event()
+    generate = Generator(gate=gate)
+    speculative = SpeculativeSuggestions(generate, ProductMentions(products), debounce=0)
+    speculative.start("t1", "Seth", [])
+    speculative.observe("t1", "user", "I am going camping in the snow")
+    assert len(generate.calls) == 0
+    speculative.observe("t1", "assistant", "The SkyView tent would suit you.")
+    await asyncio.sleep(0)
+    assert len(generate.calls) == 1
+
+    # every turn from now on, the stream follows the transcript
+    speculative.observe("t1", "user", "Actually I need something for four people.")
+    await asyncio.sleep(0)
+    assert len(generate.calls) == 2
+    assert generate.cancelled == 1
+    assert speculative.stats()["cancelled"] == 1
+    gate.set()
+    entry = speculative.attach("t1")
+    assert entry is not None
+    assert generate.calls[-1][1][-1] == "Actually I need something for four people."
+    assert await collect(entry) == "chunk 0 chunk 1 chunk 2 "
+
+
+@pytest.mark.asyncio
+async def test_restarts_are_debounced():
+    generate = Generator()
+    speculative = SpeculativeSuggestions(
+        generate, ProductMentions(products), debounce=0.05
+    )
+    speculative.start("t1", "Seth", [])
+    speculative.observe("t1", "assistant", "The SkyView tent would suit you.")
+    speculative.observe("t1", "user", "How big is it?")
+    speculative.observe("t1", "assistant", "It sleeps two.")
+    await asyncio.sleep(0.1)
+    # one stream for the burst, over all of it
+    assert len(generate.calls) == 1
+    assert len(generate.calls[0][1]) == 3
+
+    # a request before the latest turn settled gets the full path
+    speculative.observe("t1", "user", "Show me.")
+    assert speculative.attach("t1") is None
+    assert speculative.stats()["stale"] == 1
+    assert speculative.stats()["missed"] == 1
+    await asyncio.sleep(0.1)
+    assert len(generate.calls) == 1
+    await speculative.close()
+
+
+@pytest.mark.asyncio
+async def test_max_inflight():
+    gate = asyncio.Event()
+    generate = Generator(gate=gate)
+    speculative = SpeculativeSuggestions(
+        generate, ProductMentions(products), max_inflight=1, debounce=0
+    )
+    for thread in ("t1", "t2"):
+        speculative.start(thread, "Seth", [])
+        speculative.observe(thread, "user", "Is the TrekReady boot warm?")
+    assert speculative.stats()["skipped"] == 1
+    assert speculative.attach("t2") is None
+    gate.set()
+    await speculative.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_speculation_not_attached():
+    async def failing(customer, messages):
+        raise RuntimeError("upstream")
+        yield ""
+
+    speculative = SpeculativeSuggestions(failing, ProductMentions(products), debounce=0)
+    speculative.start("t1", "Seth", [])
+    speculative.observe("t1", "user", "Is the TrekReady boot warm?")
+    await asyncio.gather(*speculative._tasks)
+    assert speculative.attach("t1") is None
@@ -0,0 +1,21 @@
+import os
+
+from api.benchmarks.startup import import_api
+
+# generous, a cold import is around 1.2s here; tighten with the environment
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "3000"))
+
+
+def test_import_defers_heavy_modules():
+    imported, prompts, deferred = import_api()
+    assert deferred == []
+    assert imported * 1000 < STARTUP_BUDGET_MS
+
+
+def test_prompts_load_once():
+    from api.chat import chat_prompty
+    from api.suggestions import suggestions_prompty, writeup_prompty
+
+    for load in (chat_prompty, suggestions_prompty, writeup_prompty):
+        assert load() is load()
+    assert chat_prompty().name == "Contoso Wireless Chat Support"
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import pytest
+import pytest_asyncio
+from collections import OrderedDict
+from fastapi.websockets import WebSocketState
+
+from api.benchmarks.fakes import FakeRedisServer
+from api.chat.context import ChatContext
+from api.session import ChatSession, SessionManager
+from api.state import (
+    MemorySessionState,
+    RedisSessionState,
+    SessionState,
+    create_state,
+)
+from api.store import SqliteTranscriptStore
+from api.suggestions import SimpleMessage
+
+
+class FakeSocket:
+    client_state = WebSocketState.CONNECTED
+
+    async def close(self):
+        pass
+
+
+@pytest_asyncio.fixture
+async def redis_server():
+    async with FakeRedisServer() as server:
+        yield server
+
+
+@pytest_asyncio.fixture(params=["memory", "sqlite", "redis"])
+async def state(request, redis_server, tmp_path):
+    if request.param == "memory":
+        state = MemorySessionState()
+    elif request.param == "sqlite":
+        state = MemorySessionState(SqliteTranscriptStore(tmp_path / "t.db"))
+    else:
+        state = RedisSessionState(redis_server.url, ttl=60)
+    yield state
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_roundtrip(state):
+    assert await state.load("a") is None
+    await state.save("a", {"context": {"summary": "tents"}, "call": 3})
+    assert await state.load("a") == {"context": {"summary": "tents"}, "call": 3}
+    assert state.stats()["resumed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_transcript(state):
+    await state.append("a", [SimpleMessage(name="user", text="Do you have tents?")])
+    await state.append(
+        "a",
+        [
+            SimpleMessage(name="assistant", text="The SkyView tent."),
+            SimpleMessage(name="user", text="Show me."),
+        ],
+    )
+    messages = await state.messages("a")
+    assert [(m.name, m.text) for m in messages] == [
+        ("user", "Do you have tents?"),
+        ("assistant", "The SkyView tent."),
+        ("user", "Show me."),
+    ]
+    assert await state.messages("b") == []
+
+    await state.delete("a")
+    assert await state.messages("a") == []
+
+
+@pytest.mark.asyncio
+async def test_redis_keys_expire(redis_server):
+    state = RedisSessionState(redis_server.url, ttl=60)
+    await state.save("a", {"call": 1})
+    await state.append("a", [SimpleMessage(name="user", text="hi")])
+    assert set(redis_server.expires) == {
+        b"contoso:session:a",
+        b"contoso:transcript:a",
+    }
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_resumes_on_another_worker(redis_server):
+    # two workers, each with its own SessionManager sessions
+    first = RedisSessionState(redis_server.url)
+    second = RedisSessionState(redis_server.url)
+
+    session = ChatSession(FakeSocket(), "thread", first)  # type: ignore
+    session.context.add("Do you have tents?", "The SkyView tent.", "Tents")
+    session.call = 2
+    await session.save()
+    await first.append("thread", [SimpleMessage(name="user", text="hi")])
+
+    resumed = ChatSession(FakeSocket(), "thread", second)  # type: ignore
+    assert await resumed.restore()
+    assert resumed.context.items() == session.context.items()
+    assert resumed.call == 2
+    assert [m.text for m in await second.messages("thread")] == ["hi"]
+
+    await first.close()
+    await second.close()
+
+
+@pytest.mark.asyncio
+async def test_create_session_restores():
+    state = MemorySessionState()
+    context = ChatContext()
+    context.add("q", "r", "summary")
+    await state.save("thread", {"context": context.to_dict(), "call": 4})
+
+    sessions, previous = SessionManager.sessions, SessionManager.state
+    SessionManager.sessions, SessionManager.state = OrderedDict(), state
+    try:
+        session = await SessionManager.create_session("thread", FakeSocket())  # type: ignore
+    finally:
+        SessionManager.sessions, SessionManager.state = sessions, previous
+    assert session.state is state
+    assert session.context.summary == "summary"
+    assert session.call == 4
+
+
+def test_context_dict_roundtrip():
+    context = ChatContext(max_turns=2)
+    for i in range(3):
+        context.add(f"q{i}", f"r{i}", f"summary {i}")
+    restored = ChatContext.from_dict(context.to_dict())
+    assert restored.items() == context.items()
+
+
+def test_unknown_state():
+    with pytest.raises(ValueError):
+        create_state("memcached://localhost")
+
+
+def test_state_must_implement_every_method():
+    class Partial(SessionState):
+        async def load(self, thread_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_transcripts_off_the_event_loop(tmp_path):
+    threads = []
+
+    class Store(SqliteTranscriptStore):
+        def extend(self, thread_id, messages):
+            threads.append(threading.current_thread())
+            super().extend(thread_id, messages)
+
+    state = MemorySessionState(Store(tmp_path / "t.db"))
+    await asyncio.gather(
+        *[
+            state.append("a", [SimpleMessage(name="user", text=str(i))])
+            for i in range(20)
+        ]
+    )
+    assert threading.main_thread() not in threads
+    # one call at a time, in the order they were made
+    assert [m.text for m in await state.messages("a")] == [str(i) for i in range(20)]
+    await state.close()
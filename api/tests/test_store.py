@@ -0,0 +1,88 @@
+import pytest
+
+from api.store import (
+    MemoryTranscriptStore,
+    SqliteTranscriptStore,
+    TranscriptStore,
+    create_store,
+)
+from api.suggestions import SimpleMessage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryTranscriptStore()
+    else:
+        store = SqliteTranscriptStore(tmp_path / "transcripts.db")
+        yield store
+        store.close()
+
+
+def test_append_and_read(store):
+    store.append("a", "user", "Do you have tents?")
+    store.extend(
+        "a",
+        [
+            SimpleMessage(name="assistant", text="The SkyView tent."),
+            SimpleMessage(name="user", text="Show me."),
+        ],
+    )
+    store.append("b", "user", "Hello")
+
+    assert [m.text for m in store.messages("a")] == [
+        "Do you have tents?",
+        "The SkyView tent.",
+        "Show me.",
+    ]
+    assert store.messages("a")[1].name == "assistant"
+    assert store.messages("missing") == []
+    assert store.stats() == {"threads": 2, "messages": 4}
+
+    store.clear("a")
+    assert store.messages("a") == []
+    assert store.stats() == {"threads": 1, "messages": 1}
+
+
+def test_read_is_a_copy(store):
+    store.append("a", "user", "Hello")
+    store.messages("a").append(SimpleMessage(name="user", text="not stored"))
+    assert len(store.messages("a")) == 1
+
+
+def test_memory_drops_least_recent():
+    store = MemoryTranscriptStore(max_threads=2)
+    store.append("a", "user", "1")
+    store.append("b", "user", "2")
+    store.messages("a")
+    store.append("c", "user", "3")
+    assert list(store.threads) == ["a", "c"]
+
+
+def test_sqlite_survives_reopen(tmp_path):
+    store = create_store(f"sqlite:///{tmp_path / 'transcripts.db'}")
+    store.append("a", "user", "Hello")
+    store.close()
+
+    store = create_store(f"sqlite:///{tmp_path / 'transcripts.db'}")
+    store.append("a", "assistant", "Hi")
+    assert [(m.name, m.text) for m in store.messages("a")] == [
+        ("user", "Hello"),
+        ("assistant", "Hi"),
+    ]
+    store.close()
+
+
+def test_unknown_store():
+    with pytest.raises(ValueError):
+        create_store("redis://localhost")
+
+
+
+def test_store_must_implement_every_method():
+    class Partial(TranscriptStore):
+        def extend(self, thread_id, messages):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+
+from api.suggestions import SimpleMessage
+from api.suggestions.cache import ResponseCache, cache_key
+
+
+def test_cache_key_normalizes_messages():
+    a = [SimpleMessage(name="user", text="I need a  tent\n")]
+    b = [SimpleMessage(name="User", text="i need a tent")]
+    assert cache_key("writeup", a) == cache_key("writeup", b)
+    assert cache_key("writeup", a) != cache_key("suggestions", a)
+    assert cache_key("suggestions", "Seth", a) != cache_key("suggestions", "Ada", a)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_and_hits():
+    cache = ResponseCache()
+    calls = []
+
+    async def create():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return True
+
+    results = await asyncio.gather(*[cache.get_or_create("k", create) for _ in range(5)])
+    assert results == [True] * 5
+    assert await cache.get_or_create("k", create)
+    assert len(calls) == 1
+    assert cache.metrics["coalesced"] == 4
+    assert cache.metrics["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    cache = ResponseCache()
+
+    async def fail():
+        raise RuntimeError("upstream")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_create("k", fail)
+    assert cache.get("k") is None
+    assert "k" not in cache.inflight
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_strand_waiters():
+    cache = ResponseCache()
+    started = asyncio.Event()
+    calls = []
+
+    async def create():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    leader = asyncio.create_task(cache.get_or_create("k", create))
+    await started.wait()
+    follower = asyncio.create_task(cache.get_or_create("k", create))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    # the follower makes the request itself instead of hanging
+    assert await asyncio.wait_for(follower, 1) == 2
+    assert cache.get("k") == 2
+    assert "k" not in cache.inflight
+
+
+def test_ttl_and_lru():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a is now the most recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.metrics["evicted"] == 1
+
+    cache.ttl = 0
+    assert cache.get("a") is None
+    assert cache.metrics["expired"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_shared_and_replayed():
+    cache = ResponseCache()
+    calls = []
+
+    async def suggestion():
+        calls.append(1)
+        for chunk in ["data: a\n\n", "data: b\n\n", "data: c\n\n"]:
+            await asyncio.sleep(0.005)
+            yield chunk
+
+    async def read():
+        return [chunk async for chunk in cache.stream("k", suggestion)]
+
+    first, second = await asyncio.gather(read(), read())
+    replayed = await read()
+
+    assert first == second == replayed == ["data: a\n\n", "data: b\n\n", "data: c\n\n"]
+    assert len(calls) == 1
+    assert cache.metrics == {
+        "hits": 1,
+        "misses": 1,
+        "coalesced": 1,
+        "evicted": 0,
+        "expired": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_stream_error_reaches_readers():
+    cache = ResponseCache()
+
+    async def broken():
+        yield "data: a\n\n"
+        raise RuntimeError("upstream")
+
+    chunks = []
+    with pytest.raises(RuntimeError):
+        async for chunk in cache.stream("k", broken):
+            chunks.append(chunk)
+    assert chunks == ["data: a\n\n"]
+    await asyncio.sleep(0)
+    assert cache.get("k") is None
@@ -0,0 +1,159 @@
+import time
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.sdk.trace.sampling import ALWAYS_OFF
+from opentelemetry.trace import Status, StatusCode, use_span
+
+from api.telemetry import GenAIOTel, TailSampler, base_path
+
+
+def create_otel(sampler=None, **kwargs):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(sampler=sampler) if sampler else TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    otel = GenAIOTel(base_path / "semantic-mapper.json", provider=provider, **kwargs)
+    return otel, exporter
+
+
+def test_attribute_budget_keeps_mapped_keys():
+    otel, exporter = create_otel(max_attributes=10, max_value_size=20)
+    with otel.trace_span("chat") as trace:
+        trace("inputs", {"products": [{"id": i, "name": f"p{i}"} for i in range(50)]})
+        trace("result", {"id": "chatcmpl-1", "model": "gpt-4o", "text": "x" * 100})
+
+    span = exporter.get_finished_spans()[0]
+    attributes = dict(span.attributes or {})
+    assert attributes["gen_ai.response.id"] == "chatcmpl-1"
+    assert attributes["gen_ai.response.model"] == "gpt-4o"
+    # task, ten flattened values, the mapped keys and the dropped count
+    assert len(attributes) <= 14
+    assert attributes["trace.dropped_attributes"] > 0
+
+
+def test_redaction_and_truncation():
+    otel, exporter = create_otel(max_value_size=8)
+    with otel.trace_span("chat") as trace:
+        trace("inputs", {"image": "data:image/png;base64," + "A" * 1000})
+        trace("inputs", {"photo": "data:image/png;base64,AAAA"})
+        trace("inputs", {"audio": {"data": "AAAA", "format": "pcm16"}})
+        trace("inputs", {"question": "what tent should I buy?"})
+        trace("inputs", {"raw": b"\x00" * 32})
+
+    attributes = dict(exporter.get_finished_spans()[0].attributes or {})
+    assert attributes["inputs.image"] == "<redacted 1022 chars>"
+    assert attributes["inputs.photo"].startswith("<redacted")
+    assert attributes["inputs.audio"] == "<redacted 2 fields>"
+    assert attributes["inputs.question"] == "what ten...(+15)"
+    assert attributes["inputs.raw"] == "<32 bytes>"
+
+
+def test_unsampled_spans_skip_flattening():
+    otel, exporter = create_otel(sampler=ALWAYS_OFF)
+    calls = []
+
+    class Watched(dict):
+        def items(self):
+            calls.append(1)
+            return super().items()
+
+    with otel.trace_span("chat") as trace:
+        trace("inputs", Watched(question="hi"))
+
+    assert calls == []
+    assert exporter.get_finished_spans() == ()
+
+
+def test_tail_sampler_keeps_errors_and_slow_traces():
+    exporter = InMemorySpanExporter()
+    sampler = TailSampler(SimpleSpanProcessor(exporter), rate=0.0, slow_ms=50)
+    provider = TracerProvider()
+    provider.add_span_processor(sampler)
+    tracer = provider.get_tracer("test")
+
+    with tracer.start_as_current_span("fast"):
+        with tracer.start_as_current_span("child"):
+            pass
+    assert exporter.get_finished_spans() == ()
+
+    with tracer.start_as_current_span("failed"):
+        with tracer.start_as_current_span("child") as child:
+            child.set_status(Status(StatusCode.ERROR))
+    assert [s.name for s in exporter.get_finished_spans()] == ["child", "failed"]
+
+    exporter.clear()
+    with tracer.start_as_current_span("slow"):
+        time.sleep(0.06)
+    assert [s.name for s in exporter.get_finished_spans()] == ["slow"]
+    assert sampler.metrics == {"kept": 2, "dropped": 1, "evicted": 0}
+
+
+def test_tail_sampler_late_spans_follow_the_trace_decision():
+    exporter = InMemorySpanExporter()
+    sampler = TailSampler(SimpleSpanProcessor(exporter), rate=0.0, slow_ms=50)
+    provider = TracerProvider()
+    provider.add_span_processor(sampler)
+    tracer = provider.get_tracer("test")
+
+    with tracer.start_as_current_span("fast"):
+        late = tracer.start_span("background")
+    late.end()
+    assert exporter.get_finished_spans() == ()
+
+    with tracer.start_as_current_span("failed") as root:
+        late = tracer.start_span("background")
+        root.set_status(Status(StatusCode.ERROR))
+    late.end()
+    names = [s.name for s in exporter.get_finished_spans()]
+    assert names == ["failed", "background"]
+    assert len(sampler._traces) == 0
+
+
+def test_tail_sampler_caps_buffered_traces():
+    exporter = InMemorySpanExporter()
+    sampler = TailSampler(
+        SimpleSpanProcessor(exporter), rate=0.0, slow_ms=60000, max_traces=2
+    )
+    provider = TracerProvider()
+    provider.add_span_processor(sampler)
+    tracer = provider.get_tracer("test")
+
+    # roots still running leave their children buffered
+    roots = [tracer.start_span("root") for _ in range(3)]
+    for index, root in enumerate(roots):
+        with use_span(root, end_on_exit=False):
+            child = tracer.start_span("child")
+            if index == 0:
+                child.set_status(Status(StatusCode.ERROR))
+            child.end()
+    assert len(sampler._traces) == 2
+    assert sampler.metrics["evicted"] == 1
+    # the failed trace is decided early and kept, its root follows
+    assert [s.name for s in exporter.get_finished_spans()] == ["child"]
+    for root in roots:
+        root.end()
+    assert [s.name for s in exporter.get_finished_spans()] == ["child", "root"]
+    assert len(sampler._traces) == 0
+
+
+def test_tail_sampler_keeps_long_running_roots():
+    exporter = InMemorySpanExporter()
+    sampler = TailSampler(
+        SimpleSpanProcessor(exporter), rate=0.0, slow_ms=50, max_age=0.05
+    )
+    provider = TracerProvider()
+    provider.add_span_processor(sampler)
+    tracer = provider.get_tracer("test")
+
+    # a call that outlives max_age: slow, so kept and exported as it goes
+    with tracer.start_as_current_span("call"):
+        tracer.start_span("turn").end()
+        time.sleep(0.06)
+        tracer.start_span("turn").end()
+        assert len(sampler._traces) == 0
+        tracer.start_span("turn").end()
+    names = [s.name for s in exporter.get_finished_spans()]
+    assert names == ["turn", "turn", "turn", "call"]
+    assert sampler.metrics == {"kept": 1, "dropped": 0, "evicted": 1}
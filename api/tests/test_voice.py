@@ -0,0 +1,459 @@
+import json
+import base64
+import asyncio
+import pytest
+from fastapi.websockets import WebSocketState
+
+from api.voice import RealtimeClient
+from api.voice.frames import AUDIO_FRAME, decode_frame, encode_audio
+
+
+class FakeClient:
+    def __init__(self, incoming=[]):
+        self.client_state = WebSocketState.CONNECTED
+        self.incoming = list(incoming)
+        self.sent = []
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def receive(self):
+        if len(self.incoming) == 0:
+            self.client_state = WebSocketState.DISCONNECTED
+            return {"type": "websocket.disconnect", "code": 1000}
+        return self.incoming.pop(0)
+
+
+class FakeRealtime:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, event):
+        self.sent.append(event)
+
+
+@pytest.mark.asyncio
+async def test_relay_ends_when_the_browser_leaves():
+    class OpenRealtime(FakeRealtime):
+        # a realtime session that would stay open for good
+        def __init__(self):
+            super().__init__()
+            self.cancelled = False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+
+    realtime = OpenRealtime()
+    session = RealtimeClient(realtime, FakeClient())
+    await asyncio.wait_for(session.relay(), 1)
+    assert realtime.cancelled
+    await session.stop()
+
+
+def test_audio_frame_roundtrip():
+    pcm = b"\x01\x00\x02\x00\x03\x00"
+    frame = encode_audio(pcm)
+    assert len(frame) == len(pcm) + 2
+    kind, payload = decode_frame(frame)
+    assert kind == AUDIO_FRAME
+    assert payload == pcm
+
+
+def test_short_frame_rejected():
+    with pytest.raises(ValueError):
+        decode_frame(b"\x01")
+
+
+@pytest.mark.asyncio
+async def test_send_audio_binary():
+    pcm = b"\x10\x00\x20\x00"
+    client = FakeClient()
+    session = RealtimeClient(FakeRealtime(), client, binary=True)
+    await session.send_audio(base64.b64encode(pcm).decode())
+    await session.flush()
+    assert client.sent == [encode_audio(pcm)]
+
+
+@pytest.mark.asyncio
+async def test_send_audio_json():
+    client = FakeClient()
+    session = RealtimeClient(FakeRealtime(), client)
+    await session.send_audio("AAA=")
+    await session.flush()
+    assert client.sent == [{"type": "audio", "payload": "AAA="}]
+
+
+@pytest.mark.asyncio
+async def test_receive_client_mixed_frames():
+    pcm = b"\x10\x00\x20\x00"
+    client = FakeClient(
+        [
+            {"type": "websocket.receive", "bytes": encode_audio(pcm)},
+            {
+                "type": "websocket.receive",
+                "text": json.dumps({"type": "audio", "payload": "AAA="}),
+            },
+        ]
+    )
+    realtime = FakeRealtime()
+    session = RealtimeClient(realtime, client, binary=True)
+    await session.receive_client()
+    await session.flush()
+
+    assert [e.type for e in realtime.sent] == ["input_audio_buffer.append"] * 2
+    assert base64.b64decode(realtime.sent[0].audio) == pcm
+    assert realtime.sent[1].audio == "AAA="
+
+
+@pytest.mark.asyncio
+async def test_receive_client_drops_short_frame():
+    pcm = b"\x10\x00\x20\x00"
+    client = FakeClient(
+        [
+            {"type": "websocket.receive", "bytes": b"\x01"},
+            {"type": "websocket.receive", "bytes": encode_audio(pcm)},
+        ]
+    )
+    realtime = FakeRealtime()
+    session = RealtimeClient(realtime, client, binary=True)
+    await session.receive_client()
+    await session.flush()
+
+    # the call goes on with the next frame
+    assert [e.type for e in realtime.sent] == ["input_audio_buffer.append"]
+    assert base64.b64decode(realtime.sent[0].audio) == pcm
+
+
+class FakeOutput:
+    type = "function_call"
+    name = "search_products"
+    call_id = "call_1"
+    id = "item_1"
+    arguments = '{"query": "tent"}'
+
+
+class FakeResponse:
+    id = "resp_1"
+    output = [FakeOutput()]
+
+
+class FakeResponseDone:
+    type = "response.done"
+    response = FakeResponse()
+
+
+@pytest.mark.asyncio
+async def test_server_function_call():
+    calls = []
+
+    async def search_products(arguments):
+        calls.append(arguments)
+        return "[]"
+
+    client = FakeClient()
+    realtime = FakeRealtime()
+    session = RealtimeClient(
+        realtime, client, functions={"search_products": search_products}
+    )
+    await session._response_done(FakeResponseDone())
+    await session.flush()
+
+    assert calls == [{"query": "tent"}]
+    # answered on the server, not forwarded to the browser
+    assert client.sent == []
+    assert realtime.sent[0].item.type == "function_call_output"
+    assert realtime.sent[0].item.call_id == "call_1"
+    assert realtime.sent[1].type == "response.create"
+
+
+def test_voice_prompt_refresh(tmp_path):
+    import os
+    from api.catalog import Catalog
+    from api.voice.prompt import VoicePrompt
+
+    products = [
+        {"id": 1, "name": "Trail Tent", "category": "Tents", "description": "A tent"},
+        {"id": 2, "name": "Snow Bag", "category": "Sleeping Bags", "description": "Warm"},
+    ]
+    purchases = [{"id": 3, "name": "Old Boots", "category": "Boots", "description": "Worn"}]
+    (tmp_path / "products.json").write_text(json.dumps(products))
+    (tmp_path / "purchases.json").write_text(json.dumps(purchases))
+
+    catalog = Catalog(tmp_path / "products.json", tmp_path / "purchases.json", 0)
+    prompt = VoicePrompt(catalog)
+    assert not prompt.refresh()
+
+    text = prompt.render("Ada", [{"name": "user", "text": "hi"}], products[:1])
+    assert "Name: Old Boots" in text
+    assert "Name: Trail Tent" in text
+    assert "Snow Bag" not in text
+    assert "Ada" in text
+
+    products[0]["name"] = "Summit Tent"
+    (tmp_path / "products.json").write_text(json.dumps(products))
+    stat = (tmp_path / "products.json").stat()
+    os.utime(tmp_path / "products.json", (stat.st_atime, stat.st_mtime + 10))
+    assert prompt.refresh()
+    assert "Name: Summit Tent" in prompt.render("Ada", [], prompt.products[:1])
+
+
+def audio_delta(response_id="resp_1", item_id="item_1", ms=40):
+    from openai.types.beta.realtime import ResponseAudioDeltaEvent
+
+    return ResponseAudioDeltaEvent(
+        type="response.audio.delta",
+        event_id="event_1",
+        response_id=response_id,
+        item_id=item_id,
+        output_index=0,
+        content_index=0,
+        delta=base64.b64encode(bytes(ms * 48)).decode(),
+    )
+
+
+class GatedClient(FakeClient):
+    def __init__(self):
+        super().__init__()
+        import asyncio
+
+        self.gate = asyncio.Event()
+
+    async def send_bytes(self, data):
+        await self.gate.wait()
+        await super().send_bytes(data)
+
+
+@pytest.mark.asyncio
+async def test_barge_in_truncates_and_drops_audio():
+    from openai.types.beta.realtime import (
+        InputAudioBufferSpeechStartedEvent,
+        RealtimeResponse,
+        ResponseCreatedEvent,
+    )
+
+    client = GatedClient()
+    realtime = FakeRealtime()
+    session = RealtimeClient(realtime, client, binary=True)
+    await session._response_created(
+        ResponseCreatedEvent(
+            type="response.created",
+            event_id="event_0",
+            response=RealtimeResponse(id="resp_1"),
+        )
+    )
+    # two seconds of audio backed up behind a browser that is not reading
+    for _ in range(50):
+        await session._response_audio_delta(audio_delta())
+
+    await session._input_audio_buffer_speech_started(
+        InputAudioBufferSpeechStartedEvent(
+            type="input_audio_buffer.speech_started",
+            event_id="event_2",
+            audio_start_ms=0,
+            item_id="item_2",
+        )
+    )
+    # still in flight from the server
+    await session._response_audio_delta(audio_delta())
+    client.gate.set()
+    await session.flush()
+
+    assert [e.type for e in realtime.sent] == [
+        "response.cancel",
+        "conversation.item.truncate",
+    ]
+    assert realtime.sent[0].response_id == "resp_1"
+    assert realtime.sent[1].item_id == "item_1"
+    assert realtime.sent[1].audio_end_ms < 2000
+
+    audio = [m for m in client.sent if isinstance(m, bytes)]
+    assert len(audio) <= 1
+    assert client.sent[-1] == {"type": "interrupt", "payload": ""}
+    assert session.playback.metrics["dropped_deltas"] == 1
+    await session.stop()
+
+
+def test_playback_fully_heard_not_truncated():
+    from api.voice.playback import Playback
+
+    playback = Playback()
+    playback.response_created("resp_1")
+    assert playback.audio("resp_1", "item_1", 40 * 48)
+    playback.response_done("resp_1")
+    playback.started -= 1  # a second later the browser has played it all
+
+    assert playback.interrupt() == (None, None, 40)
+    assert playback.metrics["interrupts"] == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatch_tracing_policy():
+    import contextlib
+    from prompty.tracer import Tracer
+    from api.voice.dispatch import EventDispatcher, Route
+
+    spans = []
+
+    @contextlib.contextmanager
+    def recorder(name):
+        attributes = {}
+        yield lambda key, value: attributes.__setitem__(key, value)
+        spans.append((name, attributes))
+
+    class Event:
+        def __init__(self, type):
+            self.type = type
+
+    handled = []
+
+    async def handler(target, event):
+        handled.append(event.type)
+
+    dispatcher = EventDispatcher(
+        {
+            "response.created": Route(handler),
+            "response.audio.delta": Route(handler, "aggregate"),
+            "response.text.delta": Route(handler, "sampled"),
+        },
+        sample_every=10,
+    )
+    tracers = dict(Tracer._tracers)
+    Tracer._tracers = {"test": recorder}
+    try:
+        await dispatcher.dispatch(None, Event("response.created"))
+        for _ in range(100):
+            await dispatcher.dispatch(None, Event("response.audio.delta"))
+            await dispatcher.dispatch(None, Event("response.text.delta"))
+        await dispatcher.dispatch(None, Event("unknown"))
+        await dispatcher.dispatch(None, Event("response.created"))
+    finally:
+        Tracer._tracers = tracers
+
+    assert len(handled) == 202
+    names = [name for name, _ in spans]
+    assert names.count("response.created") == 2
+    assert names.count("response.text.delta") == 10
+    # one summary span for all the audio deltas
+    assert names.count("response.audio.delta") == 1
+    aggregate = dict(spans)["response.audio.delta"]["aggregate"]
+    assert aggregate["count"] == 100
+    assert dispatcher.metrics["unhandled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_dispatch_sample_every_event():
+    from api.voice.dispatch import EventDispatcher, Route
+
+    class Event:
+        type = "response.text.delta"
+
+    async def handler(target, event):
+        pass
+
+    for sample_every, spans in ((1, 10), (2, 5), (10, 1)):
+        dispatcher = EventDispatcher(
+            {Event.type: Route(handler, "sampled")}, sample_every=sample_every
+        )
+        for _ in range(10):
+            await dispatcher.dispatch(None, Event())
+        # the first event and every sample_every after it
+        assert dispatcher.metrics["spans"] == spans
+
+
+@pytest.mark.asyncio
+async def test_transcripts_reported():
+    from openai.types.beta.realtime import (
+        ConversationItemInputAudioTranscriptionCompletedEvent,
+        ResponseAudioTranscriptDoneEvent,
+    )
+
+    transcripts = []
+
+    async def on_transcript(name, text):
+        transcripts.append((name, text))
+
+    session = RealtimeClient(FakeRealtime(), FakeClient(), on_transcript=on_transcript)
+    await session._conversation_item_input_audio_transcription_completed(
+        ConversationItemInputAudioTranscriptionCompletedEvent.model_construct(
+            type="conversation.item.input_audio_transcription.completed",
+            event_id="e1",
+            item_id="item_1",
+            content_index=0,
+            transcript="Do you have tents?",
+        )
+    )
+    await session._response_audio_transcript_done(
+        ResponseAudioTranscriptDoneEvent.model_construct(
+            type="response.audio_transcript.done",
+            event_id="e2",
+            response_id="resp_1",
+            item_id="item_2",
+            output_index=0,
+            content_index=0,
+            transcript="The SkyView tent.",
+        )
+    )
+    assert transcripts == [
+        ("user", "Do you have tents?"),
+        ("assistant", "The SkyView tent."),
+    ]
+
+
+def test_routes_are_client_handlers():
+    for event_type, route in RealtimeClient.routes.items():
+        assert getattr(RealtimeClient, route.handler.__name__) is route.handler
+    assert RealtimeClient.routes["response.audio.delta"].tracing == "aggregate"
+
+
+@pytest.mark.asyncio
+async def test_call_turn_against_fake_realtime():
+    from openai import AsyncAzureOpenAI
+    from api.benchmarks.fakes import FakeRealtimeServer
+
+    transcripts = []
+
+    async def on_transcript(name, text):
+        transcripts.append((name, text))
+
+    audio = base64.b64encode(bytes(40 * 48)).decode("ascii")
+    frame = json.dumps({"type": "audio", "payload": audio})
+    incoming = [{"type": "websocket.receive", "text": frame}] * 5
+    async with FakeRealtimeServer(vad_ms=200, audio_chunks=3) as server:
+        client = AsyncAzureOpenAI(
+            azure_endpoint="https://localhost",
+            api_key="fake_key",
+            api_version="2024-10-01-preview",
+            websocket_base_url=server.url,
+        )
+        async with client.beta.realtime.connect(model="gpt-4o-realtime-preview") as conn:
+            browser = FakeClient(incoming)
+            session = RealtimeClient(conn, browser, on_transcript=on_transcript)  # type: ignore
+            await session.receive_client()
+            # done talking, still listening
+            browser.client_state = WebSocketState.CONNECTED
+            async for event in conn:
+                await session.dispatcher.dispatch(session, event)
+                if event.type == "response.done":
+                    break
+            await session.flush()
+            await session.stop()
+        await client.close()
+
+    assert server.received["input_audio_buffer.append"] == 5
+    assert transcripts == [
+        ("user", server.user_transcript),
+        ("assistant", server.transcript),
+    ]
+    # deltas may be merged on the way, none are lost
+    played = [base64.b64decode(m["payload"]) for m in browser.sent if m["type"] == "audio"]
+    assert sum(len(pcm) for pcm in played) == 3 * server.chunk_ms * 48
@@ -0,0 +1,133 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from api.suggestions import SimpleMessage
+from api.suggestions.writeup import WriteupDetector
+
+dataset = Path(__file__).parent / "writeup.jsonl"
+
+
+def user(text):
+    return SimpleMessage(name="user", text=text)
+
+
+def assistant(text):
+    return SimpleMessage(name="assistant", text=text)
+
+
+class Escalation:
+    def __init__(self, answer=False):
+        self.answer = answer
+        self.calls = []
+
+    async def __call__(self, messages):
+        self.calls.append(list(messages))
+        return self.answer
+
+
+@pytest.mark.asyncio
+async def test_plain_conversation_stays_local():
+    llm = Escalation()
+    detector = WriteupDetector(llm)
+    messages = [user("I need a tent"), assistant("The SkyView tent is great.")]
+    assert not await detector.update(messages)
+    messages += [user("How much is it?"), assistant("It is $250.")]
+    assert not await detector.update(messages)
+    assert llm.calls == []
+    assert detector.metrics == {"calls": 2, "local": 2, "escalated": 0}
+
+
+@pytest.mark.asyncio
+async def test_clear_ask_echoed_is_confirmed_by_model_and_sticky():
+    llm = Escalation(answer=True)
+    detector = WriteupDetector(llm)
+    messages = [
+        user("Can you show this to me visually?"),
+        assistant("Of course, I'll put together a write up for you."),
+    ]
+    assert await detector.update(messages)
+    assert await detector.update(messages + [user("thanks")])
+    assert len(llm.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_refused_ask_is_not_latched():
+    llm = Escalation(answer=False)
+    detector = WriteupDetector(llm)
+    messages = [
+        user("Can you send me the receipt for my last order?"),
+        assistant("Sorry, I can't send you receipts, but I can tell you the total."),
+    ]
+    assert not await detector.update(messages)
+    assert len(llm.calls) == 1
+    messages += [user("How much was it?"), assistant("It was $250.")]
+    assert not await detector.update(messages)
+    assert len(llm.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_unreadable_messages_escalate():
+    llm = Escalation(answer=True)
+    detector = WriteupDetector(llm)
+    messages = [
+        user("Könnten Sie mir eine Übersicht der Zelte zeigen?"),
+        assistant("Gerne, ich stelle Ihnen eine Übersicht zusammen."),
+    ]
+    assert await detector.update(messages)
+    assert [m.text for m in llm.calls[0]] == [m.text for m in messages]
+
+
+@pytest.mark.asyncio
+async def test_ambiguous_ask_escalates_with_recent_messages_only():
+    llm = Escalation(answer=True)
+    detector = WriteupDetector(llm, window=4)
+    messages = [user(f"question {i}") for i in range(10)]
+    assert not await detector.update(messages)
+    messages += [user("Let me see them."), assistant("I'll pull them up for you.")]
+    assert await detector.update(messages)
+
+    assert len(llm.calls) == 1
+    assert [m.text for m in llm.calls[0]] == [
+        "question 8",
+        "question 9",
+        "Let me see them.",
+        "I'll pull them up for you.",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_new_transcript_resets_thread():
+    detector = WriteupDetector(Escalation())
+    await detector.update([user("hello"), assistant("hi")])
+    await detector.update([user("something else"), assistant("sure")])
+    assert [m.text for m in detector.messages] == ["something else", "sure"]
+
+
+@pytest.mark.asyncio
+async def test_recorded_transcripts():
+    records = [json.loads(line) for line in dataset.read_text().splitlines()]
+    calls = total = 0
+    for record in records:
+        messages = [SimpleMessage(**m) for m in record["messages"]]
+        at = record["requested_at"]
+        echoed = messages[at] if at is not None else None
+
+        llm_calls = []
+
+        async def escalate(context):
+            # stands in for writeup.prompty: yes if the labelled ask is in view
+            llm_calls.append(context)
+            return any(m is echoed for m in context)
+
+        detector = WriteupDetector(escalate)
+        points = [i + 1 for i, m in enumerate(messages) if m.name == "assistant"]
+        for point in points + [len(messages)]:
+            expected = at is not None and point > at
+            assert await detector.update(messages[:point]) == expected, record
+            total += 1
+        calls += len(llm_calls)
+
+    # most requests are answered without the model
+    assert calls * 5 < total
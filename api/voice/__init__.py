@@ -1,19 +1,20 @@
 import json
-from typing import Literal, Union
+import time
+import asyncio
+import base64
+import weakref
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Literal, Union
 from fastapi import WebSocket
 from prompty.tracer import trace
 from fastapi import WebSocketDisconnect
 from pydantic import BaseModel
 from fastapi.websockets import WebSocketState
 
-from openai.resources.beta.realtime.realtime import (
-    AsyncRealtimeConnection,
-)
 from openai.types.beta.realtime.session_update_event import (
     Session,
     SessionTurnDetection,
     SessionInputAudioTranscription,
-    # SessionTool,
+    SessionTool,
 )
 from openai.types.beta.realtime import (
     ErrorEvent,
@@ -53,10 +54,10 @@ from openai.types.beta.realtime import (
     # InputAudioBufferCommitEvent,
     # InputAudioBufferClearEvent,
     ConversationItemCreateEvent,
-    # ConversationItemTruncateEvent,
+    ConversationItemTruncateEvent,
     # ConversationItemDeleteEvent,
     ResponseCreateEvent,
-    # ResponseCancelEvent,
+    ResponseCancelEvent,
 )
 
 from openai.types.beta.realtime import (
@@ -64,6 +65,18 @@ from openai.types.beta.realtime import (
     ConversationItemContent,
 )
 
+from api.metrics import voice_time_to_first_audio
+from api.models import message_frame
+from api.voice.dispatch import EventDispatcher, Route
+from api.voice.frames import AUDIO_FRAME, decode_frame, encode_audio
+from api.voice.playback import Playback
+from api.voice.recording import Recorder
+from api.voice.relay import Policy, Relay
+
+if TYPE_CHECKING:
+    # the realtime resources are only loaded once a call connects
+    from openai.resources.beta.realtime.realtime import AsyncRealtimeConnection
+
 
 class Message(BaseModel):
     type: Literal[
@@ -72,35 +85,151 @@ class Message(BaseModel):
     payload: str
 
 
+def create_session(
+    instructions: Union[str, None],
+    threshold: float = 0.8,
+    silence_duration_ms: int = 500,
+    prefix_padding_ms: int = 300,
+    tools: List[SessionTool] = [],
+) -> Session:
+    session: Session = Session(
+        input_audio_format="pcm16",
+        turn_detection=SessionTurnDetection(
+            prefix_padding_ms=prefix_padding_ms,
+            silence_duration_ms=silence_duration_ms,
+            threshold=threshold,
+            type="server_vad",
+        ),
+        input_audio_transcription=SessionInputAudioTranscription(
+            model="whisper-1",
+        ),
+        voice="sage",
+        modalities=["text", "audio"],
+    )
+    if instructions is not None:
+        session.instructions = instructions
+    if len(tools) > 0:
+        session.tools = tools
+        session.tool_choice = "auto"
+    return session
+
+
+def session_delta(base: Session, session: Session) -> Session:
+    """
+    Only the fields of session that differ from the configuration the
+    realtime connection already has.
+    """
+    configured = base.model_dump(exclude_unset=True)
+    return Session(
+        **{
+            key: getattr(session, key)
+            for key, value in session.model_dump(exclude_unset=True).items()
+            if configured.get(key) != value
+        }
+    )
+
+
 class RealtimeClient:
     """
     Realtime client for handling websocket connections and messages.
     """
 
+    # calls in progress, for the queue depth gauges
+    live: "weakref.WeakSet[RealtimeClient]" = weakref.WeakSet()
+
     def __init__(
-        self, realtime: AsyncRealtimeConnection, client: WebSocket, debug: bool = False
+        self,
+        realtime: "AsyncRealtimeConnection",
+        client: WebSocket,
+        debug: bool = False,
+        binary: bool = False,
+        functions: Dict[str, Callable[[Dict[str, Any]], Awaitable[str]]] = {},
+        queue_size: int = 256,
+        policy: Policy = "coalesce",
+        trace_sample: int = 50,
+        on_transcript: Union[Callable[[str, str], Awaitable[None]], None] = None,
+        recorder: Union[Recorder, None] = None,
     ):
-        self.realtime: Union[AsyncRealtimeConnection, None] = realtime
+        self.realtime: Union["AsyncRealtimeConnection", None] = realtime
         self.client: Union[WebSocket, None] = client
         self.response_queue: list[ConversationItemCreateEvent] = []
         self.active = True
         self.debug = debug
+        # client negotiated the binary audio sub-protocol (see api.voice.frames)
+        self.binary = binary
+        # tools answered on the server instead of being forwarded to the client
+        self.functions = functions
+        # told about every finished transcript (speaker, text) of the call
+        self.on_transcript = on_transcript
+        # writes what arrives from both sides, for replay (api.voice.recording)
+        self.recorder = recorder
+        # bounded queues with their own writer task per direction, so a slow
+        # browser (or realtime socket) does not stall event handling
+        self.outbound = Relay(
+            self._write_client, maxsize=queue_size, policy=policy, name="voice.client"
+        )
+        self.inbound = Relay(
+            self._write_realtime, maxsize=queue_size, policy="block", name="voice.realtime"
+        )
+        # played position of the assistant audio, for barge-in
+        self.playback = Playback()
+        # end of the customer's turn, until the first audio answering it is sent
+        self.turn_ended: Union[float, None] = None
+        RealtimeClient.live.add(self)
+        self.dispatcher = EventDispatcher(self.routes, sample_every=trace_sample)
 
     async def send_message(self, message: Message):
         if self.client is not None:
-            await self.client.send_json(message.model_dump())
+            await self.outbound.put(message_frame(message.type, message.payload))
 
-    async def send_audio(self, audio: Message):
-        # send audio to client, format into bytes
-        if (
-            self.client is not None
-            and self.client.client_state != WebSocketState.DISCONNECTED
-        ):
-            await self.client.send_json(audio.model_dump())
+    async def send_audio(self, audio: str):
+        await self.send_pcm(base64.b64decode(audio))
+
+    async def send_pcm(self, pcm: bytes):
+        # queued as raw PCM16 so stale audio can be merged or dropped
+        if self.client is not None:
+            await self.outbound.put(pcm, audio=True)
 
     async def send_console(self, message: Message):
         if self.client is not None:
-            await self.client.send_json(message.model_dump())
+            await self.outbound.put(message_frame(message.type, message.payload))
+
+    async def send_realtime(self, event: Any, audio: bool = False):
+        if self.realtime is not None:
+            await self.inbound.put(event, audio=audio)
+
+    async def _write_client(self, item: Union[str, bytes]):
+        if (
+            self.client is None
+            or self.client.client_state == WebSocketState.DISCONNECTED
+        ):
+            return
+        if isinstance(item, str):
+            await self.client.send_text(item)
+            return
+        if self.turn_ended is not None:
+            voice_time_to_first_audio.record(time.perf_counter() - self.turn_ended)
+            self.turn_ended = None
+        if self.binary:
+            await self.client.send_bytes(encode_audio(item))
+        else:
+            audio = base64.b64encode(item).decode("ascii")
+            await self.client.send_text(message_frame("audio", audio))
+
+    async def _write_realtime(self, event: Any):
+        if self.realtime is not None:
+            await self.realtime.send(event)
+
+    async def flush(self):
+        await self.outbound.join()
+        await self.inbound.join()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "client": self.outbound.stats(),
+            "realtime": self.inbound.stats(),
+            "playback": self.playback.stats(),
+        }
 
     async def update_realtime_session(
         self,
@@ -108,24 +237,21 @@ class RealtimeClient:
         threshold: float = 0.8,
         silence_duration_ms: int = 500,
         prefix_padding_ms: int = 300,
+        tools: List[SessionTool] = [],
+        base: Union[Session, None] = None,
     ):
         if self.realtime is not None:
-            session: Session = Session(
-                input_audio_format="pcm16",
-                turn_detection=SessionTurnDetection(
-                    prefix_padding_ms=prefix_padding_ms,
-                    silence_duration_ms=silence_duration_ms,
-                    threshold=threshold,
-                    type="server_vad",
-                ),
-                input_audio_transcription=SessionInputAudioTranscription(
-                    model="whisper-1",
-                ),
-                voice="sage",
-                instructions=instructions,
-                modalities=["text", "audio"],
+            session = create_session(
+                instructions,
+                threshold=threshold,
+                silence_duration_ms=silence_duration_ms,
+                prefix_padding_ms=prefix_padding_ms,
+                tools=tools,
             )
-            await self.realtime.send(
+            if base is not None:
+                # connection was already configured (see api.voice.pool)
+                session = session_delta(base, session)
+            await self.send_realtime(
                 SessionUpdateEvent(
                     type="session.update",
                     session=session,
@@ -142,154 +268,97 @@ class RealtimeClient:
             async for event in self.realtime:
                 if "delta" not in event.type and self.debug:
                     print(event.type)
+                if self.recorder is not None:
+                    self._record(self.recorder.realtime, event)
                 self.active = True
-                match event.type:
-                    case "error":
-                        await self._handle_error(event)
-                    case "session.created":
-                        await self._session_created(event)
-                    case "session.updated":
-                        await self._session_updated(event)
-                    case "conversation.created":
-                        await self._conversation_created(event)
-                    case "conversation.item.created":
-                        await self._conversation_item_created(event)
-                    case "conversation.item.input_audio_transcription.completed":
-                        await self._conversation_item_input_audio_transcription_completed(
-                            event
-                        )
-                    case "conversation.item.input_audio_transcription.delta":
-                        await self._conversation_item_input_audio_transcription_delta(
-                            event
-                        )
-                    case "conversation.item.input_audio_transcription.failed":
-                        await self._conversation_item_input_audio_transcription_failed(
-                            event
-                        )
-                    case "conversation.item.truncated":
-                        await self._conversation_item_truncated(event)
-                    case "conversation.item.deleted":
-                        await self._conversation_item_deleted(event)
-                    case "input_audio_buffer.committed":
-                        await self._input_audio_buffer_committed(event)
-                    case "input_audio_buffer.cleared":
-                        await self._input_audio_buffer_cleared(event)
-                    case "input_audio_buffer.speech_started":
-                        await self._input_audio_buffer_speech_started(event)
-                    case "input_audio_buffer.speech_stopped":
-                        await self._input_audio_buffer_speech_stopped(event)
-                    case "response.created":
-                        await self._response_created(event)
-                    case "response.done":
-                        await self._response_done(event)
-                    case "response.output_item.added":
-                        await self._response_output_item_added(event)
-                    case "response.output_item.done":
-                        await self._response_output_item_done(event)
-                    case "response.content_part.added":
-                        await self._response_content_part_added(event)
-                    case "response.content_part.done":
-                        await self._response_content_part_done(event)
-                    case "response.text.delta":
-                        await self._response_text_delta(event)
-                    case "response.text.done":
-                        await self._response_text_done(event)
-                    case "response.audio_transcript.delta":
-                        await self._response_audio_transcript_delta(event)
-                    case "response.audio_transcript.done":
-                        await self._response_audio_transcript_done(event)
-                    case "response.audio.delta":
-                        await self._response_audio_delta(event)
-                    case "response.audio.done":
-                        await self._response_audio_done(event)
-                    case "response.function_call_arguments.delta":
-                        await self._response_function_call_arguments_delta(event)
-                    case "response.function_call_arguments.done":
-                        await self._response_function_call_arguments_done(event)
-                    case "rate_limits.updated":
-                        await self._rate_limits_updated(event)
-                    case _:
-                        print(
-                            f"Unhandled event type {event.type}",
-                        )
+                await self.dispatcher.dispatch(self, event)
 
+        self.dispatcher.flush()
         self.realtime = None
 
-    @trace(name="error")
     async def _handle_error(self, event: ErrorEvent):
         pass
 
-    @trace(name="session.created")
     async def _session_created(self, event: SessionCreatedEvent):
         await self.send_console(Message(type="console", payload=event.to_json()))
 
-    @trace(name="session.updated")
     async def _session_updated(self, event: SessionUpdatedEvent):
         pass
 
-    @trace(name="conversation.created")
     async def _conversation_created(self, event: ConversationCreatedEvent):
         pass
 
-    @trace(name="conversation.item.created")
     async def _conversation_item_created(self, event: ConversationItemCreatedEvent):
         pass
 
-    @trace(name="conversation.item.input_audio_transcription.completed")
     async def _conversation_item_input_audio_transcription_completed(
         self, event: ConversationItemInputAudioTranscriptionCompletedEvent
     ):
         if event.transcript is not None and len(event.transcript) > 0:
             await self.send_message(Message(type="user", payload=event.transcript))
+            if self.on_transcript is not None:
+                await self.on_transcript("user", event.transcript)
 
-    @trace(name="conversation.item.input_audio_transcription.delta")
     async def _conversation_item_input_audio_transcription_delta(
         self, event: ConversationItemInputAudioTranscriptionDeltaEvent
     ):
         pass
 
-    @trace(name="conversation.item.input_audio_transcription.failed")
     async def _conversation_item_input_audio_transcription_failed(
         self, event: ConversationItemInputAudioTranscriptionFailedEvent
     ):
         pass
 
-    @trace(name="conversation.item.truncated")
     async def _conversation_item_truncated(self, event: ConversationItemTruncatedEvent):
         pass
 
-    @trace(name="conversation.item.deleted")
     async def _conversation_item_deleted(self, event: ConversationItemDeletedEvent):
         pass
 
-    @trace(name="input_audio_buffer.committed")
     async def _input_audio_buffer_committed(
         self, event: InputAudioBufferCommittedEvent
     ):
         pass
 
-    @trace(name="input_audio_buffer.cleared")
     async def _input_audio_buffer_cleared(self, event: InputAudioBufferClearedEvent):
         pass
 
-    @trace(name="input_audio_buffer.speech_started")
     async def _input_audio_buffer_speech_started(
         self, event: InputAudioBufferSpeechStartedEvent
     ):
+        # barge-in: the browser stops playing, audio still queued for it is
+        # stale, and the server stops generating and forgets what was not heard
+        self.turn_ended = None
+        discarded = self.outbound.discard_audio()
         await self.send_console(Message(type="interrupt", payload=""))
+        response_id, item_id, played_ms = self.playback.interrupt(discarded)
+        if response_id is not None:
+            await self.send_realtime(
+                ResponseCancelEvent(type="response.cancel", response_id=response_id)
+            )
+        if item_id is not None:
+            await self.send_realtime(
+                ConversationItemTruncateEvent(
+                    type="conversation.item.truncate",
+                    item_id=item_id,
+                    content_index=0,
+                    audio_end_ms=played_ms,
+                )
+            )
 
-    @trace(name="input_audio_buffer.speech_stopped")
     async def _input_audio_buffer_speech_stopped(
         self, event: InputAudioBufferSpeechStoppedEvent
     ):
-        pass
+        self.turn_ended = time.perf_counter()
 
-    @trace(name="response.created")
     async def _response_created(self, event: ResponseCreatedEvent):
-        pass
+        self.playback.response_created(event.response.id)
+        if self.turn_ended is None:
+            # responses not triggered by speech (text, function results)
+            self.turn_ended = time.perf_counter()
 
-    @trace(name="response.done")
     async def _response_done(self, event: ResponseDoneEvent):
+        self.playback.response_done(event.response.id)
         if event.response.output is not None and len(event.response.output) > 0:
             output = event.response.output[0]
             match output.type:
@@ -310,6 +379,10 @@ class RealtimeClient:
                             ),
                         )
                     )
+                case "function_call" if output.name in self.functions:
+                    await self._call_function(
+                        output.name, output.call_id, output.arguments
+                    )
                 case "function_call":
                     await self.send_console(
                         Message(
@@ -332,70 +405,84 @@ class RealtimeClient:
 
         if len(self.response_queue) > 0 and self.realtime is not None:
             for item in self.response_queue:
-                await self.realtime.send(item)
+                await self.send_realtime(item)
             self.response_queue.clear()
-            await self.realtime.response.create()
+            await self.send_realtime(ResponseCreateEvent(type="response.create"))
 
         self.active = False
 
-    @trace(name="response.output_item.added")
+    @trace(name="function_call")
+    async def _call_function(
+        self, name: str, call_id: Union[str, None], arguments: Union[str, None]
+    ):
+        try:
+            output = await self.functions[name](json.loads(arguments or "{}"))
+        except Exception as e:
+            print(f"Error calling function {name}", e)
+            output = json.dumps({"error": str(e)})
+
+        # sent along with response.create once this response is done
+        self.response_queue.append(
+            ConversationItemCreateEvent(
+                type="conversation.item.create",
+                item=ConversationItem(
+                    call_id=call_id,
+                    type="function_call_output",
+                    output=output,
+                ),
+            )
+        )
+
     async def _response_output_item_added(self, event: ResponseOutputItemAddedEvent):
         pass
 
-    @trace(name="response.output_item.done")
     async def _response_output_item_done(self, event: ResponseOutputItemDoneEvent):
         pass
 
-    @trace(name="response.content_part.added")
     async def _response_content_part_added(self, event: ResponseContentPartAddedEvent):
         pass
 
-    @trace(name="response.content_part.done")
     async def _response_content_part_done(self, event: ResponseContentPartDoneEvent):
         pass
 
-    @trace(name="response.text.delta")
     async def _response_text_delta(self, event: ResponseTextDeltaEvent):
         pass
 
-    @trace(name="response.text.done")
     async def _response_text_done(self, event: ResponseTextDoneEvent):
         pass
 
-    @trace(name="response.audio.transcript.delta")
     async def _response_audio_transcript_delta(
         self, event: ResponseAudioTranscriptDeltaEvent
     ):
         pass
 
-    @trace(name="response.audio_transcript.done")
     async def _response_audio_transcript_done(
         self, event: ResponseAudioTranscriptDoneEvent
     ):
         if event.transcript is not None and len(event.transcript) > 0:
             await self.send_message(Message(type="assistant", payload=event.transcript))
+            if self.on_transcript is not None:
+                await self.on_transcript("assistant", event.transcript)
 
-    @trace(name="response.audio.delta")
     async def _response_audio_delta(self, event: ResponseAudioDeltaEvent):
-        await self.send_audio(Message(type="audio", payload=event.delta))
+        pcm = base64.b64decode(event.delta)
+        # deltas already in flight when the response was cancelled
+        if self.playback.audio(event.response_id, event.item_id, len(pcm)):
+            await self.send_pcm(pcm)
 
-    @trace(name="response.audio.done")
     async def _response_audio_done(self, event: ResponseAudioDoneEvent):
         pass
 
-    @trace(name="response.function_call_arguments.delta")
     async def _response_function_call_arguments_delta(
         self, event: ResponseFunctionCallArgumentsDeltaEvent
     ):
         pass
 
-    @trace(name="response.function_call_arguments.done")
     async def _response_function_call_arguments_done(
         self, event: ResponseFunctionCallArgumentsDoneEvent
     ):
         pass
 
-    @trace(name="rate_limits.updated")
     async def _rate_limits_updated(self, event: RateLimitsUpdatedEvent):
         pass
 
@@ -405,63 +492,141 @@ class RealtimeClient:
             return
         try:
             while self.client.client_state != WebSocketState.DISCONNECTED:
-                message = await self.client.receive_text()
-
-                message_json = json.loads(message)
-                m = Message(**message_json)
-                # print("received message", m.type)
-                match m.type:
-                    case "audio":
-                        await self.realtime.send(
-                            InputAudioBufferAppendEvent(
-                                type="input_audio_buffer.append", audio=m.payload
-                            )
-                        )
-                    case "user":
-                        await self.realtime.send(
-                            ConversationItemCreateEvent(
-                                type="conversation.item.create",
-                                item=ConversationItem(
-                                    role="user",
-                                    type="message",
-                                    content=[
-                                        ConversationItemContent(
-                                            type="input_text",
-                                            text=m.payload,
-                                        )
-                                    ],
-                                ),
-                            )
-                        )
-                    case "interrupt":
-                        await self.realtime.send(
-                            ResponseCreateEvent(type="response.create")
-                        )
-                    case "function":
-                        function_message = json.loads(m.payload)
-
-                        await self.realtime.send(
-                            ConversationItemCreateEvent(
-                                type="conversation.item.create",
-                                item=ConversationItem(
-                                    call_id=function_message["call_id"],
-                                    type="function_call_output",
-                                    output=function_message["output"],
-                                ),
-                            )
-                        )
-
-                        await self.realtime.response.create()
-
-                    case _:
-                        await self.send_console(
-                            Message(type="console", payload="Unhandled message")
-                        )
+                message = await self.client.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if self.recorder is not None:
+                    self._record(self.recorder.client, message)
+
+                if message.get("bytes") is not None:
+                    await self._handle_client_bytes(message["bytes"])
+                else:
+                    m = Message(**json.loads(message["text"]))
+                    await self._handle_client_message(m)
 
         except WebSocketDisconnect:
             print("Realtime Socket Disconnected")
 
+    async def relay(self):
+        """
+        Both directions of the call until either side goes away: the realtime
+        connection is not kept open for a browser that left, nor the browser
+        for a realtime session that ended. The other direction is cancelled,
+        even mid response.
+        """
+        tasks = [
+            asyncio.create_task(self.receive_realtime()),
+            asyncio.create_task(self.receive_client()),
+        ]
+        try:
+            done, pending = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for task in done:
+            task.result()
+
+    async def _handle_client_bytes(self, data: bytes):
+        if self.realtime is None:
+            return
+        try:
+            kind, payload = decode_frame(data)
+        except ValueError as e:
+            # a malformed frame is dropped, not the call
+            print(f"Dropped binary frame: {e}")
+            return
+        if kind == AUDIO_FRAME:
+            await self.send_realtime(
+                InputAudioBufferAppendEvent(
+                    type="input_audio_buffer.append",
+                    audio=base64.b64encode(payload).decode("ascii"),
+                ),
+                audio=True,
+            )
+        else:
+            await self.send_console(
+                Message(type="console", payload=f"Unhandled frame {kind}")
+            )
+
+    async def _handle_client_message(self, m: Message):
+        if self.realtime is None:
+            return
+        match m.type:
+            case "audio":
+                await self.send_realtime(
+                    InputAudioBufferAppendEvent(
+                        type="input_audio_buffer.append", audio=m.payload
+                    ),
+                    audio=True,
+                )
+            case "user":
+                await self.send_realtime(
+                    ConversationItemCreateEvent(
+                        type="conversation.item.create",
+                        item=ConversationItem(
+                            role="user",
+                            type="message",
+                            content=[
+                                ConversationItemContent(
+                                    type="input_text",
+                                    text=m.payload,
+                                )
+                            ],
+                        ),
+                    )
+                )
+            case "interrupt":
+                await self.send_realtime(ResponseCreateEvent(type="response.create"))
+            case "function":
+                function_message = json.loads(m.payload)
+
+                await self.send_realtime(
+                    ConversationItemCreateEvent(
+                        type="conversation.item.create",
+                        item=ConversationItem(
+                            call_id=function_message["call_id"],
+                            type="function_call_output",
+                            output=function_message["output"],
+                        ),
+                    )
+                )
+
+                await self.send_realtime(ResponseCreateEvent(type="response.create"))
+
+            case _:
+                await self.send_console(
+                    Message(type="console", payload="Unhandled message")
+                )
+
+    def _record(self, record: Callable[[Any], None], item: Any):
+        # a failing recording (disk full, ...) is given up, not the call
+        try:
+            record(item)
+        except Exception as e:
+            print("Error recording voice call, recording stopped", e)
+            self._close_recorder()
+
+    def _close_recorder(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return
+        try:
+            recorder.close()
+        except Exception as e:
+            print("Error closing voice call recording", e)
+
+    async def stop(self):
+        # stops the relay writers, anything still queued is dropped
+        RealtimeClient.live.discard(self)
+        self._close_recorder()
+        await self.outbound.close()
+        await self.inbound.close()
+
     async def close(self):
+        await self.stop()
         if self.client is None or self.realtime is None:
             return
         try:
@@ -477,3 +642,48 @@ class RealtimeClient:
         if self.client is None:
             return True
         return self.client.client_state == WebSocketState.DISCONNECTED
+
+    # realtime event type -> handler and tracing policy (see api.voice.dispatch)
+    routes: Dict[str, Route] = {
+        "error": Route(_handle_error),
+        "session.created": Route(_session_created),
+        "session.updated": Route(_session_updated),
+        "conversation.created": Route(_conversation_created),
+        "conversation.item.created": Route(_conversation_item_created),
+        "conversation.item.input_audio_transcription.completed": Route(
+            _conversation_item_input_audio_transcription_completed
+        ),
+        "conversation.item.input_audio_transcription.delta": Route(
+            _conversation_item_input_audio_transcription_delta, "sampled"
+        ),
+        "conversation.item.input_audio_transcription.failed": Route(
+            _conversation_item_input_audio_transcription_failed
+        ),
+        "conversation.item.truncated": Route(_conversation_item_truncated),
+        "conversation.item.deleted": Route(_conversation_item_deleted),
+        "input_audio_buffer.committed": Route(_input_audio_buffer_committed),
+        "input_audio_buffer.cleared": Route(_input_audio_buffer_cleared),
+        "input_audio_buffer.speech_started": Route(_input_audio_buffer_speech_started),
+        "input_audio_buffer.speech_stopped": Route(_input_audio_buffer_speech_stopped),
+        "response.created": Route(_response_created),
+        "response.done": Route(_response_done),
+        "response.output_item.added": Route(_response_output_item_added),
+        "response.output_item.done": Route(_response_output_item_done),
+        "response.content_part.added": Route(_response_content_part_added),
+        "response.content_part.done": Route(_response_content_part_done),
+        "response.text.delta": Route(_response_text_delta, "sampled"),
+        "response.text.done": Route(_response_text_done),
+        "response.audio_transcript.delta": Route(
+            _response_audio_transcript_delta, "sampled"
+        ),
+        "response.audio_transcript.done": Route(_response_audio_transcript_done),
+        "response.audio.delta": Route(_response_audio_delta, "aggregate"),
+        "response.audio.done": Route(_response_audio_done),
+        "response.function_call_arguments.delta": Route(
+            _response_function_call_arguments_delta, "sampled"
+        ),
+        "response.function_call_arguments.done": Route(
+            _response_function_call_arguments_done
+        ),
+        "rate_limits.updated": Route(_rate_limits_updated),
+    }
@@ -0,0 +1,105 @@
+import time
+import traceback
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Literal, NamedTuple
+
+from prompty.tracer import Tracer
+
+from api.metrics import realtime_handler_duration
+
+# full       one span per event (lifecycle events)
+# sampled    a span for the first event and every ``sample_every`` after that
+# aggregate  no span per event; count and handler time are reported in one
+#            span when the next fully traced event arrives (or on flush)
+# off        never traced
+Tracing = Literal["full", "sampled", "aggregate", "off"]
+
+
+class Route(NamedTuple):
+    handler: Callable[[Any, Any], Awaitable[None]]
+    tracing: Tracing = "full"
+
+
+class EventDispatcher:
+    """
+    Event type -> handler registry, with a tracing policy per event type so
+    high frequency deltas do not each produce a span.
+    """
+
+    def __init__(self, routes: Dict[str, Route], sample_every: int = 50):
+        self.routes = routes
+        self.sample_every = max(sample_every, 1)
+        self.counts: Counter = Counter()
+        self.aggregates: Dict[str, Dict[str, float]] = {}
+        self.metrics = {"events": 0, "spans": 0, "unhandled": 0}
+
+    async def dispatch(self, target: Any, event: Any):
+        self.metrics["events"] += 1
+        route = self.routes.get(event.type)
+        if route is None:
+            self.metrics["unhandled"] += 1
+            print(f"Unhandled event type {event.type}")
+            return
+
+        start = time.perf_counter()
+        await self._dispatch(route, target, event)
+        realtime_handler_duration.record(
+            time.perf_counter() - start, {"type": event.type}
+        )
+
+    async def _dispatch(self, route: Route, target: Any, event: Any):
+        match route.tracing:
+            case "full":
+                self.flush()
+                await self._traced(route, target, event)
+            case "sampled":
+                self.counts[event.type] += 1
+                if (self.counts[event.type] - 1) % self.sample_every == 0:
+                    await self._traced(route, target, event)
+                else:
+                    await route.handler(target, event)
+            case "aggregate":
+                start = time.perf_counter()
+                await route.handler(target, event)
+                self._record(event.type, time.perf_counter() - start)
+            case _:
+                await route.handler(target, event)
+
+    async def _traced(self, route: Route, target: Any, event: Any):
+        self.metrics["spans"] += 1
+        with Tracer.start(event.type) as trace:
+            trace("signature", f"api.voice.RealtimeClient.{route.handler.__name__}")
+            trace("inputs", {"event": event})
+            try:
+                await route.handler(target, event)
+            except Exception as e:
+                trace(
+                    "result",
+                    {
+                        "exception": {
+                            "type": type(e),
+                            "traceback": traceback.format_tb(e.__traceback__),
+                            "message": str(e),
+                        }
+                    },
+                )
+                raise
+
+    def _record(self, event_type: str, elapsed: float):
+        aggregate = self.aggregates.get(event_type)
+        if aggregate is None:
+            aggregate = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            self.aggregates[event_type] = aggregate
+        aggregate["count"] += 1
+        aggregate["total_ms"] += elapsed * 1000
+        aggregate["max_ms"] = max(aggregate["max_ms"], elapsed * 1000)
+
+    def flush(self):
+        """
+        Report the aggregated events since the last flush, one span each.
+        """
+        for event_type, aggregate in self.aggregates.items():
+            self.metrics["spans"] += 1
+            with Tracer.start(event_type) as trace:
+                trace("aggregate", aggregate)
+        self.aggregates = {}
@@ -0,0 +1,35 @@
+"""
+Binary framing for the /api/voice websocket.
+
+Clients that negotiate the ``AUDIO_SUBPROTOCOL`` websocket sub-protocol send and
+receive PCM16 audio as binary frames instead of base64 text inside a JSON
+``Message``. Control messages (user, interrupt, function, ...) stay JSON text
+frames in both modes.
+
+Binary frame layout:
+
+    | kind (1 byte) | reserved (1 byte) | payload |
+
+The header is two bytes wide so the PCM16 payload stays 2-byte aligned and the
+browser can wrap it in an ``Int16Array`` without copying.
+"""
+
+from typing import Tuple
+
+AUDIO_SUBPROTOCOL = "contoso.audio.v1"
+
+AUDIO_FRAME = 0x01
+
+HEADER_SIZE = 2
+
+_AUDIO_HEADER = bytes((AUDIO_FRAME, 0))
+
+
+def encode_audio(pcm: bytes) -> bytes:
+    return _AUDIO_HEADER + pcm
+
+
+def decode_frame(data: bytes) -> Tuple[int, bytes]:
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"Binary frame too short ({len(data)} bytes)")
+    return data[0], data[HEADER_SIZE:]
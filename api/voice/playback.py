@@ -0,0 +1,91 @@
+import time
+from typing import Dict, Set, Tuple, Union
+
+# 24kHz mono PCM16
+BYTES_PER_MS = 48
+
+
+class Playback:
+    """
+    Tracks how much assistant audio the browser has heard, so a barge-in
+    can truncate the item at the played position.
+
+    The browser plays audio in order as it arrives, so the played offset is
+    bounded both by the audio actually written to it and by the wall clock
+    since the first chunk of the item went out.
+    """
+
+    def __init__(self):
+        self.response_id: Union[str, None] = None
+        self.item_id: Union[str, None] = None
+        self.started = 0.0
+        # audio of the current item received from the server and still on
+        # its way to (or already at) the browser
+        self.received_ms = 0.0
+        self.sent_ms = 0.0
+        self.cancelled: Set[str] = set()
+        self.metrics = {"interrupts": 0, "truncated_ms": 0, "dropped_deltas": 0}
+
+    def response_created(self, response_id: Union[str, None]):
+        self.response_id = response_id
+
+    def response_done(self, response_id: Union[str, None]):
+        if response_id is not None:
+            self.cancelled.discard(response_id)
+        if response_id == self.response_id:
+            self.response_id = None
+
+    def audio(self, response_id: str, item_id: str, size: int) -> bool:
+        """
+        Record an audio delta about to be sent to the browser. False when
+        the delta belongs to an interrupted response and should be dropped.
+        """
+        if response_id in self.cancelled:
+            self.metrics["dropped_deltas"] += 1
+            return False
+        if item_id != self.item_id:
+            self.item_id = item_id
+            self.started = time.monotonic()
+            self.received_ms = 0.0
+            self.sent_ms = 0.0
+        self.received_ms += size / BYTES_PER_MS
+        self.sent_ms += size / BYTES_PER_MS
+        return True
+
+    def played_ms(self) -> int:
+        elapsed = (time.monotonic() - self.started) * 1000
+        return int(min(self.sent_ms, elapsed))
+
+    def interrupt(
+        self, discarded: int = 0
+    ) -> Tuple[Union[str, None], Union[str, None], int]:
+        """
+        Stop the current response. ``discarded`` is the number of audio bytes
+        that were still queued and will never reach the browser. Returns the
+        response to cancel (None if nothing is in progress), and the item to
+        truncate with the played offset (None if it was fully played).
+        """
+        self.sent_ms = max(self.sent_ms - discarded / BYTES_PER_MS, 0.0)
+        response_id = self.response_id
+        if response_id is not None:
+            self.cancelled.add(response_id)
+            self.response_id = None
+
+        item_id = None
+        played = self.played_ms()
+        # still being generated, or the server sent more than was heard
+        if self.item_id is not None and (
+            response_id is not None or played < int(self.received_ms)
+        ):
+            item_id = self.item_id
+            self.metrics["truncated_ms"] += max(int(self.received_ms) - played, 0)
+
+        if response_id is not None or item_id is not None:
+            self.metrics["interrupts"] += 1
+        self.item_id = None
+        self.received_ms = 0.0
+        self.sent_ms = 0.0
+        return response_id, item_id, played
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.metrics)
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Deque, Set, Tuple, Union
+
+from openai import AsyncAzureOpenAI
+from websockets.protocol import State
+from openai.types.beta.realtime import SessionUpdateEvent
+from openai.types.beta.realtime.session_update_event import Session
+
+if TYPE_CHECKING:
+    from openai.resources.beta.realtime.realtime import AsyncRealtimeConnection
+
+
+class RealtimePool:
+    """
+    Pool of pre-connected realtime sessions for instant call pickup.
+
+    Idle connections are opened ahead of time and configured with the base
+    session (VAD, transcription, voice, tools), so a call only has to send a
+    session.update with what differs (see api.voice.session_delta).
+    Connections older than ``max_idle`` seconds are closed instead of handed
+    out, as are connections the server already closed while they sat idle,
+    and a background task refills the pool up to ``size``. With a size of 0
+    every call connects on demand.
+    """
+
+    def __init__(
+        self,
+        client: AsyncAzureOpenAI,
+        session: Session,
+        model: str = "gpt-4o-realtime-preview",
+        size: int = 2,
+        max_idle: float = 300,
+    ):
+        self.client = client
+        self.session = session
+        self.model = model
+        self.size = size
+        self.max_idle = max_idle
+        self._idle: Deque[Tuple[float, "AsyncRealtimeConnection"]] = deque()
+        self._wake = asyncio.Event()
+        self._refill: Union[asyncio.Task, None] = None
+        self._closing: Set[asyncio.Task] = set()
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "dropped": 0,
+            "errors": 0,
+        }
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    async def start(self):
+        if self._refill is None and self.size > 0:
+            self._refill = asyncio.create_task(self._refill_loop())
+
+    async def close(self):
+        if self._refill is not None:
+            self._refill.cancel()
+            self._refill = None
+        while len(self._idle) > 0:
+            _, connection = self._idle.popleft()
+            await self._close(connection)
+        if len(self._closing) > 0:
+            await asyncio.gather(*self._closing)
+
+    async def connect(self) -> "AsyncRealtimeConnection":
+        return await self.client.beta.realtime.connect(model=self.model).enter()
+
+    async def acquire(self) -> Tuple["AsyncRealtimeConnection", Union[Session, None]]:
+        """
+        A realtime connection for a new call, along with the session it is
+        already configured with (None when it had to be opened on demand).
+        The caller owns the connection and closes it.
+        """
+        self._expire()
+        self._wake.set()
+        while len(self._idle) > 0:
+            _, connection = self._idle.popleft()
+            if not self._alive(connection):
+                self.metrics["dropped"] += 1
+                self._close_later(connection)
+                continue
+            self.metrics["hits"] += 1
+            return connection, self.session
+
+        self.metrics["misses"] += 1
+        return await self.connect(), None
+
+    @asynccontextmanager
+    async def connection(
+        self,
+    ) -> AsyncIterator[Tuple["AsyncRealtimeConnection", Union[Session, None]]]:
+        connection, configured = await self.acquire()
+        try:
+            yield connection, configured
+        finally:
+            await self._close(connection)
+
+    async def _warm(self):
+        connection = await self.connect()
+        await connection.send(
+            SessionUpdateEvent(type="session.update", session=self.session)
+        )
+        self._idle.append((time.monotonic(), connection))
+
+    def _expire(self):
+        now = time.monotonic()
+        while len(self._idle) > 0 and now - self._idle[0][0] > self.max_idle:
+            _, connection = self._idle.popleft()
+            self.metrics["expired"] += 1
+            self._close_later(connection)
+
+    def _close_later(self, connection: "AsyncRealtimeConnection"):
+        task = asyncio.create_task(self._close(connection))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    def _alive(connection: "AsyncRealtimeConnection") -> bool:
+        # the websocket notices a close from the server (idle timeout, deploy)
+        # in the background, without anyone reading from the connection
+        return connection._connection.state is State.OPEN
+
+    async def _close(self, connection: "AsyncRealtimeConnection"):
+        try:
+            await connection.close()
+        except Exception as e:
+            print("Error closing pooled realtime connection", e)
+
+    async def _refill_loop(self):
+        while True:
+            self._expire()
+            while len(self._idle) < self.size:
+                try:
+                    await self._warm()
+                except Exception as e:
+                    self.metrics["errors"] += 1
+                    print("Error warming realtime connection", e)
+                    break
+            self._wake.clear()
+            try:
+                # woken up by acquire, otherwise check for stale connections
+                await asyncio.wait_for(self._wake.wait(), timeout=self.max_idle / 2)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,81 @@
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Union
+
+from jinja2 import Environment, FileSystemLoader
+
+from api.catalog import Catalog, CatalogSnapshot
+from api.retrieval import ProductIndex
+
+
+class VoicePrompt:
+    """
+    Voice system prompt (script.jinja2) with the static parts rendered ahead
+    of time.
+
+    Product and purchase blocks are rendered once per catalog snapshot, so a
+    call just joins the selected product blocks and fills in the customer and
+    chat context.
+    """
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        template_path: Union[str, Path] = Path(__file__).parent,
+    ):
+        self.catalog = catalog
+        self.env = Environment(loader=FileSystemLoader(template_path))
+
+        self._prepare(catalog.current())
+
+    @property
+    def products(self) -> Sequence[Dict[str, Any]]:
+        return self.snapshot.products
+
+    @property
+    def purchases(self) -> Sequence[Dict[str, Any]]:
+        return self.snapshot.purchases
+
+    @property
+    def index(self) -> ProductIndex:
+        return self.snapshot.index
+
+    def refresh(self) -> bool:
+        # NOTE: jinja2 already recompiles the templates when they change
+        snapshot = self.catalog.current()
+        if snapshot is self.snapshot:
+            return False
+        self._prepare(snapshot)
+        return True
+
+    def _prepare(self, snapshot: CatalogSnapshot):
+        self.snapshot = snapshot
+        self._product_blocks = {
+            product["id"]: self._render_product(product)
+            for product in snapshot.products
+        }
+        self._purchases_block = "\n".join(
+            self._render_product(product) for product in snapshot.purchases
+        )
+
+    def _render_product(self, product: Dict[str, Any]) -> str:
+        return self.env.get_template("product.jinja2").render(product=product)
+
+    def _product_block(self, product: Dict[str, Any]) -> str:
+        block = self._product_blocks.get(product["id"])
+        if block is None:
+            # product from before the last refresh
+            block = self._render_product(product)
+        return block
+
+    def render(
+        self,
+        customer: str,
+        context: List[Dict[str, Any]],
+        products: Sequence[Dict[str, Any]],
+    ) -> str:
+        return self.env.get_template("script.jinja2").render(
+            customer=customer,
+            context=context,
+            purchases=self._purchases_block,
+            products="\n".join(self._product_block(product) for product in products),
+        )
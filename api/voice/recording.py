@@ -0,0 +1,316 @@
+"""
+Recording and replay of voice calls.
+
+A ``Recorder`` on ``RealtimeClient`` writes what arrives from both sides of
+a call (browser messages and realtime events) with their timings. The
+``ReplayClient`` and ``ReplayRealtime`` stand-ins play a recording back
+through ``receive_client`` / ``receive_realtime``, in real time or as fast
+as possible, so real call shapes can be rerun without a live call.
+
+File layout:
+
+    | magic "CVR1" | record | record | ...
+
+    record: | source (1) | kind (1) | gap us (4) | length (4) | payload |
+
+``gap`` is the time since the previous record in microseconds, integers
+are little endian. Audio is kept as raw PCM16 instead of base64 text:
+
+    source CLIENT    kind TEXT   text frame (JSON Message)
+                     kind AUDIO  PCM of an "audio" Message
+                     kind FRAME  binary frame (see api.voice.frames)
+    source REALTIME  kind TEXT   server event (JSON)
+                     kind AUDIO  response.audio.delta:
+                                 | json length (2) | event without delta | PCM |
+"""
+
+import time
+import base64
+import struct
+import asyncio
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Union, cast
+
+import orjson
+from fastapi.websockets import WebSocketState
+from openai._models import construct_type_unchecked
+from openai.types.beta.realtime import RealtimeServerEvent
+
+from api.voice.frames import HEADER_SIZE
+
+MAGIC = b"CVR1"
+
+CLIENT = 0
+REALTIME = 1
+
+TEXT = 0
+AUDIO = 1
+FRAME = 2
+
+_record = struct.Struct("<BBII")
+_json_size = struct.Struct("<H")
+
+# fields of response.audio.delta besides the audio itself
+_DELTA_FIELDS = (
+    "type",
+    "event_id",
+    "response_id",
+    "item_id",
+    "output_index",
+    "content_index",
+)
+
+
+def parse_event(data: Dict[str, Any]) -> RealtimeServerEvent:
+    # as the openai realtime connection does (AsyncRealtimeConnection.parse_event)
+    return cast(
+        RealtimeServerEvent,
+        construct_type_unchecked(value=data, type_=cast(Any, RealtimeServerEvent)),
+    )
+
+
+class Record(NamedTuple):
+    source: int
+    kind: int
+    # seconds since the start of the recording
+    time: float
+    payload: bytes
+
+    def message(self) -> Dict[str, Any]:
+        """A client record as the websocket message it was received as."""
+        if self.kind == FRAME:
+            return {"type": "websocket.receive", "bytes": self.payload}
+        if self.kind == AUDIO:
+            audio = base64.b64encode(self.payload).decode("ascii")
+            text = orjson.dumps({"type": "audio", "payload": audio}).decode("utf-8")
+            return {"type": "websocket.receive", "text": text}
+        return {"type": "websocket.receive", "text": self.payload.decode("utf-8")}
+
+    def event(self) -> RealtimeServerEvent:
+        if self.kind == AUDIO:
+            (size,) = _json_size.unpack_from(self.payload)
+            data = orjson.loads(self.payload[2 : 2 + size])
+            data["delta"] = base64.b64encode(self.payload[2 + size :]).decode("ascii")
+        else:
+            data = orjson.loads(self.payload)
+        return parse_event(data)
+
+    def audio_size(self) -> int:
+        if self.source == REALTIME and self.kind == AUDIO:
+            (size,) = _json_size.unpack_from(self.payload)
+            return len(self.payload) - 2 - size
+        return 0
+
+
+class Recorder:
+    """
+    Appends the records of one call to ``path`` (buffered, flushed on close).
+    Records are timed as they are written unless ``at`` (seconds since the
+    start) is given, e.g. for recordings put together offline.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.file: Union[BinaryIO, None] = open(self.path, "wb")
+        self.file.write(MAGIC)
+        self.start = time.perf_counter()
+        # microseconds since the start of the last record
+        self.elapsed = 0
+        self.records = 0
+
+    def write(
+        self, source: int, kind: int, payload: bytes, at: Union[float, None] = None
+    ):
+        if self.file is None:
+            return
+        if at is None:
+            at = time.perf_counter() - self.start
+        gap = min(max(int(at * 1_000_000) - self.elapsed, 0), 0xFFFFFFFF)
+        self.elapsed += gap
+        self.file.write(_record.pack(source, kind, gap, len(payload)))
+        self.file.write(payload)
+        self.records += 1
+
+    def client(self, message: Dict[str, Any], at: Union[float, None] = None):
+        if message.get("bytes") is not None:
+            self.write(CLIENT, FRAME, message["bytes"], at)
+            return
+        text = message.get("text")
+        if text is None:
+            return
+        data = orjson.loads(text)
+        if data.get("type") == "audio":
+            self.write(CLIENT, AUDIO, base64.b64decode(data["payload"]), at)
+        else:
+            self.write(CLIENT, TEXT, text.encode("utf-8"), at)
+
+    def realtime(self, event: Any, at: Union[float, None] = None):
+        if event.type == "response.audio.delta":
+            header = orjson.dumps({k: getattr(event, k) for k in _DELTA_FIELDS})
+            pcm = base64.b64decode(event.delta)
+            self.write(REALTIME, AUDIO, _json_size.pack(len(header)) + header + pcm, at)
+        else:
+            self.write(REALTIME, TEXT, orjson.dumps(event.to_dict(mode="json")), at)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_recording(path: Union[str, Path]) -> Iterator[Record]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a call recording")
+    offset, elapsed = len(MAGIC), 0
+    while offset < len(data):
+        source, kind, gap, size = _record.unpack_from(data, offset)
+        offset += _record.size
+        elapsed += gap
+        yield Record(source, kind, elapsed / 1_000_000, data[offset : offset + size])
+        offset += size
+
+
+class ReplayClock:
+    """
+    Shared by both replay sides. ``speed`` 1 plays at the recorded pace,
+    2 twice as fast, 0 as fast as possible.
+    """
+
+    def __init__(self, speed: float = 1.0):
+        self.speed = speed
+        self.start = time.perf_counter()
+
+    def now(self) -> float:
+        return time.perf_counter() - self.start
+
+    async def wait(self, at: float):
+        if self.speed <= 0:
+            # still let the other side run
+            await asyncio.sleep(0)
+            return
+        delay = at / self.speed - self.now()
+        await asyncio.sleep(max(delay, 0))
+
+
+class ReplayRealtime:
+    """
+    Stands in for the realtime connection: yields the recorded server events
+    and keeps what the client sends. Once every event was handed over
+    ``played`` is set and iterating waits for ``close``. Audio deltas are
+    timestamped as they are handed over, see ``ReplayClient.relay_delays``.
+    """
+
+    def __init__(self, records: List[Record], clock: ReplayClock):
+        self.records = [r for r in records if r.source == REALTIME]
+        self.clock = clock
+        self.sent: List[Any] = []
+        # cumulative audio bytes handed to the client, and when
+        self.audio_bytes: List[int] = []
+        self.audio_times: List[float] = []
+        self.played = asyncio.Event()
+        self.closed = asyncio.Event()
+        self._next = 0
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        while self._next < len(self.records) and not self.closed.is_set():
+            record = self.records[self._next]
+            self._next += 1
+            await self.clock.wait(record.time)
+            size = record.audio_size()
+            if size > 0:
+                total = self.audio_bytes[-1] if self.audio_bytes else 0
+                self.audio_bytes.append(total + size)
+                self.audio_times.append(self.clock.now())
+            yield record.event()
+        self.played.set()
+        await self.closed.wait()
+
+    async def send(self, event: Any):
+        self.sent.append(event)
+
+    async def close(self):
+        self.closed.set()
+
+
+class ReplayClient:
+    """
+    Stands in for the browser websocket: receives the recorded messages and
+    keeps (or counts) what is sent to it. Once every message was received
+    ``played`` is set and it listens until ``close``. ``send_delay`` slows
+    every send down, like a browser on a poor connection.
+    """
+
+    def __init__(
+        self,
+        records: List[Record],
+        clock: ReplayClock,
+        send_delay: float = 0.0,
+        keep: bool = False,
+    ):
+        self.records = [r for r in records if r.source == CLIENT]
+        self.clock = clock
+        self.send_delay = send_delay
+        self.keep = keep
+        self.client_state = WebSocketState.CONNECTED
+        self.sent: List[Union[str, bytes]] = []
+        self.frames = 0
+        # cumulative audio bytes received, and when
+        self.audio_bytes: List[int] = []
+        self.audio_times: List[float] = []
+        self.played = asyncio.Event()
+        self.closed = asyncio.Event()
+        self._next = 0
+
+    async def receive(self) -> Dict[str, Any]:
+        if self._next >= len(self.records) or self.closed.is_set():
+            self.played.set()
+            await self.closed.wait()
+            self.client_state = WebSocketState.DISCONNECTED
+            return {"type": "websocket.disconnect", "code": 1000}
+        record = self.records[self._next]
+        self._next += 1
+        await self.clock.wait(record.time)
+        return record.message()
+
+    async def _sent(self, data: Union[str, bytes], audio: int):
+        if self.send_delay > 0:
+            await asyncio.sleep(self.send_delay)
+        self.frames += 1
+        if self.keep:
+            self.sent.append(data)
+        if audio > 0:
+            total = self.audio_bytes[-1] if self.audio_bytes else 0
+            self.audio_bytes.append(total + audio)
+            self.audio_times.append(self.clock.now())
+
+    async def send_text(self, data: str):
+        audio = 0
+        if data.startswith('{"type":"audio"'):
+            audio = len(base64.b64decode(orjson.loads(data)["payload"]))
+        await self._sent(data, audio)
+
+    async def send_bytes(self, data: bytes):
+        await self._sent(data, len(data) - HEADER_SIZE)
+
+    async def close(self):
+        self.closed.set()
+
+    def relay_delays(self, realtime: ReplayRealtime) -> List[float]:
+        """
+        Seconds from each audio delta being handed over until the browser
+        had all of it (deltas merged on the way count from the last one).
+        Only meaningful for calls without barge-in, discarded audio is not
+        accounted for.
+        """
+        delays = []
+        for total, sent_at in zip(self.audio_bytes, self.audio_times):
+            index = bisect_left(realtime.audio_bytes, total)
+            if index < len(realtime.audio_times):
+                delays.append(sent_at - realtime.audio_times[index])
+        return delays
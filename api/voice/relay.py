@@ -0,0 +1,166 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Literal, Tuple, Union
+
+from api.metrics import websocket_send_duration
+
+Policy = Literal["block", "drop_oldest", "coalesce"]
+
+
+class Relay:
+    """
+    Bounded queue drained by a dedicated writer task, so a slow socket on one
+    side of a voice call does not stall the loop reading the other side.
+
+    Items are either audio (raw PCM16 bytes) or control messages. Control
+    messages are never dropped. When the queue is full the policy decides:
+
+    - block: wait for the writer to make room
+    - drop_oldest: drop the oldest queued audio
+    - coalesce: merge queued audio into fewer, larger frames (and merge
+      adjacent audio when draining); waits if there is nothing to merge
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Any], Awaitable[None]],
+        maxsize: int = 256,
+        policy: Policy = "coalesce",
+        name: str = "relay",
+    ):
+        self.send = send
+        self.maxsize = maxsize
+        self.policy = policy
+        self.name = name
+        self._items: Deque[Tuple[bool, Any]] = deque()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._writer: Union[asyncio.Task, None] = None
+        self.closed = False
+        self.metrics = {
+            "sent": 0,
+            "max_depth": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "discarded": 0,
+        }
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    async def put(self, item: Any, audio: bool = False):
+        if self.closed:
+            return
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write())
+
+        while len(self._items) >= self.maxsize and not self._make_room(audio):
+            self._space.clear()
+            await self._space.wait()
+            if self.closed:
+                return
+
+        self._items.append((audio, item))
+        self._drained.clear()
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], len(self._items))
+        self._ready.set()
+
+    def _make_room(self, audio: bool) -> bool:
+        if self.policy == "drop_oldest" and audio:
+            for index, (is_audio, _) in enumerate(self._items):
+                if is_audio:
+                    del self._items[index]
+                    self.metrics["dropped"] += 1
+                    return True
+        elif self.policy == "coalesce":
+            before = len(self._items)
+            self._items = deque(self._coalesce(self._items))
+            return len(self._items) < before
+        return False
+
+    def _coalesce(self, items: Deque[Tuple[bool, Any]]):
+        chunks = []
+        for audio, item in items:
+            if audio:
+                chunks.append(item)
+                continue
+            if len(chunks) > 0:
+                yield True, self._merge(chunks)
+                chunks = []
+            yield audio, item
+        if len(chunks) > 0:
+            yield True, self._merge(chunks)
+
+    def _merge(self, chunks) -> bytes:
+        self.metrics["coalesced"] += len(chunks) - 1
+        return b"".join(chunks)
+
+    def discard_audio(self) -> int:
+        """
+        Drop queued audio that has not been written yet (e.g. after the user
+        interrupted the assistant). Returns the number of bytes dropped.
+        """
+        before = len(self._items)
+        size = sum(len(i) for a, i in self._items if a)
+        self._items = deque((a, i) for a, i in self._items if not a)
+        self.metrics["discarded"] += before - len(self._items)
+        self._space.set()
+        return size
+
+    def _next(self) -> Tuple[bool, Any]:
+        audio, item = self._items.popleft()
+        if audio and self.policy == "coalesce":
+            chunks = [item]
+            while len(self._items) > 0 and self._items[0][0]:
+                chunks.append(self._items.popleft()[1])
+            item = self._merge(chunks)
+        return audio, item
+
+    async def _write(self):
+        try:
+            while not self.closed:
+                if len(self._items) == 0:
+                    self._drained.set()
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                _, item = self._next()
+                self._space.set()
+                start = time.perf_counter()
+                await self.send(item)
+                websocket_send_duration.record(
+                    time.perf_counter() - start, {"socket": self.name}
+                )
+                self.metrics["sent"] += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Error writing {self.name}", e)
+        finally:
+            self.closed = True
+            self._items.clear()
+            self._space.set()
+            self._drained.set()
+
+    async def join(self):
+        """
+        Wait until everything queued so far has been written.
+        """
+        await self._drained.wait()
+
+    async def close(self):
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"depth": len(self._items), **self.metrics}
@@ -0,0 +1,49 @@
+import json
+from typing import Any, Dict
+
+from openai.types.beta.realtime.session_update_event import SessionTool
+
+from api.retrieval import ProductIndex
+
+SEARCH_PRODUCTS = SessionTool(
+    type="function",
+    name="search_products",
+    description=(
+        "Search the Contoso Outdoor product catalog for products that are not "
+        "already listed in your instructions."
+    ),
+    parameters={
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "What the customer is looking for, e.g. 'warm sleeping bag'",
+            }
+        },
+        "required": ["query"],
+    },
+)
+
+
+def product_search(index: ProductIndex, k: int = 5):
+    """
+    Server side handler for the search_products tool, the result is sent back
+    to the realtime model as the function call output.
+    """
+
+    async def search_products(arguments: Dict[str, Any]) -> str:
+        products = index.search(arguments.get("query", ""), k=k)
+        return json.dumps(
+            [
+                {
+                    "name": product["name"],
+                    "category": product["category"],
+                    "brand": product["brand"],
+                    "price": product["price"],
+                    "description": product["description"],
+                }
+                for product in products
+            ]
+        )
+
+    return search_products
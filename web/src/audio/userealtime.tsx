@@ -42,7 +42,10 @@ export const useRealtime = (
 
       await voiceRef.current.send({
         type: "messages",
-        payload: JSON.stringify(client.retrieveMessages()),
+        // the server has the chat so far when it knows the thread
+        payload: JSON.stringify(
+          client.state?.threadId ? [] : client.retrieveMessages()
+        ),
       });
       
       const message = {
@@ -50,6 +53,8 @@ export const useRealtime = (
         threshold: settings.threshold,
         silence: settings.silence,
         prefix: settings.prefix,
+        // lets the server start on the suggestions during the call
+        threadId: client.state?.threadId,
       };
 
       await voiceRef.current.sendUserMessage(JSON.stringify(message));
@@ -52,14 +52,18 @@ const Voice = () => {
         const messages = client.sendVoiceAssistantMessage(serverEvent.payload);
         console.log(suggestionsRef.current);
         if (!suggestionsRef.current) {
-          const response = await suggestionRequested(messages);
+          const response = await suggestionRequested(
+            messages,
+            stateRef.current?.threadId
+          );
           console.log("messages", messages, response);
           if (response && response.requested) {
             setSuggestions(true);
             suggestionsRef.current = true;
             const task = await startSuggestionTask(
               user?.name || "Seth",
-              messages
+              messages,
+              stateRef.current?.threadId
             );
             for await (const chunk of task) {
               contentRef.current.push(chunk);
@@ -6,34 +6,41 @@ import { API_ENDPOINT } from "@/store/endpoint";
 import { User } from "@/store/user";
 
 
-export const suggestionRequested = async (messages: SimpleMessage[]) => {
+export const suggestionRequested = async (
+  messages: SimpleMessage[],
+  threadId?: string
+) => {
   const configuration = {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
     },
-    body: JSON.stringify(messages),
+    // the server keeps the transcript of a thread
+    body: threadId ? undefined : JSON.stringify(messages),
   };
 
   const endpoint = API_ENDPOINT.endsWith("/")
     ? API_ENDPOINT.slice(0, -1)
     : API_ENDPOINT;
 
-  const url = `${endpoint}/api/request`;
+  // with a thread id the server only looks at the messages added since the
+  // last request for the same thread
+  const url = threadId
+    ? `${endpoint}/api/request?thread_id=${encodeURIComponent(threadId)}`
+    : `${endpoint}/api/request`;
   const response = await fetch(url, configuration);
   const json = await response.json();
   return json;
 };
 
 export const startSuggestionTask = async (
-  customer: string, messages: SimpleMessage[]
+  customer: string, messages: SimpleMessage[], threadId?: string
 ): Promise<{
   [Symbol.asyncIterator](): AsyncGenerator<string, void, unknown>;
 }> => {
-  const body = {
-    customer: customer,
-    messages: messages,
-  }
+  const body = threadId
+    ? { customer: customer }
+    : { customer: customer, messages: messages };
   console.log("startSuggestionTask", messages);
   const configuration = {
     method: "POST",
@@ -48,7 +55,11 @@ export const startSuggestionTask = async (
     ? API_ENDPOINT.slice(0, -1)
     : API_ENDPOINT;
 
-  const url = `${endpoint}/api/suggestion`;
+  // with a thread id the server hands over the suggestions it may have
+  // started on during the voice call
+  const url = threadId
+    ? `${endpoint}/api/suggestion?thread_id=${encodeURIComponent(threadId)}`
+    : `${endpoint}/api/suggestion`;
   console.log("startSuggestionTask", url, configuration);
 
   const response = await fetch(url, configuration);
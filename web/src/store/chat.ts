@@ -116,6 +116,12 @@ export const useChatStore = create<ChatState>()(
           if (lastTurn.type === "assistant" && lastTurn.status === "waiting") {
             lastTurn.message = chunk;
             lastTurn.status = "streaming";
+          } else if (
+            lastTurn.type === "assistant" &&
+            lastTurn.status === "streaming"
+          ) {
+            // the response arrives in pieces as it is generated
+            lastTurn = { ...lastTurn, message: lastTurn.message + chunk };
           } else {
             lastTurn = {
               name: lastTurn.name,
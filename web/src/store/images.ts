@@ -108,6 +108,16 @@ export const fetchCachedImage = async (
   }
 };
 
+// sha256 of the image bytes, the server refers to uploaded images by it
+export const imageRef = async (dataUrl: string): Promise<string> => {
+  const base64 = dataUrl.slice(dataUrl.indexOf(",") + 1);
+  const bytes = Uint8Array.from(atob(base64), (c) => c.charCodeAt(0));
+  const digest = await crypto.subtle.digest("SHA-256", bytes);
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+};
+
 // function to remove image from cache
 export const removeCachedBlob = async (image: string | string[]) => {
   const cache = await caches.open(CACHE_NAME);
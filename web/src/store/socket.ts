@@ -1,11 +1,12 @@
 "use client";
 
 import { Turn } from "./chat";
-import { fetchCachedImage } from "./images";
+import { fetchCachedImage, imageRef } from "./images";
 
 export interface Message {
     name: string;
     image?: string;
+    image_ref?: string;
     text: string;
 }
 
@@ -36,6 +37,8 @@ export class SocketServer {
     ready: boolean = false;
     threadId: string;
     callbacks: { [key: string]: (data: SocketMessage) => void } = {};
+    // images uploaded on this connection, repeats only send their ref
+    sentImages: Set<string> = new Set();
     onOpenCallback: () => void;
     onCloseCallback: () => void;
 
@@ -66,8 +69,13 @@ export class SocketServer {
         };
 
         if (turn.image) {
-            await fetchCachedImage(turn.image, (img) => {
-                message.image = img;
+            await fetchCachedImage(turn.image, async (img) => {
+                const ref = await imageRef(img);
+                message.image_ref = ref;
+                if (!this.sentImages.has(ref)) {
+                    message.image = img;
+                    this.sentImages.add(ref);
+                }
                 this.send(JSON.stringify(message))
             });
         } else {
@@ -7,6 +7,12 @@ export interface Message {
   payload: string;
 }
 
+// binary audio frames: | kind (1 byte) | reserved (1 byte) | PCM16 |
+// (see api/voice/frames.py)
+export const AUDIO_SUBPROTOCOL = "contoso.audio.v1";
+const AUDIO_FRAME = 0x01;
+const HEADER_SIZE = 2;
+
 export interface SimpleMessage {
   name: string;
   text: string;
@@ -14,7 +20,7 @@ export interface SimpleMessage {
 
 class VoiceClient {
   url: string | URL;
-  socket: WebSocketClient<Message, Message> | null;
+  socket: WebSocketClient<Message, Message | ArrayBuffer> | null;
   player: Player | null;
   recorder: Recorder | null;
   handleServerMessage: (message: Message) => Promise<void>;
@@ -35,7 +41,10 @@ class VoiceClient {
 
   async start(deviceId: string | null = null) {
     console.log("Starting voice client");
-    this.socket = new WebSocketClient<Message, Message>(this.url);
+    this.socket = new WebSocketClient<Message, Message | ArrayBuffer>(
+      this.url,
+      AUDIO_SUBPROTOCOL
+    );
 
     this.player = new Player(this.setTalking);
 
@@ -43,8 +52,15 @@ class VoiceClient {
 
     /* eslint-disable @typescript-eslint/no-explicit-any */
     this.recorder = new Recorder((buffer: any) => {
-      const base64 = btoa(String.fromCharCode(...new Uint8Array(buffer)));
-      this.socket!.send({ type: "audio", payload: base64 });
+      if (this.socket!.protocol === AUDIO_SUBPROTOCOL) {
+        const frame = new Uint8Array(HEADER_SIZE + buffer.byteLength);
+        frame[0] = AUDIO_FRAME;
+        frame.set(new Uint8Array(buffer), HEADER_SIZE);
+        this.socket!.sendBytes(frame);
+      } else {
+        const base64 = btoa(String.fromCharCode(...new Uint8Array(buffer)));
+        this.socket!.send({ type: "audio", payload: base64 });
+      }
     });
 
     let audio: object = {
@@ -76,7 +92,12 @@ class VoiceClient {
     try {
       for await (const serverEvent of this.socket) {
 
-        if (serverEvent.type === "audio") {
+        if (serverEvent instanceof ArrayBuffer) {
+          // raw PCM16 frame, header keeps the samples 2-byte aligned
+          if (new Uint8Array(serverEvent, 0, 1)[0] === AUDIO_FRAME) {
+            this.player!.play(new Int16Array(serverEvent, HEADER_SIZE));
+          }
+        } else if (serverEvent.type === "audio") {
           // handle audio case internally
           const buffer = Uint8Array.from(atob(serverEvent.payload), (c) =>
             c.charCodeAt(0)
@@ -25,8 +25,9 @@ export class WebSocketClient<U, D> implements AsyncIterable<D> {
   private receiverQueue: [ResolveFn<D>, RejectFn<Error>][] = [];
   private done: boolean = false;
 
-  constructor(url: string | URL) {
-    this.socket = new WebSocket(url);
+  constructor(url: string | URL, protocols?: string | string[]) {
+    this.socket = new WebSocket(url, protocols);
+    this.socket.binaryType = "arraybuffer";
     this.connectedPromise = new Promise(async (resolve, reject) => {
       this.socket.onopen = () => {
         this.socket.onmessage = this.getMessageHandler();
@@ -72,7 +73,9 @@ export class WebSocketClient<U, D> implements AsyncIterable<D> {
   private getMessageHandler(): (event: MessageEvent) => void {
     const self = this;
     return (event: MessageEvent) => {
-      const message = JSON.parse(event.data as string);
+      // binary frames are handed over as-is, text frames are JSON
+      const message =
+        typeof event.data === "string" ? JSON.parse(event.data) : event.data;
       if (self.receiverQueue.length > 0) {
         const [resolve, _] = self.receiverQueue.shift()!;
         resolve({ value: message, done: false });
@@ -113,6 +116,18 @@ export class WebSocketClient<U, D> implements AsyncIterable<D> {
       return sendMessage(this.socket, serialized);
   }
 
+  get protocol(): string {
+    return this.socket.protocol;
+  }
+
+  async sendBytes(data: ArrayBufferLike | ArrayBufferView): Promise<void> {
+    await this.connectedPromise;
+    if (this.error) {
+      throw this.error;
+    }
+    return sendMessage(this.socket, data);
+  }
+
   async close(): Promise<void> {
     await this.connectedPromise;
     if (this.done) {